@@ -0,0 +1,63 @@
+"""Compare the time needed to convert a Variant file into submission items line by line (rows engine)
+and column by column (columns engine), and check that both engines create the same submission.
+
+Usage:
+    PYTHONPATH=. python benchmarks/columnar_engine.py [--rows 100000] [--runs 3]
+"""
+
+import argparse
+import gc
+import io
+import time
+
+from preClinVar.columnar import file_columns_to_submission, read_file_columns
+from preClinVar.demo.generator import generate_submission_files
+from preClinVar.file_parser import _csv_file_lines, file_fields_to_submission, iter_file_lines
+from preClinVar.json_stream import dumps
+
+
+def best_time(convert, runs: int) -> float:
+    """Return the shortest time taken by a conversion over a number of runs"""
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        convert()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000, help="Lines of the Variant file")
+    parser.add_argument("--runs", type=int, default=3, help="Runs of each engine")
+    args = parser.parse_args()
+
+    variants_contents, casedata_contents = generate_submission_files(args.rows)
+    casedata_lines = _csv_file_lines(casedata_contents)
+
+    def convert_rows():
+        variants_lines = iter_file_lines(io.BytesIO(variants_contents), ",")
+        return file_fields_to_submission(variants_lines, casedata_lines)
+
+    def convert_columns():
+        n_rows, columns = read_file_columns(io.BytesIO(variants_contents), ",")
+        return file_columns_to_submission(n_rows, columns, casedata_lines)
+
+    assert dumps(convert_rows()) == dumps(
+        convert_columns()
+    ), "Engines created different submissions"
+
+    rows_time = best_time(convert_rows, args.runs)
+    columns_time = best_time(convert_columns, args.runs)
+    print(f"Variant file with {args.rows} lines, parsed and converted into submission items")
+    print(f"Rows engine:    {rows_time:.2f}s ({args.rows / rows_time:.0f} rows/s)")
+    print(
+        f"Columns engine: {columns_time:.2f}s ({args.rows / columns_time:.0f} rows/s, {rows_time / columns_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Measure throughput and peak memory of each stage of the conversion of Variant and CaseData files into a validated
+json submission, on synthetic files of increasing size, and compare the results with stored baselines.
+
+Stages: _csv_file_lines, _tsv_file_lines, file_fields_to_submission, build_submission and validate_submission.
+
+Usage:
+    python benchmarks/pipeline.py [--sizes 10 1000 100000] [--baseline benchmarks/baselines.json] [--tolerance 0.25]
+    python benchmarks/pipeline.py --save-baseline   # store the results as the new baselines
+
+Exits with status 1 if the throughput of a stage dropped, or its peak memory grew, by more than the tolerance.
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+from preClinVar.build import build_submission
+from preClinVar.demo.generator import generate_submission_files
+from preClinVar.file_parser import _csv_file_lines, _tsv_file_lines, file_fields_to_submission
+from preClinVar.validate import validate_submission
+
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+MIN_DURATION = 0.5  # Stages are repeated until they have run for at least this number of seconds
+QUERY_PARAMS = {"assembly": "GRCh37", "submissionName": "benchmark"}
+
+
+def prepare_stages(n_rows: int) -> List[Tuple[str, Callable[[], object]]]:
+    """Generate synthetic files with n_rows variants and return a function running each stage of the conversion
+
+    Args:
+        n_rows(int): number of lines of the Variant file
+
+    Returns:
+        stages(list of tuples): Example: [("_csv_file_lines", <function>), ..]
+    """
+    csv_variants, csv_casedata = generate_submission_files(n_rows, delimiter=",")
+    tsv_variants, tsv_casedata = generate_submission_files(n_rows, delimiter="\t")
+    variants_lines = _csv_file_lines(csv_variants)
+    casedata_lines = _csv_file_lines(csv_casedata)
+    submission = file_fields_to_submission(variants_lines, casedata_lines)
+    request = SimpleNamespace(query_params=QUERY_PARAMS)
+    built_submission = copy.deepcopy(submission)
+    build_submission(built_submission, request)
+
+    return [
+        ("_csv_file_lines", lambda: (_csv_file_lines(csv_variants), _csv_file_lines(csv_casedata))),
+        ("_tsv_file_lines", lambda: (_tsv_file_lines(tsv_variants), _tsv_file_lines(tsv_casedata))),
+        (
+            "file_fields_to_submission",
+            lambda: file_fields_to_submission(variants_lines, casedata_lines),
+        ),
+        ("build_submission", lambda: build_submission(submission, request)),
+        ("validate_submission", lambda: validate_submission(built_submission)),
+    ]
+
+
+def measure(stage: Callable[[], object], n_rows: int) -> Dict[str, float]:
+    """Run a stage and measure its throughput and the peak memory it allocates
+
+    Args:
+        stage(function): the stage to measure
+        n_rows(int): number of rows processed by each run of the stage
+
+    Returns:
+        result(dict): Example: {"rows_per_second": 51234.5, "peak_memory_kb": 1250.3}
+    """
+    # Memory is traced in a separate run, since tracing slows down the stage
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        stage()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_DURATION:
+            break
+
+    return {
+        "rows_per_second": round(runs * n_rows / elapsed, 1),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> List[str]:
+    """Compare benchmark results with the baselines
+
+    Args:
+        results(dict): Example: {"1000": {"_csv_file_lines": {"rows_per_second": .., "peak_memory_kb": ..}, ..}, ..}
+        baselines(dict): results stored by a previous run, with the same structure
+        tolerance(float): accepted relative difference. Example: 0.25
+
+    Returns:
+        regressions(list): Example: ["1000 rows, validate_submission: 5123.0 rows/s, baseline 8000.0 rows/s"]
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            baseline = baselines.get(size, {}).get(stage)
+            if baseline is None:
+                continue
+            if result["rows_per_second"] < baseline["rows_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{size} rows, {stage}: {result['rows_per_second']} rows/s, baseline {baseline['rows_per_second']} rows/s"
+                )
+            if result["peak_memory_kb"] > baseline["peak_memory_kb"] * (1 + tolerance):
+                regressions.append(
+                    f"{size} rows, {stage}: {result['peak_memory_kb']} KiB peak memory, baseline {baseline['peak_memory_kb']} KiB"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Path to the baselines file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Accepted relative regression"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Save the results as the new baselines"
+    )
+    args = parser.parse_args()
+
+    validate_submission({})  # Build the validators before measuring
+
+    results = {}
+    print(f"{'rows':>8}  {'stage':<26}{'rows/s':>14}{'peak KiB':>14}")
+    for n_rows in args.sizes:
+        results[str(n_rows)] = {}
+        for stage_name, stage in prepare_stages(n_rows):
+            result = measure(stage, n_rows)
+            results[str(n_rows)][stage_name] = result
+            print(
+                f"{n_rows:>8}  {stage_name:<26}{result['rows_per_second']:>14.1f}{result['peak_memory_kb']:>14.1f}"
+            )
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baselines = json.load(baseline_file)
+        baselines.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baselines saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baselines found at {args.baseline}")
+        return
+    with open(args.baseline) as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions compared to the baselines")
+
+
+if __name__ == "__main__":
+    main()
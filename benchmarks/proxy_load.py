@@ -0,0 +1,216 @@
+"""Load test of the proxy endpoints (/apitest, /dry-run, /status and /delete) against a local stand-in for the ClinVar API.
+
+Requests are sent by a number of concurrent users, each with its own API key, and the throughput, latency percentiles
+and error rate of each endpoint are reported. Responses with a status code of 400 or more and failed requests are
+counted as errors.
+
+By default preClinVar and the fake ClinVar API (preClinVar/fake_clinvar.py) run in this process, connected by ASGI
+transports, and the fake API is configured with --latency, --error-rate and --payload-size. To measure a deployment
+(for instance gunicorn with a given number of workers), start the fake API and a preClinVar server pointed to it,
+and pass the URL of the server with --url:
+
+    python -m preClinVar.fake_clinvar --port 8001 --latency 0.2 &
+    CLINVAR_API_URL=http://127.0.0.1:8001 gunicorn --workers 4 --worker-class uvicorn.workers.UvicornWorker \\
+        --bind 127.0.0.1:8000 preClinVar.main:app &
+    PYTHONPATH=. python benchmarks/proxy_load.py --url http://127.0.0.1:8000 --concurrency 50
+
+Usage:
+    PYTHONPATH=. python benchmarks/proxy_load.py [--concurrency 20] [--requests 200] [--latency 0.1]
+        [--error-rate 0.01] [--payload-size 2000] [--endpoints status delete]
+"""
+
+import argparse
+import asyncio
+import itertools
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from preClinVar.clinvar_client import create_client, get_clinvar_client
+from preClinVar.demo import germline_subm_json_path
+from preClinVar.fake_clinvar import create_fake_clinvar_app
+from preClinVar.main import app
+
+ENDPOINTS = ["apitest", "dry-run", "status", "delete"]
+TIMEOUT = 120
+
+with open(germline_subm_json_path, "rb") as json_file:
+    SUBMISSION = json_file.read()
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Return the percentile of sorted values, using the nearest-rank method"""
+    if not sorted_values:
+        return math.nan
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def endpoint_request(endpoint: str, api_key: str, n_request: int, n_submissions: int) -> dict:
+    """Return the arguments of a request to an endpoint
+
+    Args:
+        endpoint(str): one of ENDPOINTS
+        api_key(str): API key of the user sending the request
+        n_request(int): number of the request, used to choose the submission whose status is requested
+        n_submissions(int): number of submissions whose status is requested, the others coming from the cache
+    """
+    if endpoint in ["apitest", "dry-run"]:
+        return {
+            "data": {"api_key": api_key},
+            "files": {"json_file": ("subm.json", SUBMISSION)},
+        }
+    if endpoint == "status":
+        return {
+            "data": {"api_key": api_key, "submission_id": f"SUB{n_request % n_submissions:08d}"}
+        }
+    return {"data": {"api_key": api_key, "clinvar_accession": f"SCV{n_request:09d}"}}
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    endpoints: List[str],
+    n_requests: int,
+    concurrency: int,
+    n_submissions: int,
+) -> Tuple[Dict[str, List[Tuple[float, Optional[int]]]], float]:
+    """Send n_requests to each endpoint, the requests being shared among concurrent users
+
+    Returns:
+        results(dict): latency in seconds and status code (None if the request failed) of each request, by endpoint
+        elapsed(float): duration of the test in seconds
+    """
+    # Requests to the different endpoints are interleaved
+    queue = [endpoint for _ in range(n_requests) for endpoint in endpoints]
+    counter = itertools.count()
+    results: Dict[str, List[Tuple[float, Optional[int]]]] = {endpoint: [] for endpoint in endpoints}
+
+    async def user(api_key: str):
+        while True:
+            n_request = next(counter)
+            if n_request >= len(queue):
+                return
+            endpoint = queue[n_request]
+            start = time.perf_counter()
+            try:
+                resp = await client.post(
+                    f"/{endpoint}", **endpoint_request(endpoint, api_key, n_request, n_submissions)
+                )
+                status_code: Optional[int] = resp.status_code
+            except httpx.HTTPError:
+                status_code = None
+            results[endpoint].append((time.perf_counter() - start, status_code))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[user(f"load_test_key_{n_user}") for n_user in range(concurrency)])
+    return results, time.perf_counter() - start
+
+
+def print_report(results: Dict[str, List[Tuple[float, Optional[int]]]], elapsed: float):
+    print(
+        f"{'endpoint':<10}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}"
+    )
+    all_results = [result for endpoint_results in results.values() for result in endpoint_results]
+    for endpoint, endpoint_results in [*results.items(), ("total", all_results)]:
+        latencies = sorted(latency * 1000 for latency, _ in endpoint_results)
+        errors = sum(1 for _, status in endpoint_results if status is None or status >= 400)
+        print(
+            f"{endpoint:<10}{len(endpoint_results):>9}{len(endpoint_results) / elapsed:>9.1f}"
+            f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+            f"{errors / max(len(endpoint_results), 1):>9.1%}"
+        )
+    status_codes: Dict[str, int] = {}
+    for _, status in all_results:
+        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+    print("Status codes:", ", ".join(f"{code}: {n}" for code, n in sorted(status_codes.items())))
+
+
+async def load_test(args: argparse.Namespace):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=TIMEOUT) as client:
+            results, elapsed = await run_load(
+                client, args.endpoints, args.requests, args.concurrency, args.submissions
+            )
+        print_report(results, elapsed)
+        return
+
+    fake_clinvar = create_fake_clinvar_app(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        payload_size=args.payload_size,
+        seed=0,
+    )
+    async with create_client(transport=httpx.ASGITransport(app=fake_clinvar)) as clinvar_client:
+
+        async def fake_clinvar_client():
+            yield clinvar_client
+
+        app.dependency_overrides[get_clinvar_client] = fake_clinvar_client
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://preclinvar",
+                timeout=TIMEOUT,
+            ) as client:
+                results, elapsed = await run_load(
+                    client, args.endpoints, args.requests, args.concurrency, args.submissions
+                )
+        finally:
+            app.dependency_overrides.pop(get_clinvar_client)
+    print_report(results, elapsed)
+    print(
+        f"ClinVar API: {fake_clinvar.state.requests} requests received, "
+        f"at most {fake_clinvar.state.max_in_flight} at the same time"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--url", help="URL of a running preClinVar server, instead of the app of this process"
+    )
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of concurrent users")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Number of requests sent to each endpoint"
+    )
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument(
+        "--submissions",
+        type=int,
+        default=100,
+        help="Number of different submissions whose status is requested",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.1, help="Seconds waited by the fake ClinVar API"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of the requests failing with a 503 in the fake ClinVar API",
+    )
+    parser.add_argument(
+        "--payload-size",
+        type=int,
+        default=0,
+        help="Length of the message added to the statuses returned by the fake ClinVar API",
+    )
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests per endpoint, {args.concurrency} concurrent users")
+    if args.url:
+        print(f"preClinVar server: {args.url}")
+    else:
+        print(
+            f"Fake ClinVar API: latency {args.latency}s, error rate {args.error_rate:.1%}, "
+            f"payload size {args.payload_size}"
+        )
+    asyncio.run(load_test(args))
+
+
+if __name__ == "__main__":
+    main()
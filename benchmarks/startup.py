@@ -0,0 +1,100 @@
+"""Measure how long a new preClinVar server takes to answer its first requests: the time from the start of the process
+to the first 200 response of the / endpoint, and of the /validate endpoint with the demo germline submission.
+
+Each run starts uvicorn in a new process, as a cold-started container or a recycled gunicorn worker would.
+Run it with and without the prebuilt schema to compare (`python -m preClinVar.schema_artifact` builds it).
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--env SCHEMA_ARTIFACT_PATH= --env VALIDATOR_WARM_UP=false]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from preClinVar.demo import germline_subm_json_path
+
+POLL_INTERVAL = 0.005
+TIMEOUT = 60
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_startup(env: Dict[str, str]) -> Dict[str, float]:
+    """Start a server and measure the seconds elapsed until the first 200 responses of / and /validate
+
+    Returns:
+        timings(dict): Example: {"/": 0.71, "/validate": 0.74}
+    """
+    port = free_port()
+    with open(germline_subm_json_path, "rb") as json_file:
+        content = json_file.read()
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "preClinVar.main:app", "--port", str(port)],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < TIMEOUT:
+                try:
+                    if client.get("/").status_code == 200:
+                        timings["/"] = time.perf_counter() - start
+                        break
+                except httpx.TransportError:
+                    time.sleep(POLL_INTERVAL)
+            else:
+                raise RuntimeError(f"Server did not start within {TIMEOUT} seconds")
+
+            resp = client.post("/validate", files={"json_file": ("subm.json", content)})
+            resp.raise_for_status()
+            timings["/validate"] = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Number of servers started")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Environment variable of the server, can be repeated",
+    )
+    args = parser.parse_args()
+    env = dict(variable.split("=", 1) for variable in args.env)
+
+    runs: List[Dict[str, float]] = [measure_startup(env) for _ in range(args.runs)]
+    for run in runs:
+        # Time spent by the first validation, without the startup of the server
+        run["/validate - /"] = run["/validate"] - run["/"]
+    print(f"Time to first 200 over {args.runs} runs (median, min, max):")
+    for endpoint in ["/", "/validate", "/validate - /"]:
+        timings = [run[endpoint] * 1000 for run in runs]
+        print(
+            f"  {endpoint:<13} {statistics.median(timings):7.0f} ms "
+            f"{min(timings):7.0f} ms {max(timings):7.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
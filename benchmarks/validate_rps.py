@@ -0,0 +1,65 @@
+"""Compare requests per second of the /validate endpoint when the submission schema is loaded on every request
+(as preClinVar did up to v2.8.1) and when the precompiled validator is reused.
+
+Usage:
+    python benchmarks/validate_rps.py [--requests 200]
+"""
+
+import argparse
+import json
+import time
+from typing import List, Tuple
+
+from fastapi.testclient import TestClient
+from jsonschema import Draft7Validator
+
+import preClinVar.main
+from preClinVar.demo import germline_subm_json_path
+from preClinVar.resources import subm_schema_path
+from preClinVar.validate import validate_submission
+
+
+def legacy_validate_submission(submission_dict: dict) -> Tuple[bool, List[str]]:
+    """Validation as it was done before the validator was cached: schema read and validator built at each call."""
+    errors = []
+    with open(subm_schema_path) as schema_file:
+        schema = json.load(schema_file)
+        v = Draft7Validator(schema)
+        for error in sorted(v.iter_errors(submission_dict), key=str):
+            errors.append(error.message)
+    return errors == [], errors
+
+
+def requests_per_second(client: TestClient, n_requests: int) -> float:
+    """Send n_requests to the /validate endpoint and return the number of requests served per second"""
+    with open(germline_subm_json_path, "rb") as json_file:
+        content = json_file.read()
+
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        resp = client.post("/validate", files={"json_file": ("subm.json", content)})
+        assert resp.status_code == 200
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests for each run")
+    args = parser.parse_args()
+
+    client = TestClient(preClinVar.main.app)
+
+    preClinVar.main.validate_submission = legacy_validate_submission
+    before = requests_per_second(client, args.requests)
+
+    preClinVar.main.validate_submission = validate_submission
+    # Build the validator before measuring, as it happens after the first request
+    validate_submission({})
+    after = requests_per_second(client, args.requests)
+
+    print(f"Schema loaded at each request: {before:.1f} requests/s")
+    print(f"Precompiled validator:         {after:.1f} requests/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Measure the resident memory of gunicorn workers with and without the app-preload mode (GUNICORN_PRELOAD).
+
+For each mode, gunicorn is started with the configuration of the Docker image and a number of workers, requests
+validating and converting the demo submissions are sent to them, and the memory of each worker is read from
+/proc/<pid>/smaps_rollup (Linux only):
+- RSS: pages resident in memory, including the pages shared with the master and the other workers
+- PSS: proportional set size, shared pages being divided between the processes sharing them
+- Private: pages used only by the worker, which is the memory added by each new worker
+
+Usage:
+    python benchmarks/worker_memory.py [--workers 4] [--requests 40]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from preClinVar.demo import casedata_snv_csv_path, germline_subm_json_path, variants_hgvs_csv_path
+
+TIMEOUT = 60
+MEMORY_FIELDS = {"Rss": "RSS", "Pss": "PSS", "Private_Clean": "Private", "Private_Dirty": "Private"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """Return the RSS, PSS and private memory of a process, in MiB"""
+    memory = {"RSS": 0.0, "PSS": 0.0, "Private": 0.0}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            field, _, value = line.partition(":")
+            if field in MEMORY_FIELDS:
+                memory[MEMORY_FIELDS[field]] += int(value.split()[0]) / 1024
+    return memory
+
+
+def worker_pids(master_pid: int) -> List[int]:
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as children:
+        return [int(pid) for pid in children.read().split()]
+
+
+def send_requests(client: httpx.Client, n_requests: int):
+    """Validate and convert the demo submissions, so that every worker builds the objects needed by these requests"""
+    with open(germline_subm_json_path, "rb") as json_file:
+        submission = json_file.read()
+    with open(variants_hgvs_csv_path, "rb") as variants, open(
+        casedata_snv_csv_path, "rb"
+    ) as casedata:
+        files = [
+            ("files", ("Variant.csv", variants.read())),
+            ("files", ("CaseData.csv", casedata.read())),
+        ]
+    for _ in range(n_requests):
+        client.post("/validate", files={"json_file": ("subm.json", submission)}).raise_for_status()
+        client.post("/csv_2_json", files=files).raise_for_status()
+
+
+def measure_workers(preload: bool, n_workers: int, n_requests: int) -> Dict[str, Dict[str, float]]:
+    """Start gunicorn and measure the memory of its master and workers after serving requests
+
+    Returns:
+        memory(dict): Example: {"master": {"RSS": 62.1, ..}, "worker": {"RSS": 71.5, "PSS": 40.2, "Private": 30.8}}
+            with the mean of the workers
+    """
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config=python:preClinVar.gunicorn_conf",
+            f"--workers={n_workers}",
+            "--worker-class=uvicorn.workers.UvicornWorker",
+            f"--bind=127.0.0.1:{port}",
+            "--access-logfile=-",
+            "preClinVar.main:app",
+        ],
+        env={**os.environ, "GUNICORN_PRELOAD": str(preload).lower()},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=TIMEOUT) as client:
+            start = time.perf_counter()
+            while len(worker_pids(server.pid)) < n_workers or not _is_up(client):
+                if time.perf_counter() - start > TIMEOUT:
+                    raise RuntimeError(f"Server did not start within {TIMEOUT} seconds")
+                time.sleep(0.1)
+            send_requests(client, n_requests)
+        workers = [process_memory(pid) for pid in worker_pids(server.pid)]
+        return {
+            "master": process_memory(server.pid),
+            "worker": {
+                field: statistics.mean(worker[field] for worker in workers) for field in workers[0]
+            },
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _is_up(client: httpx.Client) -> bool:
+    try:
+        return client.get("/").status_code == 200
+    except httpx.TransportError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4, help="Number of gunicorn workers")
+    parser.add_argument(
+        "--requests", type=int, default=40, help="Number of validations and conversions sent"
+    )
+    args = parser.parse_args()
+
+    print(f"Memory of {args.workers} workers, in MiB (mean of the workers):")
+    print(f"{'':<12}{'process':<8}{'RSS':>8}{'PSS':>8}{'Private':>9}")
+    for preload in [False, True]:
+        memory = measure_workers(preload, args.workers, args.requests)
+        for process, values in memory.items():
+            print(
+                f"{'preload' if preload else 'no preload':<12}{process:<8}"
+                f"{values['RSS']:8.1f}{values['PSS']:8.1f}{values['Private']:9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
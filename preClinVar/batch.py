@@ -0,0 +1,169 @@
+"""Extraction of the files uploaded to the batch conversion endpoints, as archives or plain files,
+and matching of their Variant and CaseData files in pairs by filename prefix.
+"""
+
+import io
+import os
+import re
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from preClinVar.json_stream import dumps
+
+###### Batch conversion settings, can be overridden by environment variables ######
+# Maximum total size of the files extracted from the uploaded archives and files, in bytes
+BATCH_MAX_EXTRACTED_BYTES = int(os.getenv("BATCH_MAX_EXTRACTED_BYTES", str(1024 * 1024 * 1024)))
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Checked in this order, since the name of a CaseData file may contain "variant"
+FILE_KINDS = [
+    ("casedata", re.compile("CaseData", re.IGNORECASE)),
+    ("variants", re.compile("Variant", re.IGNORECASE)),
+]
+
+
+class BatchOutput(str, Enum):
+    """Format of the results of a batch conversion"""
+
+    NDJSON = "ndjson"
+    ZIP = "zip"
+
+
+class ArchiveError(ValueError):
+    """Raised when uploaded archives can't be read or are too large"""
+
+
+def _is_hidden(name: str) -> bool:
+    """Return True for the metadata files added to archives by some operating systems"""
+    return name.startswith("__MACOSX/") or os.path.basename(name).startswith(".")
+
+
+def _archive_members(upload_file: UploadFile) -> Optional[Iterator[Tuple[str, int, Callable]]]:
+    """Return the files of an uploaded archive as (name, size, read function) tuples, or None if it's not an archive"""
+    import tarfile
+    import zipfile
+
+    filename = upload_file.filename.lower()
+    upload_file.file.seek(0)
+    if filename.endswith(ZIP_EXTENSIONS):
+        archive = zipfile.ZipFile(upload_file.file)
+        return (
+            (info.filename, info.file_size, lambda info=info: archive.read(info))
+            for info in archive.infolist()
+            if not info.is_dir()
+        )
+    if filename.endswith(TAR_EXTENSIONS):
+        archive = tarfile.open(fileobj=upload_file.file, mode="r:*")
+        return (
+            (member.name, member.size, lambda member=member: archive.extractfile(member).read())
+            for member in archive.getmembers()
+            if member.isfile()
+        )
+    return None
+
+
+def extract_files(
+    upload_files: List[UploadFile], max_bytes: int = BATCH_MAX_EXTRACTED_BYTES
+) -> List[UploadFile]:
+    """Read in memory the files contained in the uploaded zip and tar archives, and the uploaded plain files
+
+    Args:
+        upload_files(list): the uploaded archives or files
+        max_bytes(int): maximum total size of the extracted files
+
+    Returns:
+        files(list): picklable UploadFile objects, named with their path in the archive. Example: "batch1/sample1_Variant.csv"
+    """
+    import tarfile
+    import zipfile
+
+    extracted = []
+    total_size = 0
+    for upload_file in upload_files:
+        try:
+            members = _archive_members(upload_file)
+            if members is None:
+                upload_file.file.seek(0)
+                contents = upload_file.file.read()
+                members = [
+                    (upload_file.filename, len(contents), lambda contents=contents: contents)
+                ]
+            for name, size, read in members:
+                if _is_hidden(name):
+                    continue
+                total_size += size
+                if total_size > max_bytes:
+                    raise ArchiveError(f"Uploaded files exceed {max_bytes} bytes once extracted")
+                extracted.append(UploadFile(io.BytesIO(read()), filename=name))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as ex:
+            raise ArchiveError(f"Malformed archive {upload_file.filename}: {ex}")
+    return extracted
+
+
+def file_pair_key(filename: str) -> Optional[Tuple[str, str]]:
+    """Return the kind of a submission file and the prefix identifying its pair, from its name
+
+    Example:
+        "batch1/sample1_Variant.csv" -> ("variants", "batch1/sample1")
+        "sample1.CaseData.csv" -> ("casedata", "sample1")
+
+    Returns:
+        kind, prefix(tuple) or None if the file is neither a Variant nor a CaseData file
+    """
+    directory, _, basename = filename.replace("\\", "/").rpartition("/")
+    for kind, pattern in FILE_KINDS:
+        match = pattern.search(basename)
+        if match:
+            prefix = basename[: match.start()].rstrip("._- ")
+            return kind, "/".join(part for part in [directory, prefix] if part)
+    return None
+
+
+def match_file_pairs(files: List[UploadFile]) -> Dict[str, Dict[str, List[UploadFile]]]:
+    """Group the Variant and CaseData files by prefix. Files which are neither Variant nor CaseData files are ignored
+
+    Returns:
+        pairs(dict): Example: {"sample1": {"variants": [UploadFile], "casedata": [UploadFile]}, ..}, sorted by prefix
+    """
+    pairs = {}
+    for upload_file in files:
+        pair_key = file_pair_key(upload_file.filename)
+        if pair_key is None:
+            continue
+        kind, prefix = pair_key
+        pairs.setdefault(prefix, {"variants": [], "casedata": []})[kind].append(upload_file)
+    return dict(sorted(pairs.items()))
+
+
+def result_line(result: dict, submission: Optional[bytes] = None) -> bytes:
+    """Encode the result of the conversion of a pair of files as a line of NDJSON
+
+    Args:
+        result(dict): Example: {"pair": "sample1", "files": [..], "status_code": 200}
+        submission(bytes): the json submission created from the files, if they were converted
+
+    Returns:
+        line(bytes): Example: b'{"pair":"sample1","files":[..],"status_code":200,"submission":{..}}\n'
+    """
+    encoded = dumps(result)
+    if submission is not None:
+        encoded = encoded[:-1] + b',"submission":' + submission + b"}"
+    return encoded + b"\n"
+
+
+def results_archive(results: List[Tuple[dict, Optional[bytes]]]) -> bytes:
+    """Create a zip archive containing a json file for each converted pair of files,
+    named after the prefix of the pair, and the results of all the pairs in results.ndjson
+    """
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result, submission in results:
+            if submission is not None:
+                archive.writestr(f"{result['pair'] or 'submission'}.json", submission)
+        archive.writestr("results.ndjson", b"".join(result_line(result) for result, _ in results))
+    return buffer.getvalue()
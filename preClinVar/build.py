@@ -1,3 +1,9 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+from preClinVar.constants import SUBMISSION_ITEMS_KEYS
+from preClinVar.metrics import timed_stage
+
 OPTIONAL_SUBMISSION_PARAMS = {
     "submissionName": "submissionName",
     "releaseStatus": "clinvarSubmissionReleaseStatus",
@@ -6,6 +12,8 @@ OPTIONAL_ASSERTION_CRITERIA = {
     "assertionCriteriaDB": "db",
     "assertionCriteriaID": "id",
 }
+# All request parameters modifying the submission object
+SUBMISSION_QUERY_PARAMS = [*OPTIONAL_SUBMISSION_PARAMS, *OPTIONAL_ASSERTION_CRITERIA, "assembly"]
 
 
 def build_header(api_key):
@@ -24,6 +32,90 @@ def build_header(api_key):
     return header
 
 
+def build_add_data_payload(content):
+    """Creates the body of a POST request adding data to ClinVar
+
+    Args:
+        content(dict): a submission or a deletion object
+
+    Returns:
+        data(dict): a dictionary with an "AddData" action containing the provided content
+    """
+    data = {
+        "actions": [
+            {
+                "type": "AddData",
+                "targetDb": "clinvar",
+                "data": {"content": content},
+            }
+        ]
+    }
+    return data
+
+
+def count_items(subm_obj: dict) -> int:
+    """Return the number of items of a submission object, in all its lists of items"""
+    return sum(
+        len(subm_obj[key]) for key in SUBMISSION_ITEMS_KEYS if isinstance(subm_obj.get(key), list)
+    )
+
+
+def split_submission(
+    subm_obj: dict, max_items: Optional[int] = None, max_bytes: Optional[int] = None
+) -> List[dict]:
+    """Split a submission object into submissions containing at most max_items items each, and whose json encoding
+    doesn't exceed max_bytes. Items of all the lists of items (clinvarSubmission, germlineSubmission ..) are split,
+    in their original order. An item exceeding max_bytes on its own is put alone in a submission.
+
+    Args:
+        subm_obj(dict): a submission object like this { "clinvarSubmission" : [list of submission items], "submissionName": .. }
+        max_items(int): maximum number of items in each submission
+        max_bytes(int): maximum size of each submission, encoded in json as by json.dumps
+
+    Returns:
+        chunks(list): submission objects with the same top-level fields (assertionCriteria, submissionName, ..) of the original submission
+    """
+    items_keys = [key for key in SUBMISSION_ITEMS_KEYS if isinstance(subm_obj.get(key), list)]
+    if not items_keys:
+        return [subm_obj]
+
+    # Size of the top-level fields, and of each item with the separator preceding it in a list
+    size = base_size = len(
+        json.dumps({key: [] if key in items_keys else value for key, value in subm_obj.items()})
+    )
+    chunks_items: List[List[Tuple[str, dict]]] = [[]]
+    for key in items_keys:
+        for item in subm_obj[key]:
+            item_size = len(json.dumps(item)) + 2 if max_bytes else 0
+            current = chunks_items[-1]
+            if current and (
+                (max_items and len(current) >= max_items)
+                or (max_bytes and size + item_size > max_bytes)
+            ):
+                current = []
+                chunks_items.append(current)
+                size = base_size
+            current.append((key, item))
+            size += item_size
+
+    if len(chunks_items) == 1:
+        return [subm_obj]
+
+    chunks = []
+    for chunk_items in chunks_items:
+        items_by_key: Dict[str, List[dict]] = {}
+        for key, item in chunk_items:
+            items_by_key.setdefault(key, []).append(item)
+        chunks.append(
+            {
+                key: items_by_key[key] if key in items_keys else value
+                for key, value in subm_obj.items()
+                if key not in items_keys or key in items_by_key
+            }
+        )
+    return chunks
+
+
 def build_submission(subm_obj, request):
     """Parse request parameters and add items to a growing submission object dictionary
 
@@ -32,6 +124,12 @@ def build_submission(subm_obj, request):
         request()
 
     """
+    with timed_stage("build_submission", rows=len(subm_obj.get("clinvarSubmission", []))):
+        _set_submission_params(subm_obj, request)
+
+
+def _set_submission_params(subm_obj, request):
+    """Add the optional request parameters to a submission object and set the genome assembly of its variants"""
     # Add items to submission if user provides any of the optional fields from OPTIONAL_SUBMISSION_PARAMS
     query_params = dict(request.query_params)
     for q_key, subm_key in OPTIONAL_SUBMISSION_PARAMS.items():
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from preClinVar.build import SUBMISSION_QUERY_PARAMS
+from preClinVar.metrics import CACHE_METRICS
+
+CHUNK_SIZE = 64 * 1024  # Bytes read at a time when hashing a file
+
+###### Cache of the files converted to json submissions, can be configured by environment variables ######
+CONVERSION_CACHE_MAX_ENTRIES = int(os.getenv("CONVERSION_CACHE_MAX_ENTRIES", "128"))
+CONVERSION_CACHE_MAX_BYTES = int(os.getenv("CONVERSION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CONVERSION_CACHE_TTL = float(os.getenv("CONVERSION_CACHE_TTL", "3600"))
+
+###### Cache of the submission statuses returned by the ClinVar API, can be configured by environment variables ######
+STATUS_CACHE_MAX_ENTRIES = int(os.getenv("STATUS_CACHE_MAX_ENTRIES", "10000"))
+# Seconds during which the status of a submission being processed is reused
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "5"))
+# Seconds during which a final status (processed or error), which doesn't change anymore, is reused
+STATUS_CACHE_TERMINAL_TTL = float(os.getenv("STATUS_CACHE_TERMINAL_TTL", "600"))
+TERMINAL_STATUSES = {"processed", "error"}
+
+
+def file_digest(file_obj, chunk_size: int = CHUNK_SIZE) -> str:
+    """Compute the SHA-256 hash of a binary file, reading it in chunks. The file is then rewound to its start.
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+
+    Returns:
+        digest(str): hexadecimal SHA-256 hash of the file content
+    """
+    sha = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        sha.update(chunk)
+    file_obj.seek(0)
+    return sha.hexdigest()
+
+
+class LRUCache:
+    """A thread-safe least recently used cache with expiring entries, bounded by number of entries and total size of the values"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries(int): maximum number of entries. 0 disables the cache
+            max_size(int): maximum total size of the cached values
+            ttl(float): default number of seconds after which an entry expires
+            clock(function): function returning the current time in seconds
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size, expiry time)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_size > 0
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value cached for a key, or None if the key is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= self.clock():
+                if entry is not None:
+                    self._remove(key)
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: int = 1, ttl: Optional[float] = None):
+        """Add a value to the cache, evicting the least recently used entries if the cache is full
+
+        Args:
+            key(hashable): key of the entry
+            value: the value to store
+            size(int): size of the value, for instance its length in bytes
+            ttl(float): seconds after which the entry expires, if different from the default ttl of the cache
+        """
+        if not self.enabled or size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expiry = self.clock() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (value, size, expiry)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """Return the usage statistics of the cache
+
+        Returns:
+            stats(dict): Example: {"entries": 2, "size": 3510, "hits": 5, "misses": 2, "evictions": 0, "hit_ratio": 0.71}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def conversion_cache_key(
+    file_type: str, variants_file_obj, casedata_file_obj, query_params: Mapping[str, str]
+) -> Tuple[str, str, str, Tuple]:
+    """Create the key identifying the conversion of a Variant and a CaseData file into a json submission
+
+    Args:
+        file_type(str): "tsv" or "csv"
+        variants_file_obj(file-like object): the binary Variant file
+        casedata_file_obj(file-like object): the binary CaseData file
+        query_params(dict-like): request parameters
+
+    Returns:
+        key(tuple): file type, hashes of the files content and values of the parameters modifying the submission
+    """
+    return (
+        file_type,
+        file_digest(variants_file_obj),
+        file_digest(casedata_file_obj),
+        tuple(query_params.get(param) for param in SUBMISSION_QUERY_PARAMS),
+    )
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single call, whose result is shared by all the callers"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]) -> Any:
+        """Await func(), or the call with the same key already in progress
+
+        Args:
+            key(hashable): key identifying the call
+            func(function): coroutine function called if no call with the same key is in progress
+
+        Returns:
+            the result of the call. Exceptions are raised to all the callers
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            call = self._calls[key] = asyncio.ensure_future(func())
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        # A caller being cancelled doesn't cancel the call awaited by the others
+        return await asyncio.shield(call)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "coalesced": self.coalesced}
+
+
+def status_cache_key(endpoint: str, api_key: str, submission_id: str) -> Tuple[str, str, str]:
+    """Create the key identifying the status of a submission, as seen with an API key
+
+    Returns:
+        key(tuple): endpoint, SHA-256 hash of the API key and submission ID
+    """
+    return endpoint, hashlib.sha256(api_key.encode()).hexdigest(), submission_id
+
+
+def status_ttl(actions: dict) -> float:
+    """Return the number of seconds a submission status is cached, longer if the status is final
+
+    Args:
+        actions(dict): the actions of a submission returned by the ClinVar API. Example: {"actions": [{"status": "processed", ..}]}
+    """
+    try:
+        status = actions["actions"][0]["status"]
+    except (KeyError, IndexError, TypeError):
+        return STATUS_CACHE_TTL
+    return STATUS_CACHE_TERMINAL_TTL if status in TERMINAL_STATUSES else STATUS_CACHE_TTL
+
+
+conversion_cache = LRUCache(
+    max_entries=CONVERSION_CACHE_MAX_ENTRIES,
+    max_size=CONVERSION_CACHE_MAX_BYTES,
+    ttl=CONVERSION_CACHE_TTL,
+)
+# Each status counts as one entry of size 1
+status_cache = LRUCache(
+    max_entries=STATUS_CACHE_MAX_ENTRIES,
+    max_size=STATUS_CACHE_MAX_ENTRIES,
+    ttl=STATUS_CACHE_TTL,
+)
+status_lookups = SingleFlight()
+
+CACHE_METRICS.register("conversion", conversion_cache.stats)
+CACHE_METRICS.register("status", lambda: {**status_cache.stats(), **status_lookups.stats()})
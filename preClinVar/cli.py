@@ -0,0 +1,246 @@
+"""Offline conversion of a folder of Variant and CaseData files into json submissions, using a pool of processes.
+
+Example:
+    preclinvar-convert submissions/ --output-dir json_submissions/ --assembly GRCh37 --processes 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+
+from preClinVar.batch import file_pair_key
+from preClinVar.columnar import DEFAULT_ENGINE, ConversionEngine
+from preClinVar.convert import ConversionError, convert_files
+from preClinVar.file_parser import csv_lines, tsv_lines
+from preClinVar.validate import MAX_ERRORS, VALIDATION_PROCESSES, ValidationMode
+
+LINES_PARSERS = {"tsv": tsv_lines, "csv": csv_lines}
+# Command-line options setting the submission parameters, with the name of the query parameter of the endpoints
+SUBMISSION_OPTIONS = {
+    "assembly": "assembly",
+    "submission_name": "submissionName",
+    "release_status": "releaseStatus",
+    "assertion_criteria_db": "assertionCriteriaDB",
+    "assertion_criteria_id": "assertionCriteriaID",
+}
+
+
+def find_file_pairs(input_dir: str) -> Dict[str, Dict[str, List[str]]]:
+    """Find the Variant and CaseData files of a folder and its subfolders, grouped by prefix (see batch.file_pair_key)
+
+    Returns:
+        pairs(dict): Example: {"batch1/sample1": {"variants": ["batch1/sample1_Variant.csv"], "casedata": [..]}, ..}
+            with paths relative to input_dir, sorted by prefix
+    """
+    pairs = {}
+    for root, dirs, filenames in os.walk(input_dir):
+        dirs[:] = sorted(directory for directory in dirs if not directory.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = os.path.relpath(os.path.join(root, filename), input_dir)
+            pair_key = file_pair_key(path)
+            if pair_key is None:
+                continue
+            kind, prefix = pair_key
+            pairs.setdefault(prefix, {"variants": [], "casedata": []})[kind].append(path)
+    return dict(sorted(pairs.items()))
+
+
+def file_type_of(path: str) -> str:
+    """Return "tsv" for files with .tsv or .txt extension (optionally followed by .gz or .zst), "csv" otherwise"""
+    path = re.sub(r"\.(gz|zst)$", "", path.lower())
+    return "tsv" if path.endswith((".tsv", ".txt")) else "csv"
+
+
+def convert_pair(
+    prefix: str,
+    pair: Dict[str, List[str]],
+    input_dir: str,
+    output_dir: str,
+    query_params: Dict[str, str],
+    file_type: Optional[str] = None,
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    engine: ConversionEngine = DEFAULT_ENGINE,
+    processes: int = 1,
+) -> dict:
+    """Convert a pair of Variant and CaseData files and write the json submission to the output folder
+
+    Returns:
+        result(dict): Example: {"pair": "sample1", "status": "converted", "output": "out/sample1.json", "items": 10, "bytes": 5310, "seconds": 0.02}
+            or {"pair": "sample1", "status": "failed", "message": "..", ..}
+    """
+    start = time.perf_counter()
+    result = {"pair": prefix, "items": 0, "bytes": 0}
+    for kind, label in [("variants", "Variant"), ("casedata", "CaseData")]:
+        if len(pair[kind]) != 1:
+            return {
+                **result,
+                "status": "failed",
+                "message": f"Expected one {label} file, found {len(pair[kind])}",
+                "seconds": 0.0,
+            }
+
+    variants_path = os.path.join(input_dir, pair["variants"][0])
+    casedata_path = os.path.join(input_dir, pair["casedata"][0])
+    output_path = os.path.join(output_dir, f"{prefix or 'submission'}.json")
+    try:
+        result["bytes"] = os.path.getsize(variants_path) + os.path.getsize(casedata_path)
+        with open(variants_path, "rb") as variants_file, open(casedata_path, "rb") as casedata_file:
+            file_type = file_type or file_type_of(variants_path)
+            submission, n_items = convert_files(
+                UploadFile(variants_file, filename=pair["variants"][0]),
+                UploadFile(casedata_file, filename=pair["casedata"][0]),
+                LINES_PARSERS[file_type],
+                file_type,
+                query_params,
+                validation_mode,
+                max_errors,
+                engine,
+                processes,
+            )
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "wb") as output_file:
+            output_file.write(submission)
+    # Files that can't be read or written (missing, unreadable, disk full ..) only fail their pair
+    except (ConversionError, OSError) as ex:
+        return {
+            **result,
+            "status": "failed",
+            "message": str(ex),
+            "seconds": time.perf_counter() - start,
+        }
+
+    return {
+        **result,
+        "status": "converted",
+        "output": output_path,
+        "items": n_items,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _convert_pair_task(task: tuple) -> dict:
+    """Unpack the arguments of convert_pair, for Pool.imap_unordered"""
+    return convert_pair(*task)
+
+
+def throughput_summary(results: List[dict], elapsed: float) -> str:
+    """Format the number of converted and failed pairs, and the conversion throughput"""
+    converted = [result for result in results if result["status"] == "converted"]
+    n_items = sum(result["items"] for result in converted)
+    n_bytes = sum(result["bytes"] for result in converted)
+    elapsed = max(elapsed, 1e-9)
+    return "\n".join(
+        [
+            f"Pairs converted: {len(converted)}, failed: {len(results) - len(converted)}",
+            f"Submission items: {n_items}",
+            f"Elapsed time: {elapsed:.2f} s",
+            f"Throughput: {len(converted) / elapsed:.2f} pairs/s, {n_items / elapsed:.0f} items/s, "
+            f"{n_bytes / elapsed / 1024 / 1024:.2f} MiB/s",
+        ]
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Convert the pairs of Variant and CaseData files of a folder into json submissions. "
+        "Files are paired by the part of their name before 'Variant' or 'CaseData'."
+    )
+    parser.add_argument("input_dir", help="Folder containing the Variant and CaseData files")
+    parser.add_argument(
+        "--output-dir", default="submissions", help="Folder where the json submissions are written"
+    )
+    parser.add_argument(
+        "--file-type",
+        choices=list(LINES_PARSERS),
+        help="Type of the files. By default, files with .tsv or .txt extension are TSV files and the other CSV files",
+    )
+    parser.add_argument(
+        "--assembly", help="Genome assembly of the variant coordinates, e.g. GRCh37"
+    )
+    parser.add_argument("--submission-name", help="Name of the submissions")
+    parser.add_argument("--release-status", help="Release status of the submissions")
+    parser.add_argument("--assertion-criteria-db", help="Database of the assertion criteria")
+    parser.add_argument("--assertion-criteria-id", help="ID of the assertion criteria")
+    parser.add_argument(
+        "--validation-mode",
+        choices=[mode.value for mode in ValidationMode],
+        default=ValidationMode.ALL.value,
+    )
+    parser.add_argument("--max-errors", type=int, default=MAX_ERRORS)
+    parser.add_argument(
+        "--engine", choices=[engine.value for engine in ConversionEngine], default=DEFAULT_ENGINE
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes converting pairs of files",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    pairs = find_file_pairs(args.input_dir)
+    if not pairs:
+        print(f"No Variant or CaseData files found in {args.input_dir}", file=sys.stderr)
+        return 1
+
+    query_params = {
+        param: getattr(args, option)
+        for option, param in SUBMISSION_OPTIONS.items()
+        if getattr(args, option)
+    }
+    processes = max(1, min(args.processes, len(pairs)))
+    tasks = [
+        (
+            prefix,
+            pair,
+            args.input_dir,
+            args.output_dir,
+            query_params,
+            args.file_type,
+            ValidationMode(args.validation_mode),
+            args.max_errors,
+            ConversionEngine(args.engine),
+            # A single process validates large submissions in parallel, a pool converts pairs in parallel instead
+            VALIDATION_PROCESSES if processes == 1 else 1,
+        )
+        for prefix, pair in pairs.items()
+    ]
+
+    start = time.perf_counter()
+    results = []
+    if processes == 1:
+        result_iterator = map(_convert_pair_task, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(processes)
+        result_iterator = pool.imap_unordered(_convert_pair_task, tasks)
+    try:
+        for result in result_iterator:
+            results.append(result)
+            if result["status"] == "converted":
+                print(f"{result['pair'] or '.'}: {result['items']} items -> {result['output']}")
+            else:
+                print(f"{result['pair'] or '.'}: FAILED {result['message']}", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(throughput_summary(results, time.perf_counter() - start))
+    return 0 if all(result["status"] == "converted" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
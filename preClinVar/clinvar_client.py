@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import os
+from importlib.util import find_spec
+from typing import AsyncIterator, Dict, List
+
+import httpx
+from fastapi import Request
+
+from preClinVar.metrics import InstrumentedTransport
+from preClinVar.upstream import BACKOFF_BASE, MAX_RETRIES, ResilientTransport
+
+LOG = logging.getLogger("uvicorn.access")
+
+###### Connection pool settings, can be overridden by environment variables ######
+MAX_CONNECTIONS = int(os.getenv("CLINVAR_API_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CLINVAR_API_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("CLINVAR_API_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT = float(os.getenv("CLINVAR_API_TIMEOUT", "120"))
+CONNECT_TIMEOUT = float(os.getenv("CLINVAR_API_CONNECT_TIMEOUT", "10"))
+# Maximum number of requests sent at the same time to the ClinVar API by a batch endpoint
+MAX_CONCURRENT_REQUESTS = int(os.getenv("CLINVAR_API_MAX_CONCURRENT_REQUESTS", "10"))
+
+# HTTP/2 is used only if the optional h2 library is installed
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+
+def create_client(
+    max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE, **kwargs
+) -> httpx.AsyncClient:
+    """Create an async HTTP client with a pool of keep-alive connections to the ClinVar API.
+    Requests are rate limited per API key, retried when they fail and not sent while the circuit breaker is open
+    (see preClinVar.upstream). Latency and status code of each attempt are recorded by the transport of the client.
+
+    Args:
+        max_retries(int): maximum number of times a failed request is sent again
+        backoff_base(float): seconds waited before the first retry, doubled at each retry
+        kwargs: other arguments passed to httpx.AsyncClient, for instance a custom transport
+
+    Returns:
+        client(httpx.AsyncClient)
+    """
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT)
+    transport = kwargs.pop("transport", None) or httpx.AsyncHTTPTransport(
+        limits=limits, http2=HTTP2_AVAILABLE
+    )
+    resilient_transport = ResilientTransport(
+        InstrumentedTransport(transport), max_retries=max_retries, backoff_base=backoff_base
+    )
+    return httpx.AsyncClient(timeout=timeout, transport=resilient_transport, **kwargs)
+
+
+async def get_clinvar_client(request: Request) -> AsyncIterator[httpx.AsyncClient]:
+    """Dependency providing the HTTP client shared by the proxy endpoints, which is created by the app lifespan.
+    If the lifespan is not running (i.e. app used without its lifespan events) a client is created for the request.
+    """
+    shared_client = getattr(request.app.state, "clinvar_client", None)
+    if shared_client is not None:
+        yield shared_client
+        return
+
+    async with create_client() as client:
+        yield client
+
+
+async def fetch_submission_actions(
+    client: httpx.AsyncClient, actions_url: str, header: dict
+) -> dict:
+    """Retrieve the actions (status) of a submission from the ClinVar API
+
+    Args:
+        client(httpx.AsyncClient): the HTTP client
+        actions_url(str): URL of the submission actions. Example: https://submit.ncbi.nlm.nih.gov/api/v1/submissions/SUB99999999/actions/
+        header(dict): header with the API key, as returned by build_header
+
+    Returns:
+        result(dict): Example: {"status_code": 200, "actions": [..]} or {"status_code": 401, "error": {"message": "No valid API key provided"}}
+    """
+    try:
+        resp = await client.get(actions_url, headers=header)
+    except httpx.HTTPError as ex:
+        LOG.error(f"Error while retrieving {actions_url}: {ex}")
+        return {"status_code": 502, "error": request_error(ex)}
+
+    return response_result(resp)
+
+
+def request_error(ex: httpx.HTTPError) -> dict:
+    """Return the error reported when a request to the ClinVar API failed, after its retries"""
+    return {"message": f"ClinVar API request failed: {ex}"}
+
+
+def response_content(resp: httpx.Response) -> dict:
+    """Return the json content of a response of the ClinVar API. Content which is not json, for instance an HTML error page,
+    is returned as a message"""
+    try:
+        return resp.json() if resp.content else {}
+    except ValueError:
+        return {"message": resp.text}
+
+
+def response_result(resp: httpx.Response) -> dict:
+    """Convert a response of the ClinVar API into a dictionary containing its status code and content, or error
+
+    Args:
+        resp(httpx.Response)
+
+    Returns:
+        result(dict): Example: {"status_code": 201, "id": "SUB99999999"} or {"status_code": 401, "error": {"message": "No valid API key provided"}}
+    """
+    content = response_content(resp)
+    if resp.is_success:
+        return {"status_code": resp.status_code, **content}
+    return {"status_code": resp.status_code, "error": content}
+
+
+async def post_submissions(
+    client: httpx.AsyncClient,
+    url: str,
+    payloads: List[dict],
+    header: dict,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+) -> List[dict]:
+    """Send several submissions to the ClinVar API in parallel, sending at most max_concurrency requests at a time
+
+    Args:
+        client(httpx.AsyncClient): the HTTP client
+        url(str): SUBMISSION_URL, DRY_RUN_SUBMISSION_URL or VALIDATE_SUBMISSION_URL
+        payloads(list): bodies of the POST requests, as returned by build_add_data_payload
+        header(dict): header with the API key, as returned by build_header
+        max_concurrency(int): maximum number of requests sent at the same time
+
+    Returns:
+        results(list): a result, as returned by response_result, for each payload
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def post(payload: dict) -> dict:
+        async with semaphore:
+            try:
+                resp = await client.post(url, content=json.dumps(payload), headers=header)
+            except httpx.HTTPError as ex:
+                LOG.error(f"Error while sending submission to {url}: {ex}")
+                return {"status_code": 502, "error": request_error(ex)}
+        return response_result(resp)
+
+    return await asyncio.gather(*[post(payload) for payload in payloads])
+
+
+async def fetch_submissions_actions(
+    client: httpx.AsyncClient,
+    submissions_url: str,
+    submission_ids: List[str],
+    header: dict,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+) -> Dict[str, dict]:
+    """Retrieve the actions of several submissions in parallel, sending at most max_concurrency requests at a time
+
+    Args:
+        client(httpx.AsyncClient): the HTTP client
+        submissions_url(str): SUBMISSION_URL or VALIDATE_SUBMISSION_URL
+        submission_ids(list): submission IDs. Example: ["SUB99999999", "SUB99999998"]
+        header(dict): header with the API key, as returned by build_header
+        max_concurrency(int): maximum number of requests sent at the same time
+
+    Returns:
+        results(dict): results of fetch_submission_actions, keyed by submission ID, in the order of the provided IDs
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    unique_ids = list(dict.fromkeys(submission_ids))
+
+    async def fetch(submission_id: str) -> dict:
+        async with semaphore:
+            return await fetch_submission_actions(
+                client, f"{submissions_url}/{submission_id}/actions/", header
+            )
+
+    results = await asyncio.gather(*[fetch(submission_id) for submission_id in unique_ids])
+    return dict(zip(unique_ids, results))
@@ -0,0 +1,446 @@
+"""Conversion of Variant files into submission items working on whole columns instead of one line at a time.
+
+The Variant file is read into one list of values per column. Type conversions, chromosome remapping, clinical significance
+normalization, gene splitting and HGVS joining are then applied to the columns, and items are assembled at the end.
+The submission created is identical to the one created by file_parser.file_fields_to_submission.
+"""
+
+import csv
+import gc
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from itertools import zip_longest
+from typing import Callable, Dict, List, Optional, Tuple
+
+from preClinVar.compression import open_decompressed
+from preClinVar.constants import CONDITIONS_MAP, SNV_COORDS, SV_COORDS
+from preClinVar.file_parser import (
+    CHUNK_SIZE,
+    PARSING_ERRORS,
+    _iter_text_lines,
+    index_casedata_lines,
+    set_assertion_criteria_from_csv,
+)
+from preClinVar.metrics import record_stage
+from preClinVar.offload import CPU_EXECUTOR, ExecutorKind
+from preClinVar.vocabulary import get_vocabularies, normalize_value
+
+LOG = logging.getLogger("uvicorn.access")
+
+SV = "sv"
+SNV = "snv"
+COORDS_BY_KIND = {SV: SV_COORDS, SNV: SNV_COORDS}
+
+
+class ConversionEngine(str, Enum):
+    """How the lines of a Variant file are converted into submission items"""
+
+    ROWS = "rows"
+    COLUMNS = "columns"
+
+
+# Engine used by tsv_2_json and csv_2_json when not specified in the request
+DEFAULT_ENGINE = ConversionEngine(os.getenv("CONVERSION_ENGINE", ConversionEngine.ROWS.value))
+
+Columns = Dict[str, List[Optional[str]]]
+
+
+# Number of paused_gc blocks running, and whether the collector was enabled before the first one
+_gc_pauses = 0
+_gc_was_enabled = False
+_gc_lock = threading.Lock()
+
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector while building large acyclic structures, like the items of a submission.
+    Containers are still freed by reference counting, but the collector doesn't scan them repeatedly while they are created.
+
+    The collector is switched off for the whole process, including the event loop and the other requests. It is then only
+    paused when the CPU-bound stages don't run in threads of the app (CPU_EXECUTOR "process" or "inline"). Pauses are
+    counted, and the collector is enabled again when the last one ends.
+    """
+    global _gc_pauses, _gc_was_enabled
+    if CPU_EXECUTOR == ExecutorKind.THREAD:
+        yield
+        return
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def read_file_columns(
+    file_obj, delimiter: str, chunk_size: int = CHUNK_SIZE
+) -> Tuple[int, Columns]:
+    """Read a delimited (comma or tab-separated) file into columns
+
+    Values missing at the end of short lines are None, as in the dictionaries returned by csv.DictReader,
+    and values of lines longer than the header are ignored.
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+        delimiter(str): "," for CSV files or "\t" for TSV files
+        chunk_size(int): number of bytes read from the file at a time
+
+    Returns:
+        n_rows, columns(tuple): number of lines after the header and the values of each column, by column name.
+            Example: (2, {'##Local ID': ['1d9ce6ebf2f82d913cfbe20c5085947b', '69b138a4c5caf211d796a59a7b46e40d'], 'Gene symbol': ['XDH', 'POT1'], ..})
+    """
+    reader = csv.reader(_iter_text_lines(file_obj, chunk_size), delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return 0, {}
+
+    with paused_gc():
+        rows = [row for row in reader if row]  # Empty lines are skipped, like with csv.DictReader
+        n_rows = len(rows)
+        width = len(header)
+        # Lines longer than the header are cut, so that the transposition returns one column per header field
+        rows = [row if len(row) <= width else row[:width] for row in rows]
+        transposed = list(zip_longest(*rows, fillvalue=None)) if rows else []
+        columns = {}
+        for n, name in enumerate(header):
+            # A duplicated field name gets the values of its last column, like with csv.DictReader
+            columns[name] = list(transposed[n]) if n < len(transposed) else [None] * n_rows
+    return n_rows, columns
+
+
+def _delimited_file_columns(contents: bytes, delimiter: str) -> Tuple[int, Columns]:
+    """Read the columns of a delimited file from the uploaded bytes. Returns no rows if the file can't be parsed"""
+    try:
+        return read_file_columns(open_decompressed(io.BytesIO(contents)), delimiter)
+    except PARSING_ERRORS as ex:
+        LOG.error(f"An error occurred while parsing file: {ex}")
+        return 0, {}
+
+
+def upload_file_columns(upload_file, delimiter: str) -> Tuple[int, Columns]:
+    """Read the columns of an uploaded file, raising a ValueError with the file name if the file can't be parsed.
+    Gzip or zstd-compressed files are decompressed while they are read.
+
+    Args:
+        upload_file(starlette.datastructures.UploadFile)
+        delimiter(str): "," for CSV files or "\t" for TSV files
+    """
+    try:
+        return read_file_columns(open_decompressed(upload_file.file), delimiter)
+    except PARSING_ERRORS as ex:
+        LOG.error(f"An error occurred while parsing file {upload_file.filename}: {ex}")
+        raise ValueError(f"Malformed file {upload_file.filename}")
+
+
+def _first_truthy(first: list, second: list) -> list:
+    """Combine two columns, taking the value of the second where the value of the first is empty"""
+    return [a or b for a, b in zip(first, second)]
+
+
+def normalize_clinsig(values: list) -> list:
+    """Replace clinical significance values with the matching compliant term, ignoring case"""
+    vocabulary = get_vocabularies()["Clinical significance"]
+    return [vocabulary.get(value.lower(), value) for value in values]
+
+
+def normalize_column(field: str, values: list) -> list:
+    """Replace the values of a controlled field with the matching accepted terms, ignoring case.
+    Each distinct value of the column is looked up once.
+    """
+    vocabulary = get_vocabularies()[field]
+    normalized = {value: vocabulary.get(value.lower(), value) for value in set(values) if value}
+    return [normalized.get(value, value) for value in values]
+
+
+def split_genes(values: list) -> list:
+    """Convert gene symbols separated by ";" into the gene field of a variant, or None if there are no genes"""
+    return [
+        [{"symbol": symbol} for symbol in genes.split(";")] if genes else None for genes in values
+    ]
+
+
+def join_hgvs(refseqs: list, hgvs_values: list) -> list:
+    """Join reference sequences and HGVS descriptions, or None if any of them is missing"""
+    return [
+        f"{refseq}:{hgvs}" if hgvs and refseq else None
+        for refseq, hgvs in zip(refseqs, hgvs_values)
+    ]
+
+
+def convert_column(values: list, rows: List[int], csv_key: str, formatter: Callable) -> dict:
+    """Convert the values of a coordinates column for some of the rows
+
+    The whole column is converted at once, falling back to one value at a time only if some values are invalid.
+
+    Args:
+        values(list): the values of the column
+        rows(list): indexes of the rows described by coordinates containing this column
+        csv_key(str): name of the column. Example: "Start"
+        formatter(function): str or int
+
+    Returns:
+        converted(dict): converted values by row index. Empty and invalid values are missing
+    """
+    rows = [row for row in rows if values[row] != ""]
+    try:
+        converted = dict(zip(rows, map(formatter, [values[row] for row in rows])))
+    except Exception:
+        converted = {}
+        for row in rows:
+            try:
+                converted[row] = formatter(values[row])
+            except Exception:
+                LOG.error(
+                    f"Exception when converting {csv_key} value->{values[row]} to {formatter}"
+                )
+
+    if csv_key == "Chromosome":  # Remap chromosome 'M' to 'MT'
+        for row, chrom in converted.items():
+            if chrom == "M":
+                converted[row] = "MT"
+    return converted
+
+
+def build_coordinates(columns: Columns, kinds: list) -> list:
+    """Create the chromosomeCoordinates field of the variants described by coordinates
+
+    Args:
+        columns(dict): the columns of the Variant file
+        kinds(list): for each row, SV, SNV or None for variants described by HGVS
+
+    Returns:
+        coords(list): a chromosomeCoordinates dictionary for each row, or None for variants described by HGVS
+    """
+    coords = [{} if kind else None for kind in kinds]
+    # Keys are set in the order of SNV_COORDS or SV_COORDS, as when a line is converted to an item
+    for kind, coords_items in COORDS_BY_KIND.items():
+        kind_rows = [row for row, row_kind in enumerate(kinds) if row_kind == kind]
+        if not kind_rows:
+            continue
+        for csv_key, coord_item in coords_items.items():
+            if csv_key not in columns:
+                continue
+            converted = convert_column(columns[csv_key], kind_rows, csv_key, coord_item["format"])
+            for row, value in converted.items():
+                coords[row][coord_item["key"]] = value
+    return coords
+
+
+def build_reference_copy_numbers(columns: Columns, n_rows: int) -> list:
+    """Compute the referenceCopyNumber of each variant which has a Reference copy number.
+    As for the lines converted one at a time, the value is the integer Copy number.
+
+    Returns:
+        ref_copy_numbers(list): an integer for each row, or None
+    """
+    ref_copy_numbers = [None] * n_rows
+    rows = [row for row, value in enumerate(columns["Reference copy number"]) if value]
+    copy_numbers = columns.get("Copy number")
+    for row in rows:
+        copy_number = copy_numbers[row] if copy_numbers else None
+        try:
+            ref_copy_numbers[row] = int(copy_number)
+        except Exception:
+            LOG.error(f"Error while converting referenceCopyNumber {copy_number} to int")
+    return ref_copy_numbers
+
+
+def build_condition_sets(columns: Columns, n_rows: int) -> list:
+    """Create the conditionSet field of each item, or None if the variant has no conditions"""
+    missing = [None] * n_rows
+    cond_types = normalize_column("Condition ID type", columns.get("Condition ID type", missing))
+    cond_dbs = [CONDITIONS_MAP.get(value) for value in cond_types]
+    explanations = columns.get("Explanation for multiple conditions", missing)
+    condition_sets = []
+    for cond_db, cond_values, explanation in zip(
+        cond_dbs, columns.get("Condition ID value", missing), explanations
+    ):
+        if not (cond_db and cond_values):
+            condition_sets.append(None)
+            continue
+        condition_set = {
+            "condition": [{"db": cond_db, "id": cond_id} for cond_id in cond_values.split(";")]
+        }
+        if explanation:
+            condition_set["multipleConditionExplanation"] = explanation.capitalize()
+        condition_sets.append(condition_set)
+    return condition_sets
+
+
+def build_observations(casedata_lines) -> Dict[Optional[str], List[dict]]:
+    """Create the observedIn field of the items from the CaseData lines, by Linking ID"""
+    observations = {}
+    for link_id, lines in index_casedata_lines(casedata_lines).items():
+        group = []
+        for line_dict in lines:
+            obs = {
+                "affectedStatus": normalize_value(
+                    "Affected status", line_dict.get("Affected status")
+                ),
+                "alleleOrigin": normalize_value("Allele origin", line_dict.get("Allele origin")),
+                "collectionMethod": normalize_value(
+                    "Collection method", line_dict.get("Collection method")
+                ),
+            }
+            if line_dict.get("Clinical features"):
+                obs["clinicalFeatures"] = line_dict.get("Clinical features").split(";")
+            group.append(obs)
+        observations[link_id] = group
+    return observations
+
+
+def build_clinical_significances(columns: Columns, n_rows: int) -> list:
+    """Create the clinicalSignificance field of each item"""
+    missing = [None] * n_rows
+    clinsigs = normalize_clinsig(
+        _first_truthy(
+            columns.get("Clinical significance", missing),
+            columns.get("Germline classification", missing),
+        )
+    )
+    comments = _first_truthy(
+        columns.get("Comment on clinical significance", missing),
+        columns.get("Comment on classification", missing),
+    )
+    clin_sigs = []
+    for clinsig, comment, last_eval, inherit_mode in zip(
+        clinsigs,
+        comments,
+        columns.get("Date last evaluated", missing),
+        normalize_column("Mode of inheritance", columns.get("Mode of inheritance", missing)),
+    ):
+        clin_sig = {"clinicalSignificanceDescription": clinsig}
+        if comment:
+            clin_sig["comment"] = comment
+        if last_eval:
+            clin_sig["dateLastEvaluated"] = last_eval
+        if inherit_mode:
+            clin_sig["modeOfInheritance"] = inherit_mode
+        clin_sigs.append(clin_sig)
+    return clin_sigs
+
+
+def build_variant_sets(columns: Columns, n_rows: int) -> list:
+    """Create the variantSet field of each item"""
+    missing = [None] * n_rows
+    genes = split_genes(columns.get("Gene symbol", missing))
+    hgvs_values = join_hgvs(
+        columns.get("Reference sequence", missing), columns.get("HGVS", missing)
+    )
+    variant_types = normalize_column("Variant type", columns.get("Variant type", missing))
+    kinds = [
+        None if hgvs else (SV if variant_type else SNV)
+        for hgvs, variant_type in zip(hgvs_values, variant_types)
+    ]
+    coords = build_coordinates(columns, kinds)
+    ref_copy_numbers = (
+        build_reference_copy_numbers(columns, n_rows)
+        if "Reference copy number" in columns
+        else missing
+    )
+
+    variant_sets = []
+    for gene, hgvs, coord, copy_number, ref_copy_number, variant_type in zip(
+        genes,
+        hgvs_values,
+        coords,
+        columns.get("Copy number", missing),
+        ref_copy_numbers,
+        variant_types,
+    ):
+        variant = {}
+        if gene:
+            variant["gene"] = gene
+        if hgvs:
+            variant["hgvs"] = hgvs
+        else:
+            variant["chromosomeCoordinates"] = coord
+        if copy_number:
+            variant["copyNumber"] = copy_number
+        if ref_copy_number is not None:
+            variant["referenceCopyNumber"] = ref_copy_number
+        if variant_type:
+            variant["variantType"] = variant_type
+        variant_sets.append({"variant": [variant]})
+    return variant_sets
+
+
+def file_columns_to_submission(n_rows: int, variants_columns: Columns, casedata_lines) -> dict:
+    """Create a json submission dictionary from the columns of a Variant file and the lines of a CaseData file.
+    Returns the same submission as file_parser.file_fields_to_submission called with the lines of the Variant file.
+
+    Args:
+        n_rows(int): number of lines of the Variant file
+        variants_columns(dict): the columns of the Variant file, as returned by read_file_columns
+        casedata_lines(iterable of dicts). Example: [{'Linking ID': '69b138a4c5caf211d796a59a7b46e40d', 'Individual ID': '20210316-03', ..}, ..]
+
+    Returns:
+        clinvar_submission(dict)
+    """
+    start = time.perf_counter()
+    subm_object = {}
+    columns = variants_columns
+    missing = [None] * n_rows
+
+    if n_rows:  # try to parse assertion criteria from old format of CSV file
+        set_assertion_criteria_from_csv(
+            subm_object, {name: values[0] for name, values in columns.items()}
+        )
+
+    with paused_gc():
+        # Column-wise conversions
+        clin_sigs = build_clinical_significances(columns, n_rows)
+        condition_sets = build_condition_sets(columns, n_rows)
+        variant_sets = build_variant_sets(columns, n_rows)
+        observations = build_observations(casedata_lines)
+
+        # Assembly of the items
+        items = []
+        used_link_ids = set()
+        for clin_sig, condition_set, local_id, link_id, variant_set in zip(
+            clin_sigs,
+            condition_sets,
+            columns.get("##Local ID", missing),
+            columns.get("Linking ID", missing),
+            variant_sets,
+        ):
+            item = {"clinicalSignificance": clin_sig}
+            if condition_set:
+                item["conditionSet"] = condition_set
+            if local_id:
+                item["localID"] = local_id
+            if link_id:
+                item["localKey"] = link_id
+
+            # Variants sharing a Linking ID get their own copy of the observations
+            obs_key = link_id or None
+            obs_in = observations.get(obs_key, [])
+            if obs_key in used_link_ids:
+                obs_in = [
+                    dict(obs, clinicalFeatures=list(obs["clinicalFeatures"]))
+                    if "clinicalFeatures" in obs
+                    else dict(obs)
+                    for obs in obs_in
+                ]
+            else:
+                obs_in = list(obs_in)
+                used_link_ids.add(obs_key)
+            item["observedIn"] = obs_in
+            item["variantSet"] = variant_set
+            item["recordStatus"] = "novel"
+            items.append(item)
+
+    subm_object["clinvarSubmission"] = items
+    record_stage("build_items", time.perf_counter() - start, n_rows)
+    return subm_object
@@ -0,0 +1,171 @@
+"""Decompression of gzip or zstd-compressed uploaded files, and compression of the responses according to their Accept-Encoding header"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import zlib
+from typing import BinaryIO, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:  # zstandard is optional, to read and send zstd-compressed files
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Errors raised when reading corrupted compressed files
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard else ()
+)
+
+###### Response compression settings, can be overridden by environment variables ######
+# Responses smaller than this size, in bytes, are not compressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Larger chunks of the responses are compressed in a thread, without blocking the event loop
+THREAD_COMPRESSION_MIN_SIZE = 1024 * 1024
+# Responses which are already compressed
+UNCOMPRESSED_MEDIA_TYPES = ("application/zip", "application/gzip", "application/zstd")
+
+
+def open_decompressed(file_obj: BinaryIO) -> BinaryIO:
+    """Return a file object reading the decompressed content of a gzip or zstd-compressed file, or the file itself if it's not compressed.
+    The file is read from its start and decompressed while it is read.
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+    """
+    file_obj.seek(0)
+    magic = file_obj.read(len(ZSTD_MAGIC))
+    file_obj.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=file_obj, mode="rb")
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("Reading zstd-compressed files requires the zstandard library")
+        return zstandard.ZstdDecompressor().stream_reader(file_obj, read_across_frames=True)
+    return file_obj
+
+
+def load_json(contents: bytes):
+    """Parse a json document, which may be gzip or zstd-compressed"""
+    return json.load(open_decompressed(io.BytesIO(contents)))
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Choose the compression of a response from the Accept-Encoding header of the request
+
+    Args:
+        accept_encoding(str): Example: "gzip, deflate, br, zstd"
+
+    Returns:
+        encoding(str): "zstd" (when zstandard is installed), "gzip" or None if none of them is accepted
+    """
+    accepted = set()
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip())
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Compress the chunks of a response body, flushing each chunk so that streaming responses are received progressively"""
+
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self._flush_block = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, more_data: bool) -> bytes:
+        compressed = self._compressor.compress(data)
+        if more_data:
+            return compressed + self._compressor.flush(self._flush_block)
+        return compressed + self._compressor.flush()
+
+    async def compress_async(self, data: bytes, more_data: bool) -> bytes:
+        if len(data) < THREAD_COMPRESSION_MIN_SIZE:
+            return self.compress(data, more_data)
+        return await asyncio.to_thread(self.compress, data, more_data)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing the responses larger than minimum_size with zstd or gzip, according to the Accept-Encoding header of the request"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message  # Sent with the first chunk of the body
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start_message)
+                if (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith(UNCOMPRESSED_MEDIA_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                compressed = await compressor.compress_async(body, more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                await send(
+                    {"type": "http.response.body", "body": compressed, "more_body": more_body}
+                )
+                return
+
+            compressed = await compressor.compress_async(body, more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,6 +1,18 @@
-SUBMISSION_URL = "https://submit.ncbi.nlm.nih.gov/api/v1/submissions"
+import os
+
+# Base URL of the ClinVar submission API, which can be replaced by a local stand-in (see preClinVar/fake_clinvar.py)
+CLINVAR_API_URL = os.getenv("CLINVAR_API_URL", "https://submit.ncbi.nlm.nih.gov").rstrip("/")
+SUBMISSION_URL = f"{CLINVAR_API_URL}/api/v1/submissions"
 DRY_RUN_SUBMISSION_URL = f"{SUBMISSION_URL}/?dry-run=true"
-VALIDATE_SUBMISSION_URL = "https://submit.ncbi.nlm.nih.gov/apitest/v1/submissions"
+VALIDATE_SUBMISSION_URL = f"{CLINVAR_API_URL}/apitest/v1/submissions"
+
+# Keys of a submission object containing the list of submitted items
+SUBMISSION_ITEMS_KEYS = [
+    "clinvarSubmission",
+    "germlineSubmission",
+    "oncogenicitySubmission",
+    "clinicalImpactSubmission",
+]
 
 CLNSIG_TERMS = [
     "Pathogenic",
@@ -0,0 +1,242 @@
+"""Stages of the conversion of the Variant and CaseData files of a germline submission into a validated json submission.
+Stages only take and return picklable objects, so that they can be run by a pool of threads or processes.
+"""
+
+from types import SimpleNamespace
+from typing import Callable, List, Mapping, Optional, Tuple
+
+from preClinVar.build import build_submission
+from preClinVar.columnar import (
+    DEFAULT_ENGINE,
+    Columns,
+    ConversionEngine,
+    file_columns_to_submission,
+    upload_file_columns,
+)
+from preClinVar.compression import load_json
+from preClinVar.file_parser import file_fields_to_submission
+from preClinVar.jobs import progress_callback, report_progress, track_rows
+from preClinVar.json_stream import dumps
+from preClinVar.metrics import iter_timed, timed_stage
+from preClinVar.validate import (
+    MAX_ERRORS,
+    VALIDATION_PROCESSES,
+    ValidationMode,
+    validate_submission,
+)
+from preClinVar.vocabulary import (
+    CASEDATA_CONTROLLED_FIELDS,
+    VARIANT_CONTROLLED_FIELDS,
+    accepted_values_summary,
+    iter_prechecked,
+    precheck_columns,
+    precheck_lines,
+)
+
+DELIMITERS = {"tsv": "\t", "csv": ","}
+
+
+class ConversionError(Exception):
+    """Raised when uploaded files can't be converted into a valid submission. The message is returned to the user"""
+
+
+def missing_files_message(file_type: str) -> str:
+    return f"Both 'Variant' and 'CaseData' {file_type} files are required and should not be empty"
+
+
+def malformed_file_message(filename: str) -> str:
+    return f"Malformed file {filename}"
+
+
+def invalid_values_message(
+    invalid_values: List[str], validation_mode: ValidationMode, max_errors: int
+) -> str:
+    """Report the invalid values of controlled fields, capped as the validation errors according to the validation mode,
+    followed by the accepted values of the fields reported"""
+    error_cap = {ValidationMode.FIRST: 1, ValidationMode.CAPPED: max_errors}.get(validation_mode)
+    reported = invalid_values[:error_cap]
+    return f"Uploaded files contain invalid values: {reported + accepted_values_summary(reported)}"
+
+
+def validation_errors_message(errors: List[str]) -> str:
+    return f"Created json file contains validation errors: {errors}"
+
+
+def parse_casedata(casedata_file, lines_parser: Callable) -> Tuple[List[dict], List[str]]:
+    """Read the lines of a CaseData file and check the values of their controlled fields
+
+    Args:
+        casedata_file(starlette.datastructures.UploadFile)
+        lines_parser(function): tsv_lines or csv_lines, yielding the lines of an uploaded file
+
+    Returns:
+        casedata_lines, invalid_values(tuple): the lines of the file and the errors found in the controlled fields
+    """
+    with timed_stage("parse_casedata") as parse_stage:
+        casedata_lines = list(lines_parser(casedata_file))
+        parse_stage.rows = len(casedata_lines)
+    # Values of the controlled fields are checked before the submission is validated against the schema
+    with timed_stage("precheck", rows=len(casedata_lines)):
+        invalid_values = precheck_lines(casedata_lines, CASEDATA_CONTROLLED_FIELDS, "CaseData")
+    return casedata_lines, invalid_values
+
+
+def parse_variants_columns(variants_file, delimiter: str) -> Tuple[int, Columns, List[str]]:
+    """Read the whole Variant file into columns and check the values of their controlled fields
+
+    Returns:
+        n_rows, variants_columns, invalid_values(tuple)
+    """
+    with timed_stage("parse_variants") as parse_stage:
+        n_rows, variants_columns = upload_file_columns(variants_file, delimiter)
+        parse_stage.rows = n_rows
+    report_progress(rows_parsed=n_rows)
+    with timed_stage("precheck", rows=n_rows):
+        invalid_values = precheck_columns(variants_columns, VARIANT_CONTROLLED_FIELDS, "Variant")
+    return n_rows, variants_columns, invalid_values
+
+
+def convert_variants_rows(
+    variants_file, lines_parser: Callable, casedata_lines: List[dict]
+) -> Tuple[dict, List[str]]:
+    """Convert the lines of a Variant file into submission items one at a time, while the file is read.
+    Lines are checked while they are streamed to the submission builder.
+
+    Returns:
+        submission_dict, invalid_values(tuple)
+    """
+    invalid_values = []
+    variants_lines = iter_prechecked(
+        track_rows(iter_timed(lines_parser(variants_file), "parse_variants"), "rows_parsed"),
+        VARIANT_CONTROLLED_FIELDS,
+        "Variant",
+        invalid_values,
+    )
+    return file_fields_to_submission(variants_lines, casedata_lines), invalid_values
+
+
+def validate_and_encode(
+    submission_dict: dict,
+    query_params: Mapping[str, str],
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    processes: int = VALIDATION_PROCESSES,
+    encode: bool = True,
+) -> Tuple[Tuple[bool, List[str]], Optional[object]]:
+    """Add the request parameters to a submission, validate it and encode it when valid
+
+    Args:
+        submission_dict(dict): the submission created from the Variant and CaseData files
+        query_params(dict-like): the parameters of the conversion request
+        validation_mode(ValidationMode): how validation errors are collected
+        max_errors(int): maximum number of errors returned in "capped" validation mode
+        processes(int): maximum number of processes validating the submission items
+        encode(bool): if False, the valid submission is returned as a dictionary
+
+    Returns:
+        valid_results, submission(tuple): the result of validate_submission, and the submission as json bytes (or dictionary)
+            if it is valid. Raises exceptions from build_submission
+    """
+    build_submission(submission_dict, SimpleNamespace(query_params=query_params))
+
+    # Validate submission object using official schema
+    report_progress(stage="validate", items_validated=0)
+    valid_results = validate_submission(
+        submission_dict=submission_dict,
+        processes=processes,
+        mode=validation_mode,
+        max_errors=max_errors,
+        progress=progress_callback("items_validated"),
+    )
+    if not valid_results[0]:
+        return valid_results, None
+    report_progress(stage="serialize")
+    if not encode:
+        return valid_results, submission_dict
+    with timed_stage("serialize"):
+        return valid_results, dumps(submission_dict)
+
+
+def load_and_validate(
+    contents: bytes,
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    processes: int = VALIDATION_PROCESSES,
+) -> Tuple[bool, List[str]]:
+    """Parse a json submission, which may be gzip or zstd-compressed, and validate it, see validate_submission.
+    Raises exceptions on invalid json"""
+    submission_dict = load_json(contents)
+    return validate_submission(
+        submission_dict=submission_dict,
+        processes=processes,
+        mode=validation_mode,
+        max_errors=max_errors,
+    )
+
+
+def convert_files(
+    variants_file,
+    casedata_file,
+    lines_parser: Callable,
+    file_type: str,
+    query_params: Mapping[str, str],
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    engine: ConversionEngine = DEFAULT_ENGINE,
+    processes: int = VALIDATION_PROCESSES,
+) -> Tuple[bytes, int]:
+    """Run all the stages converting a Variant and a CaseData file into a valid json submission, one after the other
+
+    Args:
+        variants_file(starlette.datastructures.UploadFile): the Variant file
+        casedata_file(starlette.datastructures.UploadFile): the CaseData file
+        lines_parser(function): tsv_lines or csv_lines, yielding the lines of an uploaded file
+        file_type(str): "tsv" or "csv"
+        query_params(dict-like): the submission parameters (assembly, submissionName, releaseStatus ..)
+        validation_mode(ValidationMode): how validation errors are collected
+        max_errors(int): maximum number of errors returned in "capped" validation mode
+        engine(ConversionEngine): how the Variant file is converted into submission items
+        processes(int): maximum number of processes validating the submission items
+
+    Returns:
+        submission(bytes), n_items(int): the json submission and its number of items.
+            Raises ConversionError if the files can't be converted
+    """
+    try:
+        casedata_lines, invalid_values = parse_casedata(casedata_file, lines_parser)
+        if not casedata_lines:
+            raise ConversionError(malformed_file_message(casedata_file.filename))
+        if engine == ConversionEngine.COLUMNS:
+            n_rows, variants_columns, variant_invalid_values = parse_variants_columns(
+                variants_file, DELIMITERS[file_type]
+            )
+            if variant_invalid_values or invalid_values:
+                raise ConversionError(
+                    invalid_values_message(
+                        variant_invalid_values + invalid_values, validation_mode, max_errors
+                    )
+                )
+            submission_dict = file_columns_to_submission(n_rows, variants_columns, casedata_lines)
+        else:
+            submission_dict, variant_invalid_values = convert_variants_rows(
+                variants_file, lines_parser, casedata_lines
+            )
+        invalid_values = variant_invalid_values + invalid_values
+        n_items = len(submission_dict["clinvarSubmission"])
+        if not n_items:
+            raise ConversionError(malformed_file_message(variants_file.filename))
+        if invalid_values:
+            raise ConversionError(
+                invalid_values_message(invalid_values, validation_mode, max_errors)
+            )
+        valid_results, submission = validate_and_encode(
+            submission_dict, query_params, validation_mode, max_errors, processes
+        )
+    except ConversionError:
+        raise
+    except Exception as ex:
+        raise ConversionError(str(ex))
+
+    if not valid_results[0]:
+        raise ConversionError(validation_errors_message(valid_results[1]))
+    return submission, n_items
@@ -1,6 +1,6 @@
-from importlib_resources import files
+import os
 
-BASE_PATH = "preClinVar.demo"
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 ###### .csv files ######
 casedata_old_csv = "CaseData_before_221121.csv"
@@ -13,17 +13,17 @@ casedata_snv_csv = "CaseData_snv.csv"
 casedata_sv_csv = "CaseData_sv.csv"
 
 ###### Path to .csv files ######
-casedata_old_csv_path = str(files(BASE_PATH).joinpath(casedata_old_csv))
-variants_old_csv_path = str(files(BASE_PATH).joinpath(variants_old_csv))
-casedata_snv_csv_path = str(files(BASE_PATH).joinpath(casedata_snv_csv))
-casedata_sv_csv_path = str(files(BASE_PATH).joinpath(casedata_sv_csv))
-variants_hgvs_csv_path = str(files(BASE_PATH).joinpath(variants_hgvs_csv))
-variants_sv_breakpoints_csv_path = str(files(BASE_PATH).joinpath(variants_sv_breakpoints_csv))
-variants_sv_range_coords_csv_path = str(files(BASE_PATH).joinpath(variants_sv_range_coords_csv))
+casedata_old_csv_path = os.path.join(BASE_PATH, casedata_old_csv)
+variants_old_csv_path = os.path.join(BASE_PATH, variants_old_csv)
+casedata_snv_csv_path = os.path.join(BASE_PATH, casedata_snv_csv)
+casedata_sv_csv_path = os.path.join(BASE_PATH, casedata_sv_csv)
+variants_hgvs_csv_path = os.path.join(BASE_PATH, variants_hgvs_csv)
+variants_sv_breakpoints_csv_path = os.path.join(BASE_PATH, variants_sv_breakpoints_csv)
+variants_sv_range_coords_csv_path = os.path.join(BASE_PATH, variants_sv_range_coords_csv)
 
 ###### Example of a json file submission ######
 germline_subm_json = "sample_germline_hgvs_submission.json"
-germline_subm_json_path = str(files(BASE_PATH).joinpath(germline_subm_json))
+germline_subm_json_path = os.path.join(BASE_PATH, germline_subm_json)
 
 somatic_subm_json = "sample_oncogenicity_hgvs.json"
-somatic_subm_json_path = str(files(BASE_PATH).joinpath(somatic_subm_json))
+somatic_subm_json_path = os.path.join(BASE_PATH, somatic_subm_json)
@@ -0,0 +1,241 @@
+"""Generate synthetic Variant and CaseData files of any size, similar to the demo files, for testing and benchmarking"""
+
+import csv
+import io
+import random
+from typing import List, Optional, Sequence, Tuple
+
+from preClinVar.constants import CLNSIG_TERMS
+
+# The types of variants described in the Variant files
+KIND_HGVS = "hgvs"
+KIND_SNV_COORDS = "snv_coords"
+KIND_SV_BREAKPOINTS = "sv_breakpoints"
+KIND_SV_RANGE_COORDS = "sv_range_coords"
+VARIANT_KINDS = [KIND_HGVS, KIND_SNV_COORDS, KIND_SV_BREAKPOINTS, KIND_SV_RANGE_COORDS]
+
+VARIANT_FIELDS = [
+    "##Local ID",
+    "Linking ID",
+    "Gene symbol",
+    "Reference sequence",
+    "HGVS",
+    "Chromosome",
+    "Start",
+    "Stop",
+    "Reference allele",
+    "Alternate allele",
+    "Variant type",
+    "Copy number",
+    "Reference copy number",
+    "Breakpoint 1",
+    "Breakpoint 2",
+    "Outer start",
+    "Inner start",
+    "Inner stop",
+    "Outer stop",
+    "Variation identifiers",
+    "Condition ID type",
+    "Condition ID value",
+    "Explanation for multiple conditions",
+    "Clinical significance",
+    "Date last evaluated",
+    "Mode of inheritance",
+]
+CASEDATA_FIELDS = [
+    "Linking ID",
+    "Individual ID",
+    "Collection method",
+    "Allele origin",
+    "Affected status",
+    "Clinical features",
+]
+
+GENES = ["BCKDHB", "XDH", "POT1", "BRCA1", "BRCA2", "CFTR", "MLH1", "TP53"]
+REFSEQS = ["NM_000056.5", "NM_000379.4", "NM_015450.3", "NM_007294.4", "NM_000059.4"]
+CHROMOSOMES = [str(chrom) for chrom in range(1, 23)] + ["X", "Y", "M"]
+BASES = "ACGT"
+INHERITANCE_MODES = [
+    "Autosomal recessive inheritance",
+    "Autosomal dominant inheritance",
+    "X-linked inheritance",
+    "Unknown mechanism",
+]
+
+
+def _hgvs_fields(rnd: random.Random) -> dict:
+    """Fields of a variant described by reference sequence and HGVS"""
+    ref, alt = rnd.sample(BASES, 2)
+    return {
+        "Gene symbol": ";".join(rnd.sample(GENES, rnd.choice([1, 1, 2]))),
+        "Reference sequence": rnd.choice(REFSEQS),
+        "HGVS": f"c.{rnd.randint(1, 5000)}{ref}>{alt}",
+        "Variation identifiers": f"rs{rnd.randint(1, 999999999)}",
+    }
+
+
+def _snv_coords_fields(rnd: random.Random) -> dict:
+    """Fields of a SNV described by chromosome coordinates"""
+    ref, alt = rnd.sample(BASES, 2)
+    start = rnd.randint(1, 100_000_000)
+    return {
+        "Gene symbol": rnd.choice(GENES),
+        "Chromosome": rnd.choice(CHROMOSOMES),
+        "Start": str(start),
+        "Stop": str(start),
+        "Reference allele": ref,
+        "Alternate allele": alt,
+    }
+
+
+def _sv_fields(rnd: random.Random, range_coords: bool) -> dict:
+    """Fields of a SV described by breakpoints or range coordinates"""
+    start = rnd.randint(1, 100_000_000)
+    stop = start + rnd.randint(100, 100_000)
+    fields = {
+        "Chromosome": rnd.choice(CHROMOSOMES),
+        "Reference allele": "".join(rnd.choice(BASES) for _ in range(rnd.randint(2, 50))),
+        "Alternate allele": rnd.choice(BASES),
+        "Variant type": rnd.choice(["Deletion", "Duplication"]),
+        "Copy number": rnd.choice(["0", "1", "3"]),
+        "Reference copy number": "2",
+    }
+    if range_coords:
+        fields.update(
+            {
+                "Outer start": str(start - 50),
+                "Inner start": str(start + 50),
+                "Inner stop": str(stop - 50),
+                "Outer stop": str(stop + 50),
+            }
+        )
+    else:
+        fields.update({"Breakpoint 1": str(start), "Breakpoint 2": str(stop)})
+    return fields
+
+
+def generate_variant_lines(
+    n_variants: int, kinds: Sequence[str] = VARIANT_KINDS, seed: int = 0
+) -> List[dict]:
+    """Generate the lines of a Variant file
+
+    Args:
+        n_variants(int): number of variants
+        kinds(list): types of variants to generate, cycled over the lines of the file. See VARIANT_KINDS
+        seed(int): seed of the random generator, the same seed returns the same lines
+
+    Returns:
+        lines(list of dicts): Example: [{'##Local ID': '00000000000000000000000000000000', 'Linking ID': '00000000000000000000000000000000', 'Gene symbol': 'XDH', ..}, ..]
+    """
+    rnd = random.Random(seed)
+    lines = []
+    for n in range(n_variants):
+        kind = kinds[n % len(kinds)]
+        line = {field: "" for field in VARIANT_FIELDS}
+        local_id = f"{n:032x}"
+        line["##Local ID"] = local_id
+        line["Linking ID"] = local_id
+
+        if kind == KIND_HGVS:
+            line.update(_hgvs_fields(rnd))
+        elif kind == KIND_SNV_COORDS:
+            line.update(_snv_coords_fields(rnd))
+        else:
+            line.update(_sv_fields(rnd, range_coords=kind == KIND_SV_RANGE_COORDS))
+
+        if rnd.random() < 0.5:
+            line["Condition ID type"] = "OMIM"
+            line["Condition ID value"] = ";".join(
+                str(rnd.randint(100000, 699999)) for _ in range(rnd.choice([1, 1, 2]))
+            )
+            if ";" in line["Condition ID value"]:
+                line["Explanation for multiple conditions"] = "Novel disease"
+        else:
+            line["Condition ID type"] = "HPO"
+            line["Condition ID value"] = f"HP:{rnd.randint(1, 9999999):07}"
+        line["Clinical significance"] = rnd.choice(CLNSIG_TERMS[:5]).lower()
+        line["Date last evaluated"] = f"20{rnd.randint(10, 24)}-{rnd.randint(1, 12):02}-15"
+        line["Mode of inheritance"] = rnd.choice(INHERITANCE_MODES)
+        lines.append(line)
+    return lines
+
+
+def generate_casedata_lines(
+    variants_lines: List[dict], max_individuals: int = 3, seed: int = 0
+) -> List[dict]:
+    """Generate the lines of a CaseData file, with one or more individuals for each variant
+
+    Args:
+        variants_lines(list of dicts): lines of a Variant file, as returned by generate_variant_lines
+        max_individuals(int): maximum number of individuals with the same variant (Linking ID)
+        seed(int): seed of the random generator
+
+    Returns:
+        lines(list of dicts): Example: [{'Linking ID': '00000000000000000000000000000000', 'Individual ID': 'IND00000000', ..}, ..]
+    """
+    rnd = random.Random(seed)
+    lines = []
+    for variant_line in variants_lines:
+        for _ in range(rnd.randint(1, max_individuals)):
+            lines.append(
+                {
+                    "Linking ID": variant_line["Linking ID"],
+                    "Individual ID": f"IND{len(lines):08}",
+                    "Collection method": "clinical testing",
+                    "Allele origin": "germline",
+                    "Affected status": rnd.choice(["yes", "no", "unknown"]),
+                    "Clinical features": ";".join(
+                        f"HP:{rnd.randint(1, 9999999):07}" for _ in range(rnd.randint(0, 2))
+                    ),
+                }
+            )
+    # Individuals are not grouped by variant in real files
+    rnd.shuffle(lines)
+    return lines
+
+
+def write_delimited_file(lines: List[dict], fieldnames: List[str], delimiter: str = ",") -> bytes:
+    """Write lines to a delimited file, with all values quoted like in the demo files
+
+    Args:
+        lines(list of dicts): the lines of the file
+        fieldnames(list): the header of the file
+        delimiter(str): "," for CSV files or "\t" for TSV files
+
+    Returns:
+        contents(bytes): the content of the file, UTF-8 encoded
+    """
+    text_stream = io.StringIO()
+    writer = csv.DictWriter(
+        text_stream, fieldnames=fieldnames, delimiter=delimiter, quoting=csv.QUOTE_ALL
+    )
+    writer.writeheader()
+    writer.writerows(lines)
+    return text_stream.getvalue().encode("utf-8")
+
+
+def generate_submission_files(
+    n_variants: int,
+    delimiter: str = ",",
+    kinds: Sequence[str] = VARIANT_KINDS,
+    max_individuals: int = 3,
+    seed: Optional[int] = 0,
+) -> Tuple[bytes, bytes]:
+    """Generate the content of a Variant and a CaseData file
+
+    Args:
+        n_variants(int): number of variants (lines of the Variant file)
+        delimiter(str): "," for CSV files or "\t" for TSV files
+        kinds(list): types of variants to generate. See VARIANT_KINDS
+        max_individuals(int): maximum number of individuals with the same variant
+        seed(int): seed of the random generator
+
+    Returns:
+        variants_contents, casedata_contents(tuple of bytes)
+    """
+    variants_lines = generate_variant_lines(n_variants, kinds=kinds, seed=seed)
+    casedata_lines = generate_casedata_lines(variants_lines, max_individuals, seed=seed)
+    return (
+        write_delimited_file(variants_lines, VARIANT_FIELDS, delimiter),
+        write_delimited_file(casedata_lines, CASEDATA_FIELDS, delimiter),
+    )
@@ -0,0 +1,149 @@
+"""A local stand-in for the ClinVar submission API, used by the tests (with httpx.ASGITransport) and by the load tests
+of the proxy endpoints (benchmarks/proxy_load.py). Latency, error rate and size of the responses can be configured.
+
+It can also be served on its own, preClinVar being pointed to it with the CLINVAR_API_URL environment variable:
+    python -m preClinVar.fake_clinvar [--port 8001] [--latency 0.2] [--error-rate 0.01] [--payload-size 2000]
+    CLINVAR_API_URL=http://127.0.0.1:8001 uvicorn preClinVar.main:app
+"""
+
+import asyncio
+import random
+from collections import deque
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+DEMO_SUBMISSION_ID = "SUB99999999"
+# Status code of the errors returned at random, according to the error rate
+RANDOM_ERROR_STATUS_CODE = 503
+
+
+def create_fake_clinvar_app(
+    latency: float = 0.0,
+    faults: Optional[List[dict]] = None,
+    error_rate: float = 0.0,
+    payload_size: int = 0,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """Create an app mimicking the ClinVar submission API endpoints used by preClinVar
+
+    Args:
+        latency(float): seconds waited by the server before responding to each request
+        faults(list): errors returned, in order, to the first requests instead of their normal response.
+            Example: [{"status_code": 503}, {"status_code": 429, "headers": {"Retry-After": "1"}}]
+        error_rate(float): fraction of the requests, between 0 and 1, answered with a 503 error at random
+        payload_size(int): length of the message added to the actions of the submissions, to return larger responses
+        seed(int): seed of the random errors, to send the same errors at each run
+
+    Returns:
+        fake_app(FastAPI): the app, whose state keeps track of the requests received and being served at the same time.
+            Setting fake_app.state.outage to True makes it respond 503 to every request
+    """
+    fake_app = FastAPI()
+    fake_app.state.in_flight = 0
+    fake_app.state.max_in_flight = 0
+    fake_app.state.requests = 0
+    fake_app.state.faults = deque(faults or [])
+    fake_app.state.outage = False
+    errors = random.Random(seed)
+
+    @fake_app.middleware("http")
+    async def simulate_latency(request: Request, call_next):
+        fake_app.state.requests += 1
+        fake_app.state.in_flight += 1
+        fake_app.state.max_in_flight = max(fake_app.state.max_in_flight, fake_app.state.in_flight)
+        try:
+            await asyncio.sleep(latency)
+            if fake_app.state.outage:
+                return JSONResponse(status_code=503, content={"message": "Service unavailable"})
+            if fake_app.state.faults:
+                fault = fake_app.state.faults.popleft()
+                return JSONResponse(
+                    status_code=fault["status_code"],
+                    content={"message": f"Injected error {fault['status_code']}"},
+                    headers=fault.get("headers"),
+                )
+            if error_rate and errors.random() < error_rate:
+                return JSONResponse(
+                    status_code=RANDOM_ERROR_STATUS_CODE,
+                    content={"message": f"Injected error {RANDOM_ERROR_STATUS_CODE}"},
+                )
+            if not request.headers.get("SP-API-KEY"):
+                return JSONResponse(
+                    status_code=401, content={"message": "No valid API key provided"}
+                )
+            return await call_next(request)
+        finally:
+            fake_app.state.in_flight -= 1
+
+    # Deletions are posted to the submissions URL without trailing slash
+    @fake_app.post("/api/v1/submissions")
+    @fake_app.post("/api/v1/submissions/")
+    @fake_app.post("/apitest/v1/submissions")
+    async def submit(request: Request):
+        if request.query_params.get("dry-run") == "true":
+            return Response(status_code=204)
+        return JSONResponse(status_code=201, content={"id": DEMO_SUBMISSION_ID})
+
+    @fake_app.get("/api/v1/submissions/{submission_id}/actions/")
+    @fake_app.get("/apitest/v1/submissions/{submission_id}/actions/")
+    async def actions(submission_id: str):
+        responses = []
+        if payload_size:
+            responses.append(
+                {
+                    "status": "processing",
+                    "message": {"severity": "info", "text": "x" * payload_size},
+                    "files": [],
+                    "objects": [],
+                }
+            )
+        return {
+            "actions": [
+                {
+                    "id": f"{submission_id}-1",
+                    "responses": responses,
+                    "status": "submitted",
+                    "targetDb": "clinvar",
+                }
+            ]
+        }
+
+    return fake_app
+
+
+def main():
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds waited before each response"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests failing with a 503"
+    )
+    parser.add_argument(
+        "--payload-size",
+        type=int,
+        default=0,
+        help="Length of the message added to the actions of the submissions",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random errors")
+    args = parser.parse_args()
+
+    fake_app = create_fake_clinvar_app(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        payload_size=args.payload_size,
+        seed=args.seed,
+    )
+    uvicorn.run(fake_app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
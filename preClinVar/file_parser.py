@@ -1,22 +1,28 @@
+import codecs
+import csv
+import io
 import logging
-import os
-from csv import DictReader
-from tempfile import NamedTemporaryFile
+import time
 
-from preClinVar.constants import CLNSIG_TERMS, CONDITIONS_MAP, SNV_COORDS, SV_COORDS
+from preClinVar.compression import DECOMPRESSION_ERRORS, open_decompressed
+from preClinVar.constants import CONDITIONS_MAP, SNV_COORDS, SV_COORDS
+from preClinVar.metrics import record_stage
+from preClinVar.vocabulary import get_vocabularies, normalize_value
 
 LOG = logging.getLogger("uvicorn.access")
 
+CHUNK_SIZE = 64 * 1024  # Bytes read at a time from uploaded files
+PARSING_ERRORS = (csv.Error, UnicodeDecodeError, *DECOMPRESSION_ERRORS)
 
-def set_assertion_criteria_from_csv(subm_obj, variants_lines):
+
+def set_assertion_criteria_from_csv(subm_obj, a_line):
     """Set the assertionCriteria key/values for an API submission item
 
     Args:
         subm_obj(dict). An empty submission object
-        variants_dict(list) list of dicts. May contain or not the Assertion method citation fields
+        a_line(dict). First line of the Variant file. May contain or not the Assertion method citation fields
     """
     assertion_criteria = {}
-    a_line = variants_lines[0]
     # Look for Assertion method citation info on the first line of the CVS
     if a_line.get("Assertion method citation"):
         asc = a_line.get("Assertion method citation")
@@ -48,16 +54,13 @@ def set_item_clin_sig(item, variant_dict):
         "Germline classification"
     )
     # Make sure clinsig term is compliant with API standards:
-    for term in CLNSIG_TERMS:
-        if clinsig.lower() == term.lower():
-            clinsig = term
-            break
+    clinsig = get_vocabularies()["Clinical significance"].get(clinsig.lower(), clinsig)
 
     clinsig_comment = variant_dict.get("Comment on clinical significance") or variant_dict.get(
         "Comment on classification"
     )
     last_eval = variant_dict.get("Date last evaluated")
-    inherit_mode = variant_dict.get("Mode of inheritance")
+    inherit_mode = normalize_value("Mode of inheritance", variant_dict.get("Mode of inheritance"))
 
     item["clinicalSignificance"] = {"clinicalSignificanceDescription": clinsig}
     if clinsig_comment:
@@ -81,7 +84,9 @@ def set_item_condition_set(item: dict, variant_dict: dict):
     conditions: list = []
 
     # Check if condition ID is specified in Variant file
-    cond_db: str = CONDITIONS_MAP.get(variant_dict.get("Condition ID type"))
+    cond_db: str = CONDITIONS_MAP.get(
+        normalize_value("Condition ID type", variant_dict.get("Condition ID type"))
+    )
     cond_values: str = variant_dict.get("Condition ID value")
     multi_condition_explanation: str = variant_dict.get("Explanation for multiple conditions")
 
@@ -120,26 +125,40 @@ def set_item_local_key(item, variant_dict):
         item["localKey"] = local_key
 
 
-def set_item_observed_in(item, casedata_lines):
-    """Set the observedIn key/values for an API submission item
+def index_casedata_lines(casedata_lines):
+    """Group the lines of a CaseData file by Linking ID, in one pass and preserving the order of the rows
+
     Args:
-        item(dict). An item in the clinvarSubmission.items list
         casedata_lines(list of dicts). Example:
             [{'Linking ID': '69b138a4c5caf211d796a59a7b46e40d', 'Individual ID': '20210316-03', 'Collection method': 'clinical testing', 'Allele origin': 'germline', 'Affected status': 'yes', 'Sex': 'male', 'Family history': 'no', 'Proband': 'yes', ..}, ..]
+
+    Returns:
+        casedata_index(dict): Example: {'69b138a4c5caf211d796a59a7b46e40d': [{'Linking ID': '69b138a4c5caf211d796a59a7b46e40d', 'Individual ID': '20210316-03', ..}, ..], ..}
+    """
+    casedata_index = {}
+    for line_dict in casedata_lines:
+        casedata_index.setdefault(line_dict.get("Linking ID"), []).append(line_dict)
+    return casedata_index
+
+
+def set_item_observed_in(item, casedata_index):
+    """Set the observedIn key/values for an API submission item
+    Args:
+        item(dict). An item in the clinvarSubmission.items list
+        casedata_index(dict). CaseData lines grouped by Linking ID, as returned by index_casedata_lines
     """
     var_link_id = item.get("localKey")  # ID of the variant
     obs_in = []
 
-    # Loop over case data and collect individuals associated with the variant linking ID
-    for line_dict in casedata_lines:
-        if var_link_id != line_dict.get("Linking ID"):
-            continue
-
+    # Collect individuals associated with the variant linking ID
+    for line_dict in casedata_index.get(var_link_id, []):
         # set first required params
         obs = {
-            "affectedStatus": line_dict.get("Affected status"),
-            "alleleOrigin": line_dict.get("Allele origin"),
-            "collectionMethod": line_dict.get("Collection method"),
+            "affectedStatus": normalize_value("Affected status", line_dict.get("Affected status")),
+            "alleleOrigin": normalize_value("Allele origin", line_dict.get("Allele origin")),
+            "collectionMethod": normalize_value(
+                "Collection method", line_dict.get("Collection method")
+            ),
         }
         if line_dict.get("Clinical features"):
             obs["clinicalFeatures"] = line_dict.get("Clinical features").split(";")
@@ -260,7 +279,7 @@ def set_item_variant_set(item, variant_dict):
 
     # Check if file contains type of variant (SV variants)
     if variant_dict.get("Variant type"):
-        variant["variantType"] = variant_dict["Variant type"]
+        variant["variantType"] = normalize_value("Variant type", variant_dict["Variant type"])
 
     item["variantSet"]["variant"] = [variant]
 
@@ -270,8 +289,9 @@ def file_fields_to_submission(variants_lines, casedata_lines):
        from the fields present in Variant and CaseData csv files
 
     Args:
-        variants_lines(list of dicts). [{'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH', 'Reference sequence': 'NM_000379.4', ..}, {..}]
-        casedata_lines(list of dicts). Example:
+        variants_lines(iterable of dicts). [{'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH', 'Reference sequence': 'NM_000379.4', ..}, {..}]
+            Lines are consumed one at a time, so they can be streamed from the uploaded file
+        casedata_lines(iterable of dicts). Example: [{'Linking ID': '69b138a4c5caf211d796a59a7b46e40d', 'Individual ID': '20210316-03', ..}, ..]
 
     Returns:
         clinvar_submission(dict): a json submission dictionary formatted according to this schema:
@@ -279,30 +299,96 @@ def file_fields_to_submission(variants_lines, casedata_lines):
     """
     subm_object = {}
 
-    # try to parse assertion criteria from old format of CSV file
-    set_assertion_criteria_from_csv(subm_object, variants_lines)
+    # Time spent indexing the CaseData lines and creating the items, not including reading the Variant lines
+    start = time.perf_counter()
+    casedata_index = index_casedata_lines(casedata_lines)
+    build_duration = time.perf_counter() - start
 
     items = []
     # Loop over the variants to submit and create a
     for line_dict in variants_lines:
+        start = time.perf_counter()
+        if not items:  # try to parse assertion criteria from old format of CSV file
+            set_assertion_criteria_from_csv(subm_object, line_dict)
+
         item = {}  # For each variant in the csv file (one line), create a submission item
         set_item_clin_sig(item, line_dict)
         set_item_condition_set(item, line_dict)
         set_item_local_id(item, line_dict)
         set_item_local_key(item, line_dict)
-        set_item_observed_in(item, casedata_lines)
+        set_item_observed_in(item, casedata_index)
         set_item_variant_set(item, line_dict)
         set_item_record_status(item)
 
         filtered = {k: v for k, v in item.items() if v is not None}
 
         items.append(filtered)
+        build_duration += time.perf_counter() - start
 
     subm_object["clinvarSubmission"] = items
+    record_stage("build_items", build_duration, len(items))
 
     return subm_object
 
 
+def _iter_text_lines(file_obj, chunk_size=CHUNK_SIZE):
+    """Decode a binary file one chunk at a time and yield its lines as soon as they are complete
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+        chunk_size(int): number of bytes read from the file at a time
+
+    Yields:
+        line(str): a line of the file, including its line terminator. An eventual BOM is removed
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()  # Last line might continue in the next chunk
+        for line in lines:
+            yield line + "\n"
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_file_lines(file_obj, delimiter, chunk_size=CHUNK_SIZE):
+    """Parse a delimited (comma or tab-separated) file while reading it in chunks, without loading it all in memory
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+        delimiter(str): "," for CSV files or "\t" for TSV files
+        chunk_size(int): number of bytes read from the file at a time
+
+    Yields:
+        line(dict): a dictionary for each line of the file. Example: {'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH'}
+    """
+    # The csv module receives each line with its terminator, handling CRLF and quoted newlines
+    yield from csv.DictReader(_iter_text_lines(file_obj, chunk_size), delimiter=delimiter)
+
+
+def _delimited_file_lines(contents, delimiter):
+    """Retrieve contents of a delimited (comma or tab-separated) file, reading it directly from the uploaded bytes
+
+    Args:
+        contents(bytes): contents of one of the files uploaded, as bytes
+        delimiter(str): "," for CSV files or "\t" for TSV files
+
+    Returns:
+        lines(list): a list of dictionaries, one for each line of the original file
+    """
+    try:
+        return list(iter_file_lines(open_decompressed(io.BytesIO(contents)), delimiter))
+    except PARSING_ERRORS as ex:
+        LOG.error(f"An error occurred while parsing file: {ex}")
+        return []
+
+
 def _tsv_file_lines(contents):
     """Retrieve contents of a tab-separated file
 
@@ -312,72 +398,59 @@ def _tsv_file_lines(contents):
     Returns:
         line_dicts(list): a list of dictionaries, one for each line of the original file
     """
-    lines = []
-    try:
-        line_contents = contents.decode("UTF-8").replace("\r", "").split("\n")
-        header = line_contents[0].split("\t")
-        for row in line_contents[1:]:
-            if row.rstrip():
-                row_values = row.split("\t")
-                line = {}
-                for n, key in enumerate(header):
-                    line[key.strip('"')] = row_values[n].strip('"')
-                lines.append(line)
-    except Exception as ex:
-        LOG.error("An error occurred while parsing TSV file")
-
-    return lines
+    return _delimited_file_lines(contents, delimiter="\t")
 
 
 def _csv_file_lines(contents):
-    """Retrieve contents of a tab-separated file
+    """Retrieve contents of a comma-separated file
 
     Args:
         contents(bytes): contents of one of the files uploaded, as bytes
 
     Returns:
-        lines(list): a list of rows from a DictReader object
+        lines(list): a list of dictionaries, one for each line of the original file
     """
-    lines = []
-    file_copy = NamedTemporaryFile(delete=False)
-    try:
-        with file_copy as f:
-            f.write(contents)
+    return _delimited_file_lines(contents, delimiter=",")
 
-        with open(file_copy.name) as csvf:
-            csvreader = DictReader(csvf)
-            for row in csvreader:
-                lines.append(row)
 
-    finally:
-        file_copy.close()  # Close temp file
-        os.unlink(file_copy.name)  # Delete temp file
+def _upload_file_lines(upload_file, delimiter):
+    """Parse the lines of an uploaded file as its chunks are read, raising a ValueError with the file name if the file can't be parsed.
+    Gzip or zstd-compressed files are decompressed while they are read.
 
-    return lines
+    Args:
+        upload_file(starlette.datastructures.UploadFile)
+        delimiter(str): "," for CSV files or "\t" for TSV files
+
+    Yields:
+        line(dict)
+    """
+    try:
+        yield from iter_file_lines(open_decompressed(upload_file.file), delimiter)
+    except PARSING_ERRORS as ex:
+        LOG.error(f"An error occurred while parsing file {upload_file.filename}: {ex}")
+        raise ValueError(f"Malformed file {upload_file.filename}")
 
 
-async def tsv_lines(tsv_file):
-    """Extracts lines from a csv file using a csv DictReader
+def tsv_lines(tsv_file):
+    """Extracts lines from a tab-separated uploaded file, one at a time
 
     Args:
         tsv_file(starlette.datastructures.UploadFile)
 
-    Returns:
-        lines(list of dictionaries). Example [{'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH'}, ..]
+    Yields:
+        line(dict). Example {'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH'}
 
     """
-    contents = await tsv_file.read()
-    return _tsv_file_lines(contents)
+    return _upload_file_lines(tsv_file, delimiter="\t")
 
 
-async def csv_lines(csv_file):
-    """Extracts lines from a csv file using a csv DictReader
+def csv_lines(csv_file):
+    """Extracts lines from a comma-separated uploaded file, one at a time
 
     Args:
         csv_file(starlette.datastructures.UploadFile)
 
-    Returns:
-        lines(list of dictionaries). Example [{'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH'}, ..]
+    Yields:
+        line(dict). Example {'##Local ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Linking ID': '1d9ce6ebf2f82d913cfbe20c5085947b', 'Gene symbol': 'XDH'}
     """
-    contents = await csv_file.read()
-    return _csv_file_lines(contents)
+    return _upload_file_lines(csv_file, delimiter=",")
@@ -0,0 +1,42 @@
+"""Gunicorn settings of the Docker image, with an app-preload mode sharing the read-only state of the app between workers.
+
+With GUNICORN_PRELOAD=true the app is imported once in the gunicorn master, which also builds the submission schema,
+its validators and the lookup tables of the controlled fields before forking the workers. Workers inherit these objects
+copy-on-write instead of building their own copy. They are moved to the permanent generation of the garbage collector,
+so that collections in the workers don't write to their pages. None of them is modified by the requests.
+
+Usage:
+    gunicorn --config python:preClinVar.gunicorn_conf --worker-class uvicorn.workers.UvicornWorker preClinVar.main:app
+"""
+
+import gc
+import importlib
+import os
+
+# Modules imported by the app on first use, imported before forking the workers when the app is preloaded
+LAZY_MODULES = ["jsonschema", "tarfile", "zipfile"]
+
+###### Preload settings, can be overridden by environment variables ######
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+
+def build_shared_state():
+    """Import the modules imported on first use and build the objects shared by all requests:
+    the submission schema, its validators and the lookup tables of the controlled fields"""
+    from preClinVar.validate import warm_up_validators
+    from preClinVar.vocabulary import get_vocabularies
+
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+    warm_up_validators()
+    get_vocabularies()
+
+
+def when_ready(server):
+    """Called in the master process once the app is loaded, before the workers are forked"""
+    if not server.cfg.preload_app:
+        return
+    build_shared_state()
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Shared state built before forking, {gc.get_freeze_count()} objects frozen")
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from fastapi.responses import Response
+
+LOG = logging.getLogger("uvicorn.access")
+
+###### Conversion jobs settings, can be overridden by environment variables ######
+# Number of jobs run at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+# Maximum number of jobs waiting to be run. New jobs are rejected when the queue is full
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "10"))
+# Seconds during which the status and result of a finished job can be retrieved
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+# Maximum total size in bytes of the results of the finished jobs. The oldest results are removed first
+JOB_RESULTS_MAX_BYTES = int(os.getenv("JOB_RESULTS_MAX_BYTES", "268435456"))
+# Maximum number of seconds a status request waits for a job to change status
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "60"))
+WAIT_POLL_INTERVAL = (
+    0.1  # Seconds between two checks of the status of a job waited by a status request
+)
+
+# The job run by the current thread, if any
+_current_job: ContextVar[Optional["Job"]] = ContextVar("current_job", default=None)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue of jobs is full"""
+
+
+class Job:
+    """A conversion run in the background, with its progress and result"""
+
+    def __init__(self, description: str):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = JobStatus.QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Example: {"stage": "validate", "rows_parsed": 1000, "items_built": 1000, "items_validated": 500}
+        self.progress: Dict[str, object] = {}
+        self.response: Optional[Response] = None
+        self.future: Optional[Future] = None
+        self.cleanup: Optional[Callable[[], None]] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    @property
+    def result_size(self) -> int:
+        """Size in bytes of the body of the result"""
+        if self.response is None:
+            return 0
+        return len(self.response.body)
+
+    def to_dict(self) -> dict:
+        """Return the status of the job, as returned by the job status endpoint"""
+        job_dict = {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status.value,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": dict(self.progress),
+        }
+        if self.done:
+            job_dict["result_status_code"] = self.response.status_code
+        return job_dict
+
+
+def report_progress(**progress):
+    """Update the progress of the job run by the current thread. Does nothing outside of a job
+
+    Example:
+        report_progress(stage="validate", items_validated=500)
+    """
+    job = _current_job.get()
+    if job is not None:
+        job.progress.update(progress)
+
+
+def track_rows(rows: Iterable, counter: str) -> Iterable:
+    """Count the elements of an iterable in the progress of the job run by the current thread, while they are consumed.
+    The iterable is returned unchanged outside of a job.
+
+    Args:
+        rows(iterable): for instance the lines of a Variant file
+        counter(str): name of the progress counter. Example: "rows_parsed"
+    """
+    job = _current_job.get()
+    if job is None:
+        return rows
+    return _iter_counted(rows, job, counter)
+
+
+def _iter_counted(rows: Iterable, job: Job, counter: str) -> Iterator:
+    job.progress[counter] = 0
+    for count, row in enumerate(rows, 1):
+        job.progress[counter] = count
+        yield row
+
+
+def progress_callback(counter: str) -> Optional[Callable[[int], None]]:
+    """Return a function setting a progress counter of the job run by the current thread, or None outside of a job"""
+    job = _current_job.get()
+    if job is None:
+        return None
+
+    def set_counter(value: int):
+        job.progress[counter] = value
+
+    return set_counter
+
+
+class JobManager:
+    """Run jobs on a bounded pool of threads, keeping their status and result for a limited time and total size"""
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        max_queued: int = JOB_MAX_QUEUED,
+        result_ttl: float = JOB_RESULT_TTL,
+        results_max_bytes: int = JOB_RESULTS_MAX_BYTES,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.results_max_bytes = results_max_bytes
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="conversion-job"
+            )
+        return self._executor
+
+    def _remove_expired(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.finished > self.result_ttl:
+                del self._jobs[job_id]
+
+    def _remove_oldest_results(self, finished_job: Job):
+        """Remove the oldest finished jobs until their results don't exceed results_max_bytes.
+        The result of the job which just finished is kept, even if it exceeds the limit on its own."""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done), key=lambda job: job.finished
+        )
+        results_size = sum(job.result_size for job in finished)
+        for job in finished:
+            if results_size <= self.results_max_bytes or job is finished_job:
+                break
+            LOG.warning(
+                f"Result of job {job.id} removed, results exceed {self.results_max_bytes} bytes"
+            )
+            results_size -= job.result_size
+            del self._jobs[job.id]
+
+    def queued(self) -> int:
+        """Return the number of jobs waiting to be run"""
+        return sum(job.status == JobStatus.QUEUED for job in list(self._jobs.values()))
+
+    def submit(
+        self, description: str, run: Callable[[], Response], cleanup: Callable[[], None] = None
+    ) -> Job:
+        """Queue a job
+
+        Args:
+            description(str): Example: "csv_2_json"
+            run(function): the conversion, returning the response which is the result of the job
+            cleanup(function): called when the job is finished, for instance to close the uploaded files
+
+        Returns:
+            job(Job)
+
+        Raises:
+            QueueFullError: if max_queued jobs are already waiting to be run
+        """
+        with self._lock:
+            self._remove_expired()
+            if self.queued() >= self.max_queued:
+                raise QueueFullError(f"Too many jobs queued ({self.max_queued})")
+            job = Job(description)
+            job.cleanup = cleanup
+            self._jobs[job.id] = job
+        job.future = self._get_executor().submit(self._run, job, run)
+        return job
+
+    def _run(self, job: Job, run: Callable[[], Response]):
+        token = _current_job.set(job)
+        job.started = time.time()
+        job.status = JobStatus.RUNNING
+        try:
+            job.response = run()
+        except Exception as ex:
+            LOG.error(f"Job {job.id} failed: {ex}")
+            job.response = Response(
+                content=f'{{"message": "Job failed: {type(ex).__name__}"}}',
+                status_code=500,
+                media_type="application/json",
+            )
+        finally:
+            _current_job.reset(token)
+            if job.cleanup:
+                job.cleanup()
+        self._finish(
+            job, JobStatus.SUCCEEDED if job.response.status_code < 400 else JobStatus.FAILED
+        )
+
+    def _finish(self, job: Job, status: JobStatus):
+        with self._lock:
+            job.finished = time.time()
+            job.status = status
+            self._remove_oldest_results(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by ID, or None if the job doesn't exist or has expired"""
+        with self._lock:
+            self._remove_expired()
+            return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float):
+        """Wait until the status of a job changes, or the timeout expires"""
+        status = job.status
+        deadline = time.monotonic() + min(timeout, JOB_MAX_WAIT)
+        while job.status == status and time.monotonic() < deadline:
+            await asyncio.sleep(WAIT_POLL_INTERVAL)
+
+    def shutdown(self):
+        """Stop the threads running the jobs, cancelling the queued jobs"""
+        if self._executor is None:
+            return
+        for job in list(self._jobs.values()):
+            if job.future is not None and job.future.cancel():
+                job.response = Response(
+                    content='{"message": "Job cancelled: the server was stopped"}',
+                    status_code=503,
+                    media_type="application/json",
+                )
+                if job.cleanup:
+                    job.cleanup()
+                self._finish(job, JobStatus.CANCELLED)
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+
+job_manager = JobManager()
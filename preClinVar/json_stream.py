@@ -0,0 +1,74 @@
+import json
+from typing import Iterator
+
+from preClinVar.constants import SUBMISSION_ITEMS_KEYS
+
+try:  # orjson is an optional, faster json encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+STREAM_CHUNK_SIZE = 64 * 1024  # Minimum number of bytes sent at a time by a streaming response
+
+
+def dumps(obj) -> bytes:
+    """Encode an object to compact json, using orjson when it is installed
+
+    Args:
+        obj(dict, list, str ..): a json-serializable object
+
+    Returns:
+        encoded(bytes): the object encoded as UTF-8 json, like the body of a JSONResponse
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def _iter_submission_parts(submission_dict: dict) -> Iterator[bytes]:
+    """Encode a submission object one part at a time, each of the submission items being a part
+
+    Args:
+        submission_dict(dict): a submission object like this { "clinvarSubmission" : [list of submission items], "submissionName": .. }
+
+    Yields:
+        part(bytes): a piece of the encoded submission
+    """
+    yield b"{"
+    for n_key, (key, value) in enumerate(submission_dict.items()):
+        yield (b"," if n_key else b"") + dumps(key) + b":"
+        if key in SUBMISSION_ITEMS_KEYS and isinstance(value, list):
+            yield b"["
+            for n_item, item in enumerate(value):
+                yield (b"," if n_item else b"") + dumps(item)
+            yield b"]"
+        else:
+            yield dumps(value)
+    yield b"}"
+
+
+def iter_submission_json(
+    submission_dict: dict, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Encode a submission object to json incrementally, to be sent by a StreamingResponse
+
+    Args:
+        submission_dict(dict): a submission object
+        chunk_size(int): encoded items are collected and sent in chunks of at least this size
+
+    Yields:
+        chunk(bytes): a piece of the encoded submission
+    """
+    buffer = []
+    buffer_size = 0
+    for part in _iter_submission_parts(submission_dict):
+        buffer.append(part)
+        buffer_size += len(part)
+        if buffer_size >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            buffer_size = 0
+    if buffer:
+        yield b"".join(buffer)
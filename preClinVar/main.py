@@ -1,34 +1,118 @@
+import asyncio
 import json
 import logging
 import re
+import shutil
+import tempfile
 from contextlib import asynccontextmanager
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-import requests
-import uvicorn
-from fastapi import FastAPI, File, Form, Request, UploadFile
-from fastapi.responses import JSONResponse
+import httpx
+from fastapi import Depends, FastAPI, File, Form, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 from preClinVar.__version__ import VERSION
-from preClinVar.build import build_header, build_submission
+from preClinVar.batch import (
+    ArchiveError,
+    BatchOutput,
+    extract_files,
+    match_file_pairs,
+    result_line,
+    results_archive,
+)
+from preClinVar.build import build_add_data_payload, build_header, count_items, split_submission
+from preClinVar.cache import (
+    conversion_cache,
+    conversion_cache_key,
+    status_cache,
+    status_cache_key,
+    status_lookups,
+    status_ttl,
+)
+from preClinVar.clinvar_client import (
+    MAX_CONCURRENT_REQUESTS,
+    create_client,
+    fetch_submissions_actions,
+    get_clinvar_client,
+    post_submissions,
+    request_error,
+    response_content,
+)
+from preClinVar.columnar import DEFAULT_ENGINE, ConversionEngine, file_columns_to_submission
+from preClinVar.compression import CompressionMiddleware, load_json
 from preClinVar.constants import DRY_RUN_SUBMISSION_URL, SUBMISSION_URL, VALIDATE_SUBMISSION_URL
-from preClinVar.file_parser import csv_lines, file_fields_to_submission, tsv_lines
-from preClinVar.validate import validate_submission
+from preClinVar.convert import (
+    DELIMITERS,
+    ConversionError,
+    convert_files,
+    convert_variants_rows,
+    invalid_values_message,
+    load_and_validate,
+    malformed_file_message,
+    missing_files_message,
+    parse_casedata,
+    parse_variants_columns,
+    validate_and_encode,
+    validation_errors_message,
+)
+from preClinVar.file_parser import csv_lines, tsv_lines
+from preClinVar.jobs import JOB_MAX_WAIT, QueueFullError, job_manager, report_progress
+from preClinVar.json_stream import iter_submission_json
+from preClinVar.metrics import (
+    METRICS_CONTENT_TYPE,
+    ServerTimingMiddleware,
+    iter_timed,
+    render_metrics,
+)
+from preClinVar.offload import (
+    FileOnDisk,
+    copy_to_disk,
+    in_processes,
+    run_cpu_bound,
+    run_in_processes,
+    shutdown_cpu_executor,
+    validation_processes,
+)
+from preClinVar.validate import (
+    MAX_ERRORS,
+    VALIDATION_PROCESSES,
+    VALIDATOR_WARM_UP,
+    ValidationMode,
+    shutdown_validation_pool,
+    warm_up_validators,
+)
 
 LOG = logging.getLogger("uvicorn.access")
 
+# Files uploaded to conversion jobs are copied to disk when larger than this size, in bytes
+JOB_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
 
 @asynccontextmanager
 async def lifespan(app_: FastAPI):
+    from uvicorn.logging import ColourizedFormatter
+
     LOG = logging.getLogger("uvicorn.access")
-    console_formatter = uvicorn.logging.ColourizedFormatter(
+    console_formatter = ColourizedFormatter(
         "{levelprefix} {asctime} : {message}", style="{", use_colors=True
     )
     LOG.handlers[0].setFormatter(console_formatter)
+
+    # A pool of keep-alive connections to the ClinVar API, shared by all the proxy endpoints
+    app_.state.clinvar_client = create_client()
+    if VALIDATOR_WARM_UP:
+        # The server accepts requests while the validators are built in a thread
+        asyncio.get_running_loop().run_in_executor(None, warm_up_validators)
     yield
+    await app_.state.clinvar_client.aclose()
+    job_manager.shutdown()
+    shutdown_cpu_executor()
+    shutdown_validation_pool()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(CompressionMiddleware)
 
 
 @app.get("/")
@@ -36,68 +120,199 @@ async def root():
     return {"message": f"preClinVar v{VERSION} is up and running!"}
 
 
+@app.get("/conversion-cache")
+async def conversion_cache_stats():
+    """Returns the number of entries, size in bytes, hits, misses and evictions of the cache of converted submissions"""
+    return conversion_cache.stats()
+
+
+@app.get("/status-cache")
+async def status_cache_stats():
+    """Returns the number of entries, hits, misses, evictions and coalesced lookups of the cache of submission statuses"""
+    return {**status_cache.stats(), **status_lookups.stats()}
+
+
+async def _cached_actions(
+    clinvar_client: httpx.AsyncClient, submissions_url: str, api_key: str, submission_id: str
+) -> Tuple[int, dict]:
+    """Retrieve the actions of a submission from the cache of statuses, or from ClinVar API.
+    Concurrent identical lookups share a single request to the API, and only successful responses are cached.
+
+    Returns:
+        (status_code, actions): status code and JSON content of the response
+    """
+    key = status_cache_key(submissions_url, api_key, submission_id)
+    cached = status_cache.get(key)
+    if cached is not None:
+        return 200, cached
+
+    async def fetch_actions() -> Tuple[int, dict]:
+        actions_url = f"{submissions_url}/{submission_id}/actions/"
+        try:
+            resp = await clinvar_client.get(actions_url, headers=build_header(api_key))
+        except httpx.HTTPError as ex:
+            LOG.error(f"Error while retrieving {actions_url}: {ex}")
+            return 502, request_error(ex)
+        actions = response_content(resp)
+        if resp.status_code == 200 and status_cache.enabled:
+            status_cache.set(key, actions, ttl=status_ttl(actions))
+        return resp.status_code, actions
+
+    return await status_lookups.do(key, fetch_actions)
+
+
+async def _post_to_clinvar(
+    clinvar_client: httpx.AsyncClient, url: str, data: dict, header: dict
+) -> Union[httpx.Response, JSONResponse]:
+    """Send a POST request to the ClinVar API
+
+    Returns:
+        the response of the ClinVar API, or a response with status code 502 if the request failed
+    """
+    try:
+        return await clinvar_client.post(url, content=json.dumps(data), headers=header)
+    except httpx.HTTPError as ex:
+        LOG.error(f"Error while sending request to {url}: {ex}")
+        return JSONResponse(status_code=502, content=request_error(ex))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Returns durations of the conversion stages and latency of the ClinVar API requests, in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/apitest-status")
-async def apitest_status(api_key: str = Form(), submission_id: str = Form()) -> JSONResponse:
+async def apitest_status(
+    api_key: str = Form(),
+    submission_id: str = Form(),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+) -> JSONResponse:
     """Returns the status (validation) of a test submission to the apitest endpoint."""
+    status_code, actions = await _cached_actions(
+        clinvar_client, VALIDATE_SUBMISSION_URL, api_key, submission_id
+    )
+    return JSONResponse(status_code=status_code, content=actions)
+
+
+async def _submit_in_chunks(
+    clinvar_client: httpx.AsyncClient,
+    url: str,
+    submission_obj: dict,
+    header: dict,
+    chunk_size: Optional[int],
+    chunk_max_bytes: Optional[int],
+    max_concurrency: int,
+) -> JSONResponse:
+    """Split a submission into chunks of at most chunk_size items and chunk_max_bytes bytes (request body, once encoded in json)
+    and send them in parallel to a ClinVar API endpoint
+
+    Returns:
+        A response with the results for each chunk. Status code is the one returned by the ClinVar API for all chunks or 207 if it differs between chunks
+    """
+    if chunk_max_bytes:
+        # The chunks are sent in the AddData action of the request body
+        chunk_max_bytes -= len(json.dumps(build_add_data_payload({}))) - len("{}")
+    chunks = split_submission(submission_obj, chunk_size, chunk_max_bytes)
+    results = await post_submissions(
+        clinvar_client,
+        url,
+        [build_add_data_payload(chunk) for chunk in chunks],
+        header,
+        max_concurrency,
+    )
 
-    # Create a submission header
-    header = build_header(api_key)
-
-    apitest_actions_url = f"{VALIDATE_SUBMISSION_URL}/{submission_id}/actions/"
-    apitest_actions_resp = requests.get(apitest_actions_url, headers=header)
+    chunk_results = []
+    first_item = 0
+    for n, (chunk, result) in enumerate(zip(chunks, results)):
+        if url == DRY_RUN_SUBMISSION_URL and result["status_code"] == 204:
+            result = {"status_code": 200, "message": "success"}
+        chunk_results.append({"chunk": n, "first_item": first_item, **result})
+        first_item += count_items(chunk)
 
+    status_codes = {result["status_code"] for result in chunk_results}
     return JSONResponse(
-        status_code=apitest_actions_resp.status_code,
-        content=apitest_actions_resp.json(),
+        status_code=status_codes.pop() if len(status_codes) == 1 else 207,
+        content={"chunks": chunk_results},
     )
 
 
 @app.post("/apitest")
-async def apitest(api_key: str = Form(), json_file: UploadFile = File(...)):
-    """A proxy to the apitest ClinVar API endpoint"""
+async def apitest(
+    api_key: str = Form(),
+    json_file: UploadFile = File(...),
+    chunk_size: Optional[int] = Form(None, gt=0),
+    chunk_max_bytes: Optional[int] = Form(None, gt=0),
+    max_concurrency: int = Form(MAX_CONCURRENT_REQUESTS, gt=0, le=MAX_CONCURRENT_REQUESTS),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+):
+    """A proxy to the apitest ClinVar API endpoint.
+    If chunk_size or chunk_max_bytes is provided, submissions are split into chunks sent in parallel, containing at most
+    chunk_size items (of all the lists of items) and whose request body doesn't exceed chunk_max_bytes bytes.
+    """
     # Create a submission header
     header = build_header(api_key)
 
     # Get json file content as dict:
-    submission_obj = json.load(json_file.file)
+    submission_obj = await run_cpu_bound(load_json, await json_file.read())
+
+    if chunk_size or chunk_max_bytes:
+        return await _submit_in_chunks(
+            clinvar_client,
+            VALIDATE_SUBMISSION_URL,
+            submission_obj,
+            header,
+            chunk_size,
+            chunk_max_bytes,
+            max_concurrency,
+        )
 
     # And use it in POST request to API
-    data = {
-        "actions": [
-            {
-                "type": "AddData",
-                "targetDb": "clinvar",
-                "data": {"content": submission_obj},
-            }
-        ]
-    }
-    resp = requests.post(VALIDATE_SUBMISSION_URL, data=json.dumps(data), headers=header)
+    data = build_add_data_payload(submission_obj)
+    resp = await _post_to_clinvar(clinvar_client, VALIDATE_SUBMISSION_URL, data, header)
+    if isinstance(resp, JSONResponse):
+        return resp
     return JSONResponse(
         status_code=resp.status_code,
-        content=resp.json(),
+        content=response_content(resp),
     )
 
 
 @app.post("/dry-run")
-async def dry_run(api_key: str = Form(), json_file: UploadFile = File(...)):
-    """A proxy to the dry run submission ClinVar API endpoint"""
+async def dry_run(
+    api_key: str = Form(),
+    json_file: UploadFile = File(...),
+    chunk_size: Optional[int] = Form(None, gt=0),
+    chunk_max_bytes: Optional[int] = Form(None, gt=0),
+    max_concurrency: int = Form(MAX_CONCURRENT_REQUESTS, gt=0, le=MAX_CONCURRENT_REQUESTS),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+):
+    """A proxy to the dry run submission ClinVar API endpoint.
+    If chunk_size or chunk_max_bytes is provided, submissions are split into chunks sent in parallel, containing at most
+    chunk_size items (of all the lists of items) and whose request body doesn't exceed chunk_max_bytes bytes.
+    """
     # Create a submission header
     header = build_header(api_key)
 
     # Get json file content as dict:
-    submission_obj = json.load(json_file.file)
+    submission_obj = await run_cpu_bound(load_json, await json_file.read())
+
+    if chunk_size or chunk_max_bytes:
+        return await _submit_in_chunks(
+            clinvar_client,
+            DRY_RUN_SUBMISSION_URL,
+            submission_obj,
+            header,
+            chunk_size,
+            chunk_max_bytes,
+            max_concurrency,
+        )
 
     # And use it in POST request to API
-    data = {
-        "actions": [
-            {
-                "type": "AddData",
-                "targetDb": "clinvar",
-                "data": {"content": submission_obj},
-            }
-        ]
-    }
-    resp = requests.post(DRY_RUN_SUBMISSION_URL, data=json.dumps(data), headers=header)
+    data = build_add_data_payload(submission_obj)
+    resp = await _post_to_clinvar(clinvar_client, DRY_RUN_SUBMISSION_URL, data, header)
+    if isinstance(resp, JSONResponse):
+        return resp
 
     # A successful response will be an empty response with code 204 (A dry-run submission was successful and no submission was created)
     if resp.status_code == 204:
@@ -107,59 +322,214 @@ async def dry_run(api_key: str = Form(), json_file: UploadFile = File(...)):
         )
     return JSONResponse(
         status_code=resp.status_code,
-        content=resp.json(),
+        content=response_content(resp),
     )
 
 
-@app.post("/tsv_2_json")
-async def tsv_2_json(
-    request: Request,
-    files: List[UploadFile] = File(...),
-):
-    """Create a json submission object using 2 TSV files from a germline submission (Variant.tsv and CaseData.tsv).
-    Validate the submission objects against the official schema:
-    https://www.ncbi.nlm.nih.gov/clinvar/docs/api_http/
-    """
-    # Extract lines from Variants.tsv and Casedata.tsv files present in POST request
-    casedata_lines = None
-    variants_lines = None
+def _match_submission_files(
+    files: List[UploadFile],
+) -> Tuple[Optional[UploadFile], Optional[UploadFile]]:
+    """Find the Variant and the CaseData file among the uploaded files, using their names
 
+    Returns:
+        variants_file, casedata_file: UploadFile objects or None if the file is missing
+    """
+    variants_file = None
+    casedata_file = None
     for file in files:
-        file_lines = await tsv_lines(file)
-        if not file_lines:
-            return JSONResponse(
-                status_code=400,
-                content={"message": f"Malformed file {file.filename}"},
-            )
-
         if re.search("CaseData", file.filename, re.IGNORECASE):
-            casedata_lines = file_lines
+            casedata_file = file
         elif re.search("Variant", file.filename, re.IGNORECASE):
-            variants_lines = file_lines
+            variants_file = file
+    return variants_file, casedata_file
+
+
+def _malformed_file_response(upload_file: Union[UploadFile, FileOnDisk]) -> JSONResponse:
+    """Create the response returned when an uploaded file doesn't contain any line that could be parsed"""
+    return JSONResponse(
+        status_code=400, content={"message": malformed_file_message(upload_file.filename)}
+    )
+
+
+def _invalid_values_response(
+    invalid_values: List[str], validation_mode: ValidationMode, max_errors: int
+) -> JSONResponse:
+    """Create the response returned when controlled fields of the uploaded files contain invalid values.
+    Errors are capped as the validation errors, according to the validation mode.
+    """
+    return JSONResponse(
+        status_code=400,
+        content={"message": invalid_values_message(invalid_values, validation_mode, max_errors)},
+    )
+
+
+async def _upload_on_disk(upload_file: UploadFile) -> FileOnDisk:
+    """Copy an uploaded file to disk in a thread, so that the processes running CPU-bound stages read it from its path"""
+    return await asyncio.to_thread(copy_to_disk, upload_file.file, upload_file.filename)
+
+
+async def _files_to_submission(
+    query_params: Dict[str, str],
+    files: List[UploadFile],
+    lines_parser: Callable,
+    file_type: str,
+    stream: bool = False,
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    engine: ConversionEngine = DEFAULT_ENGINE,
+) -> Response:
+    """Convert the Variant and CaseData files of a germline submission into a validated json submission object.
+    Parsing, creation and validation of the submission are run in the executor of the CPU-bound stages.
+
+    Args:
+        query_params(dict): query parameters of the request, containing the optional submission parameters
+        files(list): the uploaded files
+        lines_parser(function): tsv_lines or csv_lines, yielding the lines of an uploaded file
+        file_type(str): "tsv" or "csv"
+        stream(bool): if True, the submission is sent in a streaming response, encoded one item at a time
+        validation_mode(ValidationMode): how validation errors are collected
+        max_errors(int): maximum number of errors returned in "capped" validation mode
+        engine(ConversionEngine): "rows" to convert the Variant lines one at a time while reading the file,
+            or "columns" to read the whole Variant file and convert its columns
+    """
+    variants_file, casedata_file = _match_submission_files(files)
+    if not casedata_file or not variants_file:
+        return JSONResponse(status_code=400, content={"message": missing_files_message(file_type)})
+    disk_files = []
+    if in_processes():
+        disk_files = [await _upload_on_disk(variants_file), await _upload_on_disk(casedata_file)]
+        variants_file, casedata_file = disk_files
+    try:
+        return await _convert_submission_files(
+            query_params,
+            variants_file,
+            casedata_file,
+            lines_parser,
+            file_type,
+            stream,
+            validation_mode,
+            max_errors,
+            engine,
+        )
+    finally:
+        for disk_file in disk_files:
+            disk_file.remove()
+
+
+async def _convert_submission_files(
+    query_params: Dict[str, str],
+    variants_file: Union[UploadFile, FileOnDisk],
+    casedata_file: Union[UploadFile, FileOnDisk],
+    lines_parser: Callable,
+    file_type: str,
+    stream: bool,
+    validation_mode: ValidationMode,
+    max_errors: int,
+    engine: ConversionEngine,
+) -> Response:
+    """Convert a Variant and a CaseData file into a validated json submission object, see _files_to_submission"""
+    # Return the submission created previously from the same files and parameters, if any
+    cache_key = None
+    if conversion_cache.enabled:
+        cache_key = await asyncio.to_thread(
+            conversion_cache_key, file_type, variants_file.file, casedata_file.file, query_params
+        )
+        cached_submission = conversion_cache.get(cache_key)
+        if cached_submission is not None:
+            return Response(content=cached_submission, media_type="application/json")
 
-    # Make sure both files were provided in request
-    if not casedata_lines or not variants_lines:
+    try:
+        report_progress(stage="convert")
+        if engine == ConversionEngine.COLUMNS:
+            # The whole Variant file is read into columns while the CaseData file is parsed
+            (casedata_lines, invalid_values), (
+                n_rows,
+                variants_columns,
+                variant_invalid_values,
+            ) = await asyncio.gather(
+                run_cpu_bound(parse_casedata, casedata_file, lines_parser),
+                run_cpu_bound(parse_variants_columns, variants_file, DELIMITERS[file_type]),
+            )
+            if not casedata_lines:
+                return _malformed_file_response(casedata_file)
+            invalid_values = variant_invalid_values + invalid_values
+            if invalid_values:
+                return _invalid_values_response(invalid_values, validation_mode, max_errors)
+            submission_dict = await run_cpu_bound(
+                file_columns_to_submission, n_rows, variants_columns, casedata_lines
+            )
+        else:
+            # Variant lines are streamed from the uploaded file and converted to submission items one by one,
+            # CaseData lines are collected first since they are needed to create the observedIn field of each item
+            casedata_lines, invalid_values = await run_cpu_bound(
+                parse_casedata, casedata_file, lines_parser
+            )
+            if not casedata_lines:
+                return _malformed_file_response(casedata_file)
+            submission_dict, variant_invalid_values = await run_cpu_bound(
+                convert_variants_rows, variants_file, lines_parser, casedata_lines
+            )
+            invalid_values = variant_invalid_values + invalid_values
+        report_progress(items_built=len(submission_dict["clinvarSubmission"]))
+        if not submission_dict["clinvarSubmission"]:
+            return _malformed_file_response(variants_file)
+        if invalid_values:
+            return _invalid_values_response(invalid_values, validation_mode, max_errors)
+        valid_results, submission = await run_cpu_bound(
+            validate_and_encode,
+            submission_dict,
+            query_params,
+            validation_mode,
+            max_errors,
+            validation_processes(VALIDATION_PROCESSES),
+            not stream,
+        )
+    except Exception as ex:
         return JSONResponse(
             status_code=400,
-            content={
-                "message": "Both 'Variant' and 'CaseData' tsv files are required and should not be empty"
-            },
+            content={"message": str(ex)},
         )
 
-    # Convert lines extracted from csv files to a submission object (a dictionary)
-    submission_dict = file_fields_to_submission(variants_lines, casedata_lines)
-    build_submission(submission_dict, request)
-
-    # Validate submission object using official schema
-    valid_results = validate_submission(submission_dict=submission_dict)
     if valid_results[0]:
-        return JSONResponse(
-            status_code=200,
-            content=submission_dict,
-        )
+        if stream:
+            return StreamingResponse(
+                iter_timed(iter_submission_json(submission), "serialize"),
+                media_type="application/json",
+            )
+        if cache_key:
+            conversion_cache.set(cache_key, submission, size=len(submission))
+        return Response(content=submission, media_type="application/json")
     return JSONResponse(
         status_code=400,
-        content={"message": f"Created json file contains validation errors: {valid_results[1]}"},
+        content={"message": validation_errors_message(valid_results[1])},
+    )
+
+
+@app.post("/tsv_2_json")
+async def tsv_2_json(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    stream: bool = False,
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
+):
+    """Create a json submission object using 2 TSV files from a germline submission (Variant.tsv and CaseData.tsv).
+    Validate the submission objects against the official schema:
+    https://www.ncbi.nlm.nih.gov/clinvar/docs/api_http/
+    Use stream=true to receive the submission in a streaming response, encoded one item at a time.
+    Validation errors are collected according to validation_mode: "all", "first", "capped" (at most max_errors errors) or "aggregate" (grouped by path and message).
+    Use engine=columns to convert large Variant files column by column instead of line by line.
+    """
+    return await _files_to_submission(
+        dict(request.query_params),
+        files,
+        tsv_lines,
+        "tsv",
+        stream,
+        validation_mode,
+        max_errors,
+        engine,
     )
 
 
@@ -167,67 +537,322 @@ async def tsv_2_json(
 async def csv_2_json(
     request: Request,
     files: List[UploadFile] = File(...),
+    stream: bool = False,
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
 ):
     """Create a json submission object using 2 CSV files from a germline submission (Variant.csv and CaseData.csv).
     Validate the submission objects against the official schema:
     https://www.ncbi.nlm.nih.gov/clinvar/docs/api_http/
+    Use stream=true to receive the submission in a streaming response, encoded one item at a time.
+    Validation errors are collected according to validation_mode: "all", "first", "capped" (at most max_errors errors) or "aggregate" (grouped by path and message).
+    Use engine=columns to convert large Variant files column by column instead of line by line.
     """
+    return await _files_to_submission(
+        dict(request.query_params),
+        files,
+        csv_lines,
+        "csv",
+        stream,
+        validation_mode,
+        max_errors,
+        engine,
+    )
 
-    # Extract lines from Variants.csv and Casedata.csv files present in POST request
-    casedata_lines = None
-    variants_lines = None
 
-    for file in files:
-        file_lines = await csv_lines(file)
-        if not file_lines:
-            return JSONResponse(
+async def _convert_file_pair(
+    prefix: str,
+    pair: Dict[str, List[UploadFile]],
+    lines_parser: Callable,
+    file_type: str,
+    query_params: dict,
+    validation_mode: ValidationMode,
+    max_errors: int,
+    engine: ConversionEngine,
+) -> Tuple[dict, Optional[bytes]]:
+    """Convert a pair of Variant and CaseData files in the pool of processes
+
+    Returns:
+        result, submission(tuple): the status of the conversion and the json submission, if the files were converted
+    """
+    result = {
+        "pair": prefix,
+        "files": sorted(file.filename for files in pair.values() for file in files),
+    }
+    for kind, label in [("variants", "Variant"), ("casedata", "CaseData")]:
+        if len(pair[kind]) != 1:
+            result.update(
                 status_code=400,
-                content={"message": f"Malformed file {file.filename}"},
+                message=f"Expected one {label} {file_type} file, found {len(pair[kind])}",
             )
+            return result, None
+    try:
+        submission, _ = await run_in_processes(
+            convert_files,
+            pair["variants"][0],
+            pair["casedata"][0],
+            lines_parser,
+            file_type,
+            query_params,
+            validation_mode,
+            max_errors,
+            engine,
+            1,  # Pairs are already converted in parallel
+        )
+    except ConversionError as ex:
+        result.update(status_code=400, message=str(ex))
+        return result, None
+    except Exception as ex:
+        LOG.error(f"Conversion of files {result['files']} failed: {ex}")
+        result.update(status_code=500, message=f"Conversion failed: {type(ex).__name__}")
+        return result, None
+    result["status_code"] = 200
+    return result, submission
 
-        if re.search("CaseData", file.filename, re.IGNORECASE):
-            casedata_lines = file_lines
-        elif re.search("Variant", file.filename, re.IGNORECASE):
-            variants_lines = file_lines
 
-    # Make sure both files were provided in request
-    if not casedata_lines or not variants_lines:
+async def _batch_files_to_submissions(
+    request: Request,
+    files: List[UploadFile],
+    lines_parser: Callable,
+    file_type: str,
+    validation_mode: ValidationMode,
+    max_errors: int,
+    engine: ConversionEngine,
+    output: BatchOutput,
+) -> Response:
+    """Convert the pairs of Variant and CaseData files contained in uploaded archives or files in parallel
+
+    Returns:
+        A streaming response with a line of NDJSON for each pair, sent as soon as the pair is converted,
+        or a zip archive containing the submissions and the results of all pairs
+    """
+    try:
+        extracted_files = await asyncio.to_thread(extract_files, files)
+    except ArchiveError as ex:
+        return JSONResponse(status_code=400, content={"message": str(ex)})
+    pairs = match_file_pairs(extracted_files)
+    if not pairs:
         return JSONResponse(
             status_code=400,
-            content={
-                "message": "Both 'Variant' and 'CaseData' csv files are required and should not be empty"
-            },
+            content={"message": f"No 'Variant' or 'CaseData' {file_type} files were uploaded"},
         )
 
-    # Convert lines extracted from csv files to a submission object (a dictionary)
-    try:
-        submission_dict = file_fields_to_submission(variants_lines, casedata_lines)
-        build_submission(submission_dict, request)
-    except Exception as ex:
-        return JSONResponse(
-            status_code=400,
-            content={"message": str(ex)},
+    query_params = dict(request.query_params)
+    tasks = [
+        asyncio.ensure_future(
+            _convert_file_pair(
+                prefix,
+                pair,
+                lines_parser,
+                file_type,
+                query_params,
+                validation_mode,
+                max_errors,
+                engine,
+            )
+        )
+        for prefix, pair in pairs.items()
+    ]
+    if output == BatchOutput.ZIP:
+        results = await asyncio.gather(*tasks)
+        return Response(
+            content=await run_cpu_bound(results_archive, results),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="submissions.zip"'},
         )
 
-    # Validate submission object using official schema
-    valid_results = validate_submission(submission_dict=submission_dict)
-    if valid_results[0]:
-        return JSONResponse(
-            status_code=200,
-            content=submission_dict,
+    async def iter_result_lines():
+        for next_result in asyncio.as_completed(tasks):
+            yield result_line(*await next_result)
+
+    return StreamingResponse(iter_result_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/tsv_2_json-batch")
+async def tsv_2_json_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
+    output: BatchOutput = BatchOutput.NDJSON,
+) -> Response:
+    """Create json submission objects from zip or tar archives (or several files) containing pairs of Variant and CaseData TSV files.
+    Files are paired by the part of their name before "Variant" or "CaseData" (for example sample1_Variant.tsv and sample1_CaseData.tsv) and pairs are converted in parallel.
+    Results are returned as NDJSON lines with the status of each pair, or as a zip archive with output=zip.
+    """
+    return await _batch_files_to_submissions(
+        request, files, tsv_lines, "tsv", validation_mode, max_errors, engine, output
+    )
+
+
+@app.post("/csv_2_json-batch")
+async def csv_2_json_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
+    output: BatchOutput = BatchOutput.NDJSON,
+) -> Response:
+    """Create json submission objects from zip or tar archives (or several files) containing pairs of Variant and CaseData CSV files.
+    Files are paired by the part of their name before "Variant" or "CaseData" (for example sample1_Variant.csv and sample1_CaseData.csv) and pairs are converted in parallel.
+    Results are returned as NDJSON lines with the status of each pair, or as a zip archive with output=zip.
+    """
+    return await _batch_files_to_submissions(
+        request, files, csv_lines, "csv", validation_mode, max_errors, engine, output
+    )
+
+
+def _copy_to_spooled_file(file_obj) -> tempfile.SpooledTemporaryFile:
+    spooled_file = tempfile.SpooledTemporaryFile(max_size=JOB_SPOOL_MAX_SIZE)
+    file_obj.seek(0)
+    shutil.copyfileobj(file_obj, spooled_file)
+    spooled_file.seek(0)
+    return spooled_file
+
+
+async def _spool_upload(upload_file: UploadFile) -> UploadFile:
+    """Copy an uploaded file, which is closed once the request is served, so that it can be read by a conversion job.
+    Large files are written to disk, the copy is then made in a thread to not block the event loop."""
+    spooled_file = await asyncio.to_thread(_copy_to_spooled_file, upload_file.file)
+    return UploadFile(spooled_file, filename=upload_file.filename)
+
+
+async def _submit_conversion_job(
+    query_params: Dict[str, str],
+    files: List[UploadFile],
+    lines_parser: Callable,
+    file_type: str,
+    validation_mode: ValidationMode,
+    max_errors: int,
+    engine: ConversionEngine,
+) -> JSONResponse:
+    """Queue the conversion of the Variant and CaseData files of a germline submission, see _files_to_submission
+
+    Returns:
+        A response with status code 202 and the status of the job, or 429 if too many jobs are queued
+    """
+    variants_file, casedata_file = _match_submission_files(files)
+    if not casedata_file or not variants_file:
+        return JSONResponse(status_code=400, content={"message": missing_files_message(file_type)})
+    job_files = [await _spool_upload(variants_file), await _spool_upload(casedata_file)]
+
+    def close_files():
+        for job_file in job_files:
+            job_file.file.close()
+
+    try:
+        job = job_manager.submit(
+            f"{file_type}_2_json",
+            lambda: asyncio.run(
+                _files_to_submission(
+                    query_params,
+                    job_files,
+                    lines_parser,
+                    file_type,
+                    False,
+                    validation_mode,
+                    max_errors,
+                    engine,
+                )
+            ),
+            cleanup=close_files,
         )
+    except QueueFullError as ex:
+        close_files()
+        return JSONResponse(status_code=429, content={"message": str(ex)})
+
     return JSONResponse(
-        status_code=400,
-        content={"message": f"Created json file contains validation errors: {valid_results[1]}"},
+        status_code=202,
+        content={
+            **job.to_dict(),
+            "status_url": f"/jobs/{job.id}",
+            "result_url": f"/jobs/{job.id}/result",
+        },
+    )
+
+
+@app.post("/jobs/tsv_2_json")
+async def tsv_2_json_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
+) -> JSONResponse:
+    """Start the conversion of 2 TSV files from a germline submission (Variant.tsv and CaseData.tsv) in the background, as /tsv_2_json.
+    Returns immediately the ID of the job, to be used to retrieve its status and result.
+    """
+    return await _submit_conversion_job(
+        dict(request.query_params), files, tsv_lines, "tsv", validation_mode, max_errors, engine
+    )
+
+
+@app.post("/jobs/csv_2_json")
+async def csv_2_json_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+    engine: ConversionEngine = DEFAULT_ENGINE,
+) -> JSONResponse:
+    """Start the conversion of 2 CSV files from a germline submission (Variant.csv and CaseData.csv) in the background, as /csv_2_json.
+    Returns immediately the ID of the job, to be used to retrieve its status and result.
+    """
+    return await _submit_conversion_job(
+        dict(request.query_params), files, csv_lines, "csv", validation_mode, max_errors, engine
     )
 
 
+def _job_not_found_response(job_id: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"message": f"Job {job_id} not found or expired"})
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = Query(0, ge=0, le=JOB_MAX_WAIT)) -> JSONResponse:
+    """Returns the status and progress of a conversion job.
+    With wait > 0, the response is sent as soon as the status of the job changes, or after wait seconds.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found_response(job_id)
+    if wait and not job.done:
+        await job_manager.wait(job, wait)
+    return JSONResponse(status_code=200, content=job.to_dict())
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str) -> Response:
+    """Returns the result of a finished conversion job, with the response that the conversion endpoint would have returned"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found_response(job_id)
+    if not job.done:
+        return JSONResponse(
+            status_code=409, content={"message": f"Job {job_id} is {job.status.value}"}
+        )
+    return job.response
+
+
 @app.post("/validate")
-async def validate(json_file: UploadFile = File(...)) -> JSONResponse:
-    """Validates the a json submission (germline or somatic) against the official schema."""
+async def validate(
+    json_file: UploadFile = File(...),
+    validation_mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = Query(MAX_ERRORS, gt=0),
+) -> JSONResponse:
+    """Validates the a json submission (germline or somatic) against the official schema.
+    Validation errors are collected according to validation_mode: "all", "first", "capped" (at most max_errors errors) or "aggregate" (grouped by path and message).
+    """
     try:
-        submission_dict = json.load(json_file.file)
-        valid_results = validate_submission(submission_dict=submission_dict)
+        valid_results = await run_cpu_bound(
+            load_and_validate,
+            await json_file.read(),
+            validation_mode,
+            max_errors,
+            validation_processes(VALIDATION_PROCESSES),
+        )
         if valid_results[0]:
             return JSONResponse(
                 status_code=200,
@@ -242,23 +867,54 @@ async def validate(json_file: UploadFile = File(...)) -> JSONResponse:
 
 
 @app.post("/status")
-async def status(api_key: str = Form(), submission_id: str = Form()) -> JSONResponse:
+async def status(
+    api_key: str = Form(),
+    submission_id: str = Form(),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+) -> JSONResponse:
     """Returns the status (validation) of a submission."""
+    status_code, actions = await _cached_actions(
+        clinvar_client, SUBMISSION_URL, api_key, submission_id
+    )
+    return JSONResponse(status_code=status_code, content=actions)
 
-    # Create a submission header
+
+@app.post("/status-batch")
+async def status_batch(
+    api_key: str = Form(),
+    submission_ids: List[str] = Form(),
+    max_concurrency: int = Form(MAX_CONCURRENT_REQUESTS, gt=0, le=MAX_CONCURRENT_REQUESTS),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+) -> JSONResponse:
+    """Returns the status of several submissions, retrieved in parallel. Results and eventual errors are keyed by submission ID."""
     header = build_header(api_key)
+    results = await fetch_submissions_actions(
+        clinvar_client, SUBMISSION_URL, submission_ids, header, max_concurrency
+    )
+    return JSONResponse(status_code=200, content=results)
 
-    actions_url = f"{SUBMISSION_URL}/{submission_id}/actions/"
-    actions_resp = requests.get(actions_url, headers=header)
 
-    return JSONResponse(
-        status_code=actions_resp.status_code,
-        content=actions_resp.json(),
+@app.post("/apitest-status-batch")
+async def apitest_status_batch(
+    api_key: str = Form(),
+    submission_ids: List[str] = Form(),
+    max_concurrency: int = Form(MAX_CONCURRENT_REQUESTS, gt=0, le=MAX_CONCURRENT_REQUESTS),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+) -> JSONResponse:
+    """Returns the status (validation) of several test submissions, retrieved in parallel. Results and eventual errors are keyed by submission ID."""
+    header = build_header(api_key)
+    results = await fetch_submissions_actions(
+        clinvar_client, VALIDATE_SUBMISSION_URL, submission_ids, header, max_concurrency
     )
+    return JSONResponse(status_code=200, content=results)
 
 
 @app.post("/delete")
-async def delete(api_key: str = Form(), clinvar_accession: str = Form()):
+async def delete(
+    api_key: str = Form(),
+    clinvar_accession: str = Form(),
+    clinvar_client: httpx.AsyncClient = Depends(get_clinvar_client),
+):
     """A proxy to the submission ClinVar API, to delete a submission with a given ClinVar accession."""
     # Create a submission header
     header = build_header(api_key)
@@ -266,19 +922,13 @@ async def delete(api_key: str = Form(), clinvar_accession: str = Form()):
     # Create a submission deletion object
     delete_obj = {"clinvarDeletion": {"accessionSet": [{"accession": clinvar_accession}]}}
 
-    data = {
-        "actions": [
-            {
-                "type": "AddData",
-                "targetDb": "clinvar",
-                "data": {"content": delete_obj},
-            }
-        ]
-    }
+    data = build_add_data_payload(delete_obj)
     # And send a POST request to the API
-    resp = requests.post(SUBMISSION_URL, data=json.dumps(data), headers=header)
+    resp = await _post_to_clinvar(clinvar_client, SUBMISSION_URL, data, header)
+    if isinstance(resp, JSONResponse):
+        return resp
 
     return JSONResponse(
         status_code=resp.status_code,
-        content=resp.json(),
+        content=response_content(resp),
     )
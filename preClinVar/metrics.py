@@ -0,0 +1,342 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from starlette.datastructures import MutableHeaders
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Durations of the stages run while serving the current request, sent in its Server-Timing header
+_request_timings: ContextVar[Optional[List["StageRecord"]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Format the labels of a metric sample. Example: '{stage="validate",le="0.5"}'"""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """A thread-safe counter for each combination of label values, exported in Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """Increase the counter of the given label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(dict(zip(self.labelnames, key)))
+                lines.append(f"{self.name}{labels} {value}")
+        return lines
+
+
+class Histogram:
+    """A thread-safe histogram for each combination of label values, exported in Prometheus text format"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts, sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Add an observation to the histogram of the given label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for n, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][n] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    bucket_labels = _format_labels({**labels, "le": repr(float(bound))})
+                    lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+                lines.append(
+                    f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}"
+                )
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class CacheMetrics:
+    """Usage statistics of the caches, read when the metrics are exported"""
+
+    # Statistics which only increase, exported as counters. Others are exported as gauges
+    COUNTER_STATS = ("hits", "misses", "evictions", "coalesced")
+
+    def __init__(self):
+        self._caches: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, cache_name: str, stats: Callable[[], dict]):
+        """Export the statistics of a cache
+
+        Args:
+            cache_name(str): value of the "cache" label. Example: "status"
+            stats(function): returning the statistics of the cache. Example: {"entries": 2, "hits": 5, "hit_ratio": 0.71, ..}
+        """
+        self._caches[cache_name] = stats
+
+    def render(self) -> List[str]:
+        samples: Dict[str, List[str]] = {}
+        for cache_name, stats in sorted(self._caches.items()):
+            for stat, value in stats().items():
+                samples.setdefault(stat, []).append(
+                    f"{_format_labels({'cache': cache_name})} {value}"
+                )
+        lines = []
+        for stat, stat_samples in samples.items():
+            if stat in self.COUNTER_STATS:
+                name, metric_type = f"preclinvar_cache_{stat}_total", "counter"
+            else:
+                name, metric_type = f"preclinvar_cache_{stat}", "gauge"
+            lines.append(f"# HELP {name} Cache statistic '{stat}', by cache")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{name}{sample}" for sample in stat_samples)
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "preclinvar_stage_duration_seconds",
+    "Duration of the stages of the conversion and validation of submissions",
+    ["stage"],
+)
+STAGE_ROWS = Counter(
+    "preclinvar_stage_rows_total",
+    "Number of rows (file lines or submission items) processed by each stage",
+    ["stage"],
+)
+UPSTREAM_DURATION = Histogram(
+    "preclinvar_clinvar_api_request_duration_seconds",
+    "Time from sending a request to the ClinVar API to receiving the response headers",
+    ["method", "endpoint", "status_code"],
+)
+UPSTREAM_RESPONSES = Counter(
+    "preclinvar_clinvar_api_responses_total",
+    "Number of responses received from the ClinVar API, by status code. Status code is 'error' for failed requests",
+    ["method", "endpoint", "status_code"],
+)
+UPSTREAM_RETRIES = Counter(
+    "preclinvar_clinvar_api_retries_total",
+    "Number of requests to the ClinVar API sent again, by status code of the failed attempt. Status code is 'error' for failed requests",
+    ["method", "endpoint", "status_code"],
+)
+UPSTREAM_REJECTED = Counter(
+    "preclinvar_clinvar_api_rejected_total",
+    "Number of requests to the ClinVar API not sent, because the rate limit of the API key was reached ('rate_limited') or the circuit breaker was open ('circuit_open')",
+    ["reason"],
+)
+CACHE_METRICS = CacheMetrics()
+REGISTRY = [
+    STAGE_DURATION,
+    STAGE_ROWS,
+    UPSTREAM_DURATION,
+    UPSTREAM_RESPONSES,
+    UPSTREAM_RETRIES,
+    UPSTREAM_REJECTED,
+    CACHE_METRICS,
+]
+
+
+class StageRecord:
+    """Duration and number of rows of a stage run while serving a request"""
+
+    def __init__(self, stage: str, duration: float = 0.0, rows: Optional[int] = None):
+        self.stage = stage
+        self.duration = duration
+        self.rows = rows
+
+
+def record_stage(stage: str, duration: float, rows: Optional[int] = None):
+    """Add the duration and number of rows of a stage to the metrics and to the timings of the current request
+
+    Args:
+        stage(str): name of the stage. Example: "validate"
+        duration(float): duration of the stage, in seconds
+        rows(int): number of file lines or submission items processed by the stage
+    """
+    STAGE_DURATION.observe(duration, stage=stage)
+    if rows is not None:
+        STAGE_ROWS.inc(rows, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append(StageRecord(stage, duration, rows))
+
+
+@contextmanager
+def timed_stage(stage: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+    """Measure the duration of the code run in the context. Rows can be set on the returned record before the context exits
+
+    Example:
+        with timed_stage("build_submission", rows=len(items)):
+            ..
+    """
+    record = StageRecord(stage, rows=rows)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record_stage(stage, time.perf_counter() - start, record.rows)
+
+
+def iter_timed(iterable: Iterable, stage: str) -> Iterator:
+    """Yield the elements of an iterable, measuring only the time spent producing them, for instance parsing file lines.
+    The stage is recorded when the iterable is exhausted or the iteration stops.
+    """
+    iterator = iter(iterable)
+    duration = 0.0
+    rows = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                element = next(iterator)
+            except StopIteration:
+                duration += time.perf_counter() - start
+                return
+            duration += time.perf_counter() - start
+            rows += 1
+            yield element
+    finally:
+        record_stage(stage, duration, rows)
+
+
+def server_timing_header(timings: List[StageRecord]) -> str:
+    """Format stage timings as the value of a Server-Timing header
+
+    Returns:
+        header(str): Example: 'parse_casedata;dur=1.52;desc="120 rows", validate;dur=8.03;desc="100 rows"'
+    """
+    metrics = []
+    for record in timings:
+        metric = f"{record.stage};dur={record.duration * 1000:.2f}"
+        if record.rows is not None:
+            metric += f';desc="{record.rows} rows"'
+        metrics.append(metric)
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware collecting the stages run while serving a request and sending their durations in a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _request_timings.set(timings)
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start" and timings:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing_header(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _request_timings.reset(token)
+
+
+def render_metrics() -> str:
+    """Return all the metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def upstream_endpoint(url: httpx.URL) -> str:
+    """Return the path of a ClinVar API URL with submission IDs replaced by a placeholder, to be used as a metric label.
+    Whatever follows "/submissions/" is replaced, since submission IDs are provided by the users and each label value
+    creates series that are kept for the lifetime of the process.
+
+    Example: "/api/v1/submissions/SUB99999999/actions/" -> "/api/v1/submissions/{submission_id}/actions/"
+    """
+    return re.sub(r"(/submissions/)(?:.+?(?=/actions/?$)|.+)", r"\1{submission_id}", url.path)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """HTTP transport recording the latency and status code of the requests sent to the ClinVar API"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        labels = {"method": request.method, "endpoint": upstream_endpoint(request.url)}
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            labels["status_code"] = "error"
+            raise
+        else:
+            labels["status_code"] = str(response.status_code)
+            return response
+        finally:
+            duration = time.perf_counter() - start
+            UPSTREAM_DURATION.observe(duration, **labels)
+            UPSTREAM_RESPONSES.inc(**labels)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append(StageRecord("clinvar_api", duration))
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import Callable, Optional
+
+
+class ExecutorKind(str, Enum):
+    """Where the CPU-bound stages of the requests (parsing, creation and validation of submissions) are run"""
+
+    THREAD = "thread"
+    PROCESS = "process"
+    INLINE = "inline"
+
+
+###### CPU-bound stages settings, can be overridden by environment variables ######
+# "thread", "process" or "inline" (in the event loop, blocking it)
+CPU_EXECUTOR = ExecutorKind(os.getenv("CPU_EXECUTOR", ExecutorKind.THREAD.value))
+# Number of threads or processes running CPU-bound stages
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_cpu_executor: Optional[Executor] = None
+_process_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_cpu_executor() -> Executor:
+    """Return the pool of threads or processes running CPU-bound stages, creating it the first time it is used"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        if CPU_EXECUTOR == ExecutorKind.PROCESS:
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=CPU_EXECUTOR_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _cpu_executor = ThreadPoolExecutor(
+                max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-bound"
+            )
+    return _cpu_executor
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """Return a pool of CPU_EXECUTOR_WORKERS processes, which is the executor of the CPU-bound stages if it is a pool of processes"""
+    global _process_executor
+    if in_processes():
+        return get_cpu_executor()
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(
+            max_workers=CPU_EXECUTOR_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_executor
+
+
+def shutdown_cpu_executor():
+    """Stop the threads or processes running CPU-bound stages, if they were started"""
+    global _cpu_executor, _process_executor
+    for executor in [_cpu_executor, _process_executor]:
+        if executor is not None:
+            executor.shutdown()
+    _cpu_executor = None
+    _process_executor = None
+
+
+async def run_cpu_bound(func: Callable, *args, **kwargs):
+    """Run a CPU-bound function without blocking the event loop, in the executor defined by CPU_EXECUTOR
+
+    In a thread, the function runs in a copy of the current context, so that the stages it records are reported
+    in the Server-Timing header of the request. In a process, function and arguments must be picklable,
+    and the stages are only recorded in the metrics of the process running them.
+    """
+    if CPU_EXECUTOR == ExecutorKind.INLINE:
+        return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    if CPU_EXECUTOR == ExecutorKind.PROCESS:
+        return await loop.run_in_executor(get_cpu_executor(), call)
+    return await loop.run_in_executor(get_cpu_executor(), contextvars.copy_context().run, call)
+
+
+async def run_in_processes(func: Callable, *args, **kwargs):
+    """Run a CPU-bound function in a pool of processes, for instance to convert several submissions on all cores.
+    Function and arguments must be picklable. The function runs in the event loop if CPU_EXECUTOR is "inline".
+    """
+    if CPU_EXECUTOR == ExecutorKind.INLINE:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_executor(), partial(func, *args, **kwargs))
+
+
+class FileOnDisk:
+    """An uploaded file copied to a temporary file, to be read by the processes running CPU-bound stages.
+    Only its path and name are pickled, each process opening the file and reading it in chunks like the file of an UploadFile.
+    """
+
+    def __init__(self, path: str, filename: str):
+        self.path = path
+        self.filename = filename
+        self._file = None
+
+    @property
+    def file(self):
+        """The binary file, opened the first time it is read in the current process"""
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def __getstate__(self):
+        return {"path": self.path, "filename": self.filename, "_file": None}
+
+    def remove(self):
+        """Close the file and remove it from disk"""
+        if self._file is not None:
+            self._file.close()
+        os.remove(self.path)
+
+
+def copy_to_disk(file_obj, filename: str) -> FileOnDisk:
+    """Copy a binary file to a temporary file, in chunks, so that it can be sent to a pool of processes by path
+
+    Args:
+        file_obj(file-like object): a binary file open for reading, for instance the file of an UploadFile
+        filename(str): name of the uploaded file
+    """
+    file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="preclinvar-", delete=False) as disk_file:
+        shutil.copyfileobj(file_obj, disk_file)
+    return FileOnDisk(disk_file.name, filename)
+
+
+def in_processes() -> bool:
+    """Return True if CPU-bound stages are run by a pool of processes, requiring picklable arguments"""
+    return CPU_EXECUTOR == ExecutorKind.PROCESS
+
+
+def validation_processes(processes: int) -> int:
+    """Return the number of processes a stage may use to validate a submission.
+    Stages run by a pool of processes validate in their own process, the pool already spreading the load.
+    """
+    return 1 if in_processes() else processes
@@ -1,10 +1,15 @@
-from importlib_resources import files
+import os
 
-BASE_PATH = "preClinVar.resources"
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
 ###### submission schema json file ######
 
 subm_schema = "submission_schema.json"
 
-###### Path to submission schema file ######
-subm_schema_path = str(files(BASE_PATH).joinpath(subm_schema))
+###### Prebuilt submission schema, created at build time by `python -m preClinVar.schema_artifact` ######
+
+subm_schema_artifact = "submission_schema.pickle"
+
+###### Path to submission schema files ######
+subm_schema_path = os.path.join(BASE_PATH, subm_schema)
+subm_schema_artifact_path = os.path.join(BASE_PATH, subm_schema_artifact)
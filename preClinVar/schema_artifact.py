@@ -0,0 +1,160 @@
+"""Prebuilt submission schema, created once at build time so that workers don't check, resolve and compile the schema when they start.
+
+The artifact contains the schema already checked against the Draft 7 metaschema, the schema with its references resolved
+and, when fastjsonschema is installed, the bytecode of the validation function it generates from the schema.
+It is only used if it was built from the current schema file, by the same Python and fastjsonschema versions.
+
+Usage:
+    python -m preClinVar.schema_artifact [--output preClinVar/resources/submission_schema.pickle] [--require-compiled]
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import pickle
+import sys
+from typing import Callable, Optional
+
+from preClinVar.resources import subm_schema_artifact_path, subm_schema_path
+
+LOG = logging.getLogger("uvicorn.access")
+
+ARTIFACT_FORMAT = 1
+COMPILED_FILENAME = "<submission schema>"
+
+###### Prebuilt schema settings, can be overridden by environment variables ######
+# Path to the prebuilt schema. An empty value disables it
+SCHEMA_ARTIFACT_PATH = os.getenv("SCHEMA_ARTIFACT_PATH", subm_schema_artifact_path)
+
+
+def schema_checksum(schema_bytes: bytes) -> str:
+    return hashlib.sha256(schema_bytes).hexdigest()
+
+
+def build_schema_artifact(
+    schema_path: str = subm_schema_path, artifact_path: str = subm_schema_artifact_path
+) -> dict:
+    """Check and resolve the submission schema, compile it if fastjsonschema is installed, and save the result
+
+    Args:
+        schema_path(str): path to the submission schema json file
+        artifact_path(str): path of the created artifact
+
+    Returns:
+        artifact(dict): Example: {"format": 1, "schema_sha256": "..", "schema": {..}, "resolved_schema": {..}, "compiled": {..} or None}
+    """
+    from jsonschema import Draft7Validator
+
+    from preClinVar.validate import _resolve_refs
+
+    with open(schema_path, "rb") as schema_file:
+        schema_bytes = schema_file.read()
+    schema = json.loads(schema_bytes)
+    Draft7Validator.check_schema(schema)
+
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "schema_sha256": schema_checksum(schema_bytes),
+        "schema": schema,
+        "resolved_schema": _resolve_refs(schema, schema.get("definitions", {}), {}),
+        "compiled": None,
+    }
+    try:
+        import fastjsonschema
+    except ImportError:
+        fastjsonschema = None
+    if fastjsonschema is not None:
+        code = fastjsonschema.compile_to_code(schema)
+        artifact["compiled"] = {
+            "cache_tag": sys.implementation.cache_tag,
+            "fastjsonschema_version": fastjsonschema.VERSION,
+            "bytecode": marshal.dumps(compile(code, COMPILED_FILENAME, "exec")),
+        }
+
+    # Written next to its final path and renamed, so that starting workers never read a partial file
+    temp_path = f"{artifact_path}.tmp"
+    with open(temp_path, "wb") as artifact_file:
+        pickle.dump(artifact, artifact_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, artifact_path)
+    return artifact
+
+
+def read_schema_artifact(
+    schema_path: str = subm_schema_path, artifact_path: Optional[str] = None
+) -> Optional[dict]:
+    """Read the prebuilt schema, if it exists and was built from the current schema file
+
+    Returns:
+        artifact(dict) or None
+    """
+    artifact_path = SCHEMA_ARTIFACT_PATH if artifact_path is None else artifact_path
+    if not artifact_path or not os.path.exists(artifact_path):
+        return None
+    try:
+        with open(schema_path, "rb") as schema_file:
+            checksum = schema_checksum(schema_file.read())
+        with open(artifact_path, "rb") as artifact_file:
+            artifact = pickle.load(artifact_file)
+    except (OSError, EOFError, pickle.UnpicklingError) as ex:
+        LOG.warning(f"Could not read prebuilt schema {artifact_path}: {ex}")
+        return None
+
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("format") != ARTIFACT_FORMAT
+        or artifact.get("schema_sha256") != checksum
+    ):
+        LOG.warning(f"Prebuilt schema {artifact_path} is outdated, reading the schema file instead")
+        return None
+    return artifact
+
+
+def compiled_validator(artifact: dict) -> Optional[Callable]:
+    """Return the validation function generated by fastjsonschema stored in the artifact,
+    if it was compiled by the running versions of Python and fastjsonschema
+
+    Returns:
+        compiled(function) or None
+    """
+    compiled = artifact.get("compiled")
+    if not compiled or compiled["cache_tag"] != sys.implementation.cache_tag:
+        return None
+    try:
+        import fastjsonschema
+    except ImportError:
+        return None
+    if compiled["fastjsonschema_version"] != fastjsonschema.VERSION:
+        return None
+
+    namespace = {}
+    exec(marshal.loads(compiled["bytecode"]), namespace)
+    return namespace["validate"]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the prebuilt submission schema")
+    parser.add_argument("--schema", default=subm_schema_path, help="Path to the schema json file")
+    parser.add_argument(
+        "--output", default=subm_schema_artifact_path, help="Path of the prebuilt schema"
+    )
+    parser.add_argument(
+        "--require-compiled",
+        action="store_true",
+        help="Fail if the prebuilt schema doesn't contain a working compiled validator",
+    )
+    args = parser.parse_args(argv)
+    artifact = build_schema_artifact(args.schema, args.output)
+    if args.require_compiled and compiled_validator(artifact) is None:
+        sys.exit(
+            f"Prebuilt schema {args.output} doesn't contain a compiled validator, is fastjsonschema installed?"
+        )
+    compiled = "with" if artifact["compiled"] else "without"
+    print(f"Prebuilt schema written to {args.output}, {compiled} compiled validator")
+
+
+if __name__ == "__main__":
+    main()
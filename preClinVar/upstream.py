@@ -0,0 +1,321 @@
+"""Protection of the ClinVar API, and of the workers, from bursts of requests and from a degraded API:
+a rate limiter per API key, retries with jittered exponential backoff honouring the Retry-After header,
+and a circuit breaker failing fast while the API is down.
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import logging
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Callable, Optional
+
+import httpx
+
+from preClinVar.metrics import UPSTREAM_REJECTED, UPSTREAM_RETRIES, upstream_endpoint
+
+LOG = logging.getLogger("uvicorn.access")
+
+API_KEY_HEADER = "SP-API-KEY"
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Requests which can be sent again after a server error. Others (submissions) are only sent again
+# when the API rejected them without processing them: 429 responses and connection failures
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Maximum number of API keys with a rate limiter. The least recently used are removed first
+MAX_RATE_LIMITED_KEYS = 1024
+
+###### ClinVar API protection settings, can be overridden by environment variables ######
+# Requests per second sent with the same API key. 0 disables the rate limiter
+RATE_LIMIT = float(os.getenv("CLINVAR_API_RATE_LIMIT", "10"))
+# Requests which can be sent at once with the same API key
+RATE_LIMIT_BURST = int(os.getenv("CLINVAR_API_RATE_LIMIT_BURST", "20"))
+# Requests which should wait longer than this number of seconds for the rate limiter are rejected with 429
+RATE_LIMIT_MAX_WAIT = float(os.getenv("CLINVAR_API_RATE_LIMIT_MAX_WAIT", "10"))
+MAX_RETRIES = int(os.getenv("CLINVAR_API_MAX_RETRIES", "3"))
+# Seconds waited before the first retry, doubled at each retry up to BACKOFF_MAX, with full jitter
+BACKOFF_BASE = float(os.getenv("CLINVAR_API_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("CLINVAR_API_BACKOFF_MAX", "10"))
+# Responses asking to retry after a longer delay, in seconds, are returned without retrying
+MAX_RETRY_AFTER = float(os.getenv("CLINVAR_API_MAX_RETRY_AFTER", "30"))
+# Consecutive server errors or failed requests opening the circuit breaker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CLINVAR_API_CIRCUIT_FAILURE_THRESHOLD", "5"))
+# Seconds during which requests are rejected once the circuit breaker is open, before a request is let through to probe the API
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CLINVAR_API_CIRCUIT_RESET_TIMEOUT", "30"))
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate. Tokens can be reserved in advance, the bucket going into debt"""
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+        self.paused_until = 0.0
+
+    def reserve(self, now: float, max_wait: float) -> Optional[float]:
+        """Take a token
+
+        Returns:
+            wait(float): seconds to wait before using the token, or None if it's longer than max_wait and no token was taken
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate, self.paused_until - now)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def pause(self, until: float):
+        """Don't give tokens before a time, for instance when the API asked to retry later"""
+        self.paused_until = max(self.paused_until, until)
+
+
+class RateLimiter:
+    """Token bucket rate limiter for each API key. Keys are kept as hashes"""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: int = RATE_LIMIT_BURST,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        max_keys: int = MAX_RATE_LIMITED_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, api_key: str) -> TokenBucket:
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, self.clock())
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def reserve(self, api_key: str) -> Optional[float]:
+        """Take a token from the bucket of an API key
+
+        Returns:
+            wait(float): seconds to wait before sending the request, or None if the request should be rejected
+        """
+        if self.rate <= 0:
+            return 0.0
+        return self._bucket(api_key).reserve(self.clock(), self.max_wait)
+
+    def pause(self, api_key: str, seconds: float):
+        """Delay the next requests sent with an API key"""
+        if self.rate > 0:
+            self._bucket(api_key).pause(self.clock() + seconds)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop sending requests to the API after consecutive failures. Once reset_timeout seconds have passed,
+    a single request is let through: the circuit is closed again if it succeeds, and opened again if it fails.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> CircuitState:
+        if self.opened_at is None:
+            return CircuitState.CLOSED
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until a request is let through again"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.OPEN:
+            return False
+        # Half open: one probe at a time. A probe which never completed is replaced after reset_timeout
+        now = self.clock()
+        if self.probe_started is None or now - self.probe_started >= self.reset_timeout:
+            self.probe_started = now
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            LOG.info("ClinVar API is available again, circuit breaker closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probe_started is not None or (
+            self.opened_at is None and self.failures >= self.failure_threshold
+        ):
+            LOG.warning(
+                f"ClinVar API failed {self.failures} times, circuit breaker open for {self.reset_timeout} seconds"
+            )
+            self.opened_at = self.clock()
+            self.probe_started = None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the seconds to wait according to a Retry-After header, given in seconds or as an HTTP date
+
+    Returns:
+        seconds(float) or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+def _local_response(
+    request: httpx.Request, status_code: int, message: str, retry_after: float
+) -> httpx.Response:
+    """Create a response returned in place of the ClinVar API"""
+    return httpx.Response(
+        status_code=status_code,
+        json={"message": message},
+        headers={"Retry-After": str(math.ceil(retry_after))},
+        request=request,
+    )
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """HTTP transport limiting the rate of the requests of each API key, retrying failed requests with backoff,
+    and returning a 503 response without contacting the API while its circuit breaker is open
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        max_retry_after: float = MAX_RETRY_AFTER,
+    ):
+        self.transport = transport
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before a retry: exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        api_key = request.headers.get(API_KEY_HEADER, "")
+        idempotent = request.method in IDEMPOTENT_METHODS
+        labels = {"method": request.method, "endpoint": upstream_endpoint(request.url)}
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow_request():
+                UPSTREAM_REJECTED.inc(reason="circuit_open")
+                retry_after = self.circuit_breaker.retry_after()
+                return _local_response(
+                    request,
+                    503,
+                    "ClinVar API is unavailable after repeated failures, "
+                    f"requests are suspended for {math.ceil(retry_after)} seconds",
+                    retry_after,
+                )
+            wait = self.rate_limiter.reserve(api_key)
+            if wait is None:
+                UPSTREAM_REJECTED.inc(reason="rate_limited")
+                return _local_response(
+                    request,
+                    429,
+                    f"Too many requests sent to ClinVar API with this API key, limit is {self.rate_limiter.rate:g} requests per second",
+                    self.rate_limiter.max_wait,
+                )
+            if wait:
+                await asyncio.sleep(wait)
+
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as ex:
+                self.circuit_breaker.record_failure()
+                # Requests which could not be sent are never processed by the API
+                sent = not isinstance(ex, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt >= self.max_retries or (sent and not idempotent):
+                    raise
+                UPSTREAM_RETRIES.inc(status_code="error", **labels)
+                delay = self.backoff(attempt)
+                LOG.warning(
+                    f"{request.method} {request.url} failed ({ex}), retrying in {delay:.1f}s"
+                )
+            else:
+                if response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429 and retry_after is not None:
+                    self.rate_limiter.pause(api_key, retry_after)
+                if (
+                    attempt >= self.max_retries
+                    or response.status_code not in RETRYABLE_STATUS_CODES
+                    or (response.status_code != 429 and not idempotent)
+                    or (retry_after is not None and retry_after > self.max_retry_after)
+                ):
+                    return response
+                await response.aclose()
+                UPSTREAM_RETRIES.inc(status_code=str(response.status_code), **labels)
+                delay = self.backoff(attempt) if retry_after is None else retry_after
+                LOG.warning(
+                    f"{request.method} {request.url} returned {response.status_code}, retrying in {delay:.1f}s"
+                )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
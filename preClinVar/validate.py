@@ -1,22 +1,388 @@
 import json
 import logging
-from typing import List, Tuple
-
-from jsonschema import Draft7Validator, validate
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
 
+from preClinVar.constants import SUBMISSION_ITEMS_KEYS
+from preClinVar.metrics import timed_stage
 from preClinVar.resources import subm_schema_path
+from preClinVar.schema_artifact import compiled_validator, read_schema_artifact
+
+if TYPE_CHECKING:  # jsonschema is imported when the first validator is built
+    from jsonschema import Draft7Validator, ValidationError
 
 LOG = logging.getLogger("uvicorn.access")
 
+DEFINITIONS_PREFIX = "#/definitions/"
+
+###### Parallel validation settings, can be overridden by environment variables ######
+# Number of processes validating the items of large submissions. 1 means no parallel validation
+VALIDATION_PROCESSES = int(os.getenv("VALIDATION_PROCESSES", str(os.cpu_count() or 1)))
+# Submissions with fewer items are validated in the current process
+PARALLEL_VALIDATION_MIN_ITEMS = int(os.getenv("PARALLEL_VALIDATION_MIN_ITEMS", "2000"))
+# Number of items validated by a process at a time
+VALIDATION_BATCH_SIZE = int(os.getenv("VALIDATION_BATCH_SIZE", "500"))
+
+# Maximum number of errors returned by default when validating in "capped" mode
+MAX_ERRORS = int(os.getenv("VALIDATION_MAX_ERRORS", "100"))
+# Number of items reported for each group of errors when validating in "aggregate" mode
+AGGREGATE_SAMPLE_ITEMS = 5
+# Build the validators in the background when the server starts, instead of on the first validation
+VALIDATOR_WARM_UP = os.getenv("VALIDATOR_WARM_UP", "true").lower() == "true"
+
+_validation_pool: Optional[ProcessPoolExecutor] = None
+_validation_pool_lock = threading.Lock()
+
+
+class ValidationMode(str, Enum):
+    """How the errors found when validating a submission are collected"""
+
+    ALL = "all"
+    FIRST = "first"
+    CAPPED = "capped"
+    AGGREGATE = "aggregate"
+
+
+def _resolve_refs(node, definitions: dict, resolved: dict):
+    """Replace every local "$ref" of a schema node with the definition it points to
+
+    Args:
+        node(dict, list or scalar): a node of the submission schema
+        definitions(dict): the "definitions" section of the submission schema
+        resolved(dict): definitions already resolved, shared between all the nodes pointing to them
+
+    Returns:
+        a copy of the node without references
+    """
+    if isinstance(node, list):
+        return [_resolve_refs(value, definitions, resolved) for value in node]
+    if not isinstance(node, dict):
+        return node
+
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith(DEFINITIONS_PREFIX):
+        # In Draft 7 the keywords next to a "$ref" are ignored, the node is the referenced definition
+        def_name = ref[len(DEFINITIONS_PREFIX) :]
+        if def_name not in resolved:
+            resolved[def_name] = _resolve_refs(definitions[def_name], definitions, resolved)
+        return resolved[def_name]
+
+    return {key: _resolve_refs(value, definitions, resolved) for key, value in node.items()}
+
+
+@lru_cache(maxsize=None)
+def get_schema_artifact() -> Optional[dict]:
+    """Return the prebuilt submission schema, if it is up to date. See preClinVar.schema_artifact"""
+    return read_schema_artifact()
+
+
+@lru_cache(maxsize=None)
+def load_schema() -> dict:
+    """Read and check the ClinVar submission schema. The file is parsed only once per process.
+    The schema is taken from the prebuilt schema when available, since it was already checked at build time.
+
+    Returns:
+        schema(dict): the submission schema, as it is in the resources folder
+    """
+    artifact = get_schema_artifact()
+    if artifact:
+        return artifact["schema"]
+
+    from jsonschema import Draft7Validator
 
-def validate_submission(submission_dict: dict) -> Tuple[bool, List[str]]:
-    """Validate a submission dictionary against the ClinVar submission schema."""
-    errors = []
     with open(subm_schema_path) as schema_file:
         schema = json.load(schema_file)
+    Draft7Validator.check_schema(schema)
+    return schema
+
+
+@lru_cache(maxsize=None)
+def get_validator() -> "Draft7Validator":
+    """Return a Draft7Validator built once on the submission schema, with its references already resolved"""
+    from jsonschema import Draft7Validator
+
+    artifact = get_schema_artifact()
+    if artifact:
+        return Draft7Validator(artifact["resolved_schema"])
+    schema = load_schema()
+    resolved_schema = _resolve_refs(schema, schema.get("definitions", {}), {})
+    return Draft7Validator(resolved_schema)
+
+
+@lru_cache(maxsize=None)
+def get_compiled_validator() -> Optional[Callable]:
+    """Return a validation function generated from the submission schema by fastjsonschema, if the library is installed
+
+    Returns:
+        compiled(function) or None
+    """
+    artifact = get_schema_artifact()
+    if artifact:
+        compiled = compiled_validator(artifact)
+        if compiled:
+            return compiled
+
+    try:
+        import fastjsonschema
+    except ImportError:
+        return None
+
+    try:
+        return fastjsonschema.compile(load_schema())
+    except Exception as ex:
+        LOG.warning(f"Could not compile submission schema, using the standard validator: {ex}")
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_document_validator() -> "Draft7Validator":
+    """Return a validator checking a submission without its items, which are validated by get_item_validator"""
+    from jsonschema import Draft7Validator
+
+    document_schema = dict(get_validator().schema)
+    document_schema["properties"] = {
+        key: {prop_key: value for prop_key, value in prop.items() if prop_key != "items"}
+        if key in SUBMISSION_ITEMS_KEYS
+        else prop
+        for key, prop in document_schema["properties"].items()
+    }
+    return Draft7Validator(document_schema)
+
+
+@lru_cache(maxsize=None)
+def get_item_validator(items_key: str) -> "Draft7Validator":
+    """Return a validator for the items of a submission
+
+    Args:
+        items_key(str): one of SUBMISSION_ITEMS_KEYS, for instance "clinvarSubmission"
+    """
+    from jsonschema import Draft7Validator
+
+    return Draft7Validator(get_validator().schema["properties"][items_key]["items"])
+
+
+def warm_up_validators():
+    """Build all the validators of the submission schema, so that the first validation doesn't wait for them"""
+    get_compiled_validator()
+    get_document_validator()
+    for items_key in SUBMISSION_ITEMS_KEYS:
+        get_item_validator(items_key)
+
+
+def _error_path(error: "ValidationError", any_index: bool = False) -> str:
+    """Return the position of an error in the validated object as a JSON path
+
+    Args:
+        error(jsonschema.ValidationError)
+        any_index(bool): if True, list indexes are replaced by "*"
+
+    Returns:
+        path(str): Example: ".observedIn[0].affectedStatus", or ".observedIn[*].affectedStatus" if any_index is True
+    """
+    path = ""
+    for element in error.absolute_path:
+        if isinstance(element, int):
+            path += "[*]" if any_index else f"[{element}]"
+        else:
+            path += f".{element}"
+    return path
+
+
+def _validate_items_batch(
+    items_key: str,
+    start: int,
+    items: list,
+    max_errors: Optional[int] = None,
+    aggregate: bool = False,
+) -> Union[List[str], Dict[Tuple[str, str], list]]:
+    """Validate a batch of consecutive submission items
+
+    Args:
+        items_key(str): one of SUBMISSION_ITEMS_KEYS, for instance "clinvarSubmission"
+        start(int): index of the first item of the batch in the submission
+        items(list): the submission items
+        max_errors(int): stop validating items once this number of errors is reached
+        aggregate(bool): if True, errors are grouped by path and message
+
+    Returns:
+        errors(list): error messages, reporting the index of the item. Example: ["germlineSubmission[3]: 'unknown' is not one of ['novel', 'update']"]
+        or, if aggregate is True,
+        groups(dict): Example: {(".recordStatus", "'unknown' is not one of ['novel', 'update']"): [2, [3, 7]]}, with the count of errors and the first items containing them
+    """
+    validator = get_item_validator(items_key)
+    errors = []
+    groups = {}
+    for index, item in enumerate(items, start):
+        item_errors = validator.iter_errors(item)
+        if aggregate:
+            for error in item_errors:
+                group = groups.setdefault(
+                    (_error_path(error, any_index=True), error.message), [0, []]
+                )
+                group[0] += 1
+                if len(group[1]) < AGGREGATE_SAMPLE_ITEMS and index not in group[1]:
+                    group[1].append(index)
+            continue
+
+        for message in sorted(error.message for error in item_errors):
+            errors.append(f"{items_key}[{index}]: {message}")
+        if max_errors is not None and len(errors) >= max_errors:
+            return errors[:max_errors]
+
+    return groups if aggregate else errors
+
+
+def _merge_error_groups(
+    groups: Dict[Tuple[str, str], list], batch_groups: Dict[Tuple[str, str], list]
+):
+    """Add the error groups of a batch of items to the error groups of the previous batches"""
+    for key, (count, sample_items) in batch_groups.items():
+        group = groups.setdefault(key, [0, []])
+        group[0] += count
+        group[1].extend(sample_items[: AGGREGATE_SAMPLE_ITEMS - len(group[1])])
+
+
+def get_validation_pool(processes: int) -> ProcessPoolExecutor:
+    """Return the pool of processes validating submission items, creating it the first time it is used.
+    The pool is created only once when several threads running CPU-bound stages ask for it at the same time.
+    """
+    global _validation_pool
+    if _validation_pool is None:
+        with _validation_pool_lock:
+            if _validation_pool is None:
+                _validation_pool = ProcessPoolExecutor(
+                    max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _validation_pool
+
+
+def shutdown_validation_pool():
+    """Stop the processes validating submission items, if they were started"""
+    global _validation_pool
+    with _validation_pool_lock:
+        if _validation_pool is not None:
+            _validation_pool.shutdown()
+            _validation_pool = None
+
+
+def _count_items(submission_dict: dict) -> int:
+    """Return the number of items of a submission, in all its lists of items"""
+    if not isinstance(submission_dict, dict):
+        return 0
+    return sum(
+        len(submission_dict[key])
+        for key in SUBMISSION_ITEMS_KEYS
+        if isinstance(submission_dict.get(key), list)
+    )
+
+
+def validate_submission(
+    submission_dict: dict,
+    processes: int = VALIDATION_PROCESSES,
+    mode: ValidationMode = ValidationMode.ALL,
+    max_errors: int = MAX_ERRORS,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[bool, List[str]]:
+    """Validate a submission dictionary against the ClinVar submission schema.
+
+    Top-level fields are validated first, then each of the submission items against the items schema.
+    Items of large submissions are validated in batches by a pool of processes.
+
+    Args:
+        submission_dict(dict): the submission object
+        processes(int): maximum number of processes used to validate the submission items
+        mode(ValidationMode): "all" to collect all errors, "first" to stop at the first error, "capped" to stop after max_errors errors
+            or "aggregate" to group the errors of the items by path and message
+        max_errors(int): maximum number of errors returned in "capped" mode
+        progress(function): called with the number of items validated so far, after each batch of items
+
+    Returns:
+        valid, errors(tuple): True if the submission is valid, and the list of errors sorted by position in the submission
+    """
+    with timed_stage("validate", rows=_count_items(submission_dict)):
+        return _validate_submission(submission_dict, processes, mode, max_errors, progress)
+
+
+def _validate_submission(
+    submission_dict: dict,
+    processes: int,
+    mode: ValidationMode,
+    max_errors: int,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[bool, List[str]]:
+    """Validate a submission, see validate_submission"""
+    compiled = get_compiled_validator()
+    if compiled:
+        try:
+            compiled(submission_dict)
+            if progress:
+                progress(_count_items(submission_dict))
+            return True, []
+        except Exception:
+            pass  # Collect the errors with the standard validator
+
+    error_cap = {ValidationMode.FIRST: 1, ValidationMode.CAPPED: max_errors}.get(mode)
+    aggregate = mode == ValidationMode.AGGREGATE
+
+    errors = sorted(
+        error.message for error in get_document_validator().iter_errors(submission_dict)
+    )
+    if error_cap is not None and len(errors) >= error_cap:
+        return False, errors[:error_cap]
+
+    batches = []
+    if isinstance(submission_dict, dict):
+        for items_key in SUBMISSION_ITEMS_KEYS:
+            items = submission_dict.get(items_key)
+            if not isinstance(items, list):
+                continue
+            for start in range(0, len(items), VALIDATION_BATCH_SIZE):
+                batches.append((items_key, start, items[start : start + VALIDATION_BATCH_SIZE]))
+
+    n_items = sum(len(batch[2]) for batch in batches)
+    parallel = processes > 1 and len(batches) > 1 and n_items >= PARALLEL_VALIDATION_MIN_ITEMS
+    if parallel:
+        # Results are collected in the same order as the batches, making the list of errors deterministic
+        pool = get_validation_pool(processes)
+        futures = [
+            pool.submit(_validate_items_batch, *batch, error_cap, aggregate) for batch in batches
+        ]
+        batches_errors = (future.result() for future in futures)
+    else:
+        futures = []
+        batches_errors = (
+            _validate_items_batch(
+                *batch, None if error_cap is None else error_cap - len(errors), aggregate
+            )
+            for batch in batches
+        )
+
+    groups_by_key = {}
+    validated = 0
+    for batch, batch_errors in zip(batches, batches_errors):
+        validated += len(batch[2])
+        if progress:
+            progress(validated)
+        if aggregate:
+            _merge_error_groups(groups_by_key.setdefault(batch[0], {}), batch_errors)
+            continue
+
+        errors.extend(batch_errors)
+        if error_cap is not None and len(errors) >= error_cap:
+            for future in futures:
+                future.cancel()  # Batches not started yet are not needed
+            errors = errors[:error_cap]
+            break
 
-        v = Draft7Validator(schema)
-        for error in sorted(v.iter_errors(submission_dict), key=str):
-            errors.append(error.message)
+    for items_key, groups in groups_by_key.items():
+        for (path, message), (count, sample_items) in groups.items():
+            errors.append(
+                f"{items_key}[*]{path}: {message} (errors: {count}, first items: {sample_items})"
+            )
 
     return errors == [], errors
@@ -0,0 +1,206 @@
+"""Case-insensitive lookup tables of the values accepted for the controlled fields of Variant and CaseData files,
+built once from the constants and the enums of the submission schema, and a pre-check reporting invalid values by row.
+"""
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+from preClinVar.constants import CLNSIG_TERMS, CONDITIONS_MAP
+from preClinVar.validate import load_schema
+
+# Location of the enums of the controlled fields in the submission schema, by column of the Variant or CaseData file
+SCHEMA_ENUMS = {
+    "Clinical significance": [
+        "properties",
+        "clinvarSubmission",
+        "items",
+        "properties",
+        "clinicalSignificance",
+        "properties",
+        "clinicalSignificanceDescription",
+    ],
+    "Mode of inheritance": [
+        "properties",
+        "clinvarSubmission",
+        "items",
+        "properties",
+        "clinicalSignificance",
+        "properties",
+        "modeOfInheritance",
+    ],
+    "Explanation for multiple conditions": [
+        "properties",
+        "clinvarSubmission",
+        "items",
+        "properties",
+        "conditionSet",
+        "properties",
+        "multipleConditionExplanation",
+    ],
+    "Variant type": ["definitions", "variantType", "properties", "variantType"],
+    "Affected status": ["definitions", "baseObservationType", "properties", "affectedStatus"],
+    "Allele origin": ["definitions", "baseObservationType", "properties", "alleleOrigin"],
+    "Collection method": ["definitions", "baseObservationType", "properties", "collectionMethod"],
+}
+# Controlled fields checked by the pre-check, for each type of file
+VARIANT_CONTROLLED_FIELDS = [
+    "Clinical significance",
+    "Germline classification",
+    "Mode of inheritance",
+    "Condition ID type",
+    "Explanation for multiple conditions",
+    "Variant type",
+]
+CASEDATA_CONTROLLED_FIELDS = ["Affected status", "Allele origin", "Collection method"]
+
+
+def _lookup_table(terms: Iterable[str]) -> Dict[str, str]:
+    """Create a table returning the term matching a value, ignoring case. The first of equivalent terms is kept"""
+    table = {}
+    for term in terms:
+        table.setdefault(term.lower(), term)
+    return table
+
+
+def _schema_enum(schema: dict, path: List[str]) -> List[str]:
+    node = schema
+    for key in path:
+        node = node[key]
+    return node["enum"]
+
+
+@lru_cache(maxsize=None)
+def get_vocabularies() -> Mapping[str, Mapping[str, str]]:
+    """Return the lookup table of each controlled field.
+    Tables are read-only, since they are shared by all requests and by the workers forked from a preloaded app.
+
+    Returns:
+        vocabularies(dict): Example: {"Affected status": {"yes": "yes", "not provided": "not provided", ..}, "Condition ID type": {"hpo": "HPO", ..}, ..}
+    """
+    schema = load_schema()
+    vocabularies = {
+        field: _lookup_table(_schema_enum(schema, path)) for field, path in SCHEMA_ENUMS.items()
+    }
+    # Terms of the constants take precedence over the equivalent terms of the schema
+    clinsig = _lookup_table([*CLNSIG_TERMS, *vocabularies["Clinical significance"]])
+    vocabularies["Clinical significance"] = clinsig
+    vocabularies["Germline classification"] = clinsig
+    vocabularies["Condition ID type"] = _lookup_table(CONDITIONS_MAP)
+    return MappingProxyType(
+        {field: MappingProxyType(table) for field, table in vocabularies.items()}
+    )
+
+
+def normalize_value(field: str, value: Optional[str]) -> Optional[str]:
+    """Return the accepted term matching the value of a controlled field, ignoring case.
+    Empty values and values not matching any term are returned unchanged.
+
+    Args:
+        field(str): name of the column. Example: "Affected status"
+        value(str): Example: "Yes"
+
+    Returns:
+        normalized(str): Example: "yes"
+    """
+    if not value:
+        return value
+    return get_vocabularies()[field].get(value.lower(), value)
+
+
+def _invalid_value_error(file_label: str, row: int, field: str, value: str) -> str:
+    return f"{file_label} file, row {row}: '{value}' is not a valid {field}"
+
+
+def accepted_values_summary(errors: List[str]) -> List[str]:
+    """List the accepted values of the fields with invalid values once per field, instead of in every error
+
+    Args:
+        errors(list): errors returned by the pre-check of the controlled fields
+
+    Returns:
+        summary(list): Example: ["Accepted values of Affected status: ['yes', 'no', 'unknown', ..]"]
+    """
+    vocabularies = get_vocabularies()
+    fields = dict.fromkeys(
+        field
+        for error in errors
+        for field in vocabularies
+        if error.endswith(f" is not a valid {field}")
+    )
+    return [
+        f"Accepted values of {field}: {list(dict.fromkeys(vocabularies[field].values()))}"
+        for field in fields
+    ]
+
+
+def check_line(line_dict: dict, fields: List[str], file_label: str, row: int) -> List[str]:
+    """Check the values of the controlled fields of a line
+
+    Args:
+        line_dict(dict): a line of a Variant or CaseData file
+        fields(list): VARIANT_CONTROLLED_FIELDS or CASEDATA_CONTROLLED_FIELDS
+        file_label(str): "Variant" or "CaseData"
+        row(int): position of the line in the file, starting from 1 for the line after the header
+
+    Returns:
+        errors(list): Example: ["CaseData file, row 3: 'yess' is not a valid Affected status"]
+    """
+    vocabularies = get_vocabularies()
+    errors = []
+    for field in fields:
+        value = line_dict.get(field)
+        if value and value.lower() not in vocabularies[field]:
+            errors.append(_invalid_value_error(file_label, row, field, value))
+    return errors
+
+
+def precheck_lines(lines: Iterable[dict], fields: List[str], file_label: str) -> List[str]:
+    """Check the controlled fields of all the lines of a file. See check_line"""
+    errors = []
+    for row, line_dict in enumerate(lines, 1):
+        errors.extend(check_line(line_dict, fields, file_label, row))
+    return errors
+
+
+def iter_prechecked(
+    lines: Iterable[dict], fields: List[str], file_label: str, errors: List[str]
+) -> Iterator[dict]:
+    """Yield the lines of a file, checking their controlled fields while they are consumed.
+    Errors are added to the provided list, so that lines streamed to the submission builder are checked in the same pass.
+    """
+    for row, line_dict in enumerate(lines, 1):
+        errors.extend(check_line(line_dict, fields, file_label, row))
+        yield line_dict
+
+
+def precheck_columns(columns: Dict[str, list], fields: List[str], file_label: str) -> List[str]:
+    """Check the controlled fields of a file read into columns, one column at a time
+
+    Args:
+        columns(dict): the columns of a file, as returned by columnar.read_file_columns
+        fields(list): VARIANT_CONTROLLED_FIELDS or CASEDATA_CONTROLLED_FIELDS
+        file_label(str): "Variant" or "CaseData"
+
+    Returns:
+        errors(list): errors sorted by row, then in the order of the fields
+    """
+    vocabularies = get_vocabularies()
+    invalid = []
+    for n_field, field in enumerate(fields):
+        if field not in columns:
+            continue
+        vocabulary = vocabularies[field]
+        # Values are checked once for each distinct value of the column
+        invalid_values = {
+            value for value in set(columns[field]) if value and value.lower() not in vocabulary
+        }
+        if not invalid_values:
+            continue
+        for row, value in enumerate(columns[field], 1):
+            if value in invalid_values:
+                invalid.append((row, n_field, field, value))
+    return [
+        _invalid_value_error(file_label, row, field, value)
+        for row, _, field, value in sorted(invalid, key=lambda error: error[:2])
+    ]
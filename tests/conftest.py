@@ -0,0 +1,81 @@
+from typing import Callable, Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from preClinVar.cache import status_cache
+from preClinVar.clinvar_client import create_client, get_clinvar_client
+from preClinVar.fake_clinvar import create_fake_clinvar_app
+from preClinVar.main import app
+
+
+class MockClinVarAPI:
+    """Mocked responses of the ClinVar API, returned to the HTTP client used by the proxy endpoints"""
+
+    def __init__(self):
+        self.responses = {}
+
+    def add(self, method: str, url: str, json=None, status: int = 200, text: str = None):
+        """Register the response to be returned for a method and URL, with a json or text content"""
+        if text is not None:
+            self.responses[(method, url)] = httpx.Response(status_code=status, text=text)
+        else:
+            self.responses[(method, url)] = httpx.Response(status_code=status, json=json)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        """Return the response registered for a request"""
+        mocked_resp = self.responses.get((request.method, str(request.url)))
+        if mocked_resp is None:
+            raise httpx.ConnectError(f"No mocked response for {request.method} {request.url}")
+        return mocked_resp
+
+
+@pytest.fixture(autouse=True)
+def clear_status_cache():
+    """Don't let the submission statuses cached by a test be returned to the next ones"""
+    status_cache.clear()
+    yield
+    status_cache.clear()
+
+
+@pytest.fixture
+def mock_clinvar():
+    """Replace the ClinVar API used by the app with mocked responses"""
+    mock_api = MockClinVarAPI()
+
+    async def mocked_client():
+        async with create_client(
+            transport=httpx.MockTransport(mock_api.handler), backoff_base=0
+        ) as client:
+            yield client
+
+    app.dependency_overrides[get_clinvar_client] = mocked_client
+    yield mock_api
+    app.dependency_overrides.pop(get_clinvar_client)
+
+
+@pytest.fixture
+def fake_clinvar():
+    """Replace the ClinVar API used by the app with a local stand-in (preClinVar.fake_clinvar).
+    The fixture is a function taking the options of create_fake_clinvar_app and returning the fake app.
+    The client sending requests to the fake app can be created by a custom function, receiving the ASGI transport of the app.
+    Example: fake_app = fake_clinvar(latency=0.2)
+    """
+
+    def use_fake_clinvar(
+        client_factory: Optional[Callable[[httpx.AsyncBaseTransport], httpx.AsyncClient]] = None,
+        **fake_app_options,
+    ) -> FastAPI:
+        fake_app = create_fake_clinvar_app(**fake_app_options)
+        create = client_factory or (lambda transport: create_client(transport=transport))
+
+        async def fake_client():
+            async with create(httpx.ASGITransport(app=fake_app)) as client:
+                yield client
+
+        app.dependency_overrides[get_clinvar_client] = fake_client
+        return fake_app
+
+    yield use_fake_clinvar
+    app.dependency_overrides.pop(get_clinvar_client, None)
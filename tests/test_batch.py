@@ -0,0 +1,107 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+from preClinVar.batch import (
+    ArchiveError,
+    extract_files,
+    file_pair_key,
+    match_file_pairs,
+    result_line,
+    results_archive,
+)
+
+
+def _zip_upload(files: dict, filename: str = "batch.zip") -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, contents in files.items():
+            archive.writestr(name, contents)
+    buffer.seek(0)
+    return UploadFile(buffer, filename=filename)
+
+
+def test_file_pair_key():
+    """Test the prefix identifying the pair of a submission file"""
+    assert file_pair_key("batch1/sample1_Variant.csv") == ("variants", "batch1/sample1")
+    assert file_pair_key("sample1.CaseData.csv") == ("casedata", "sample1")
+    assert file_pair_key("Variants_CaseData.tsv") == ("casedata", "Variants")
+    assert file_pair_key("Variant.csv") == ("variants", "")
+    assert file_pair_key("README.md") is None
+
+
+def test_extract_files_zip():
+    """Test reading the files of a zip archive, skipping metadata files"""
+    # GIVEN a zip archive with 2 files and a metadata file
+    upload = _zip_upload(
+        {"s1_Variant.csv": b"a", "s1_CaseData.csv": b"b", "__MACOSX/._s1_Variant.csv": b"c"}
+    )
+
+    # THEN the 2 files should be extracted
+    files = extract_files([upload])
+    assert [(file.filename, file.file.read()) for file in files] == [
+        ("s1_Variant.csv", b"a"),
+        ("s1_CaseData.csv", b"b"),
+    ]
+
+
+def test_extract_files_tar():
+    """Test reading the files of a compressed tar archive together with plain files"""
+    # GIVEN a tar.gz archive with a file
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        info = tarfile.TarInfo("dir/s1_Variant.tsv")
+        info.size = 1
+        archive.addfile(info, io.BytesIO(b"a"))
+    buffer.seek(0)
+    uploads = [
+        UploadFile(buffer, filename="batch.tar.gz"),
+        UploadFile(io.BytesIO(b"b"), filename="s2_CaseData.tsv"),
+    ]
+
+    # THEN the files of the archive and the plain files should be extracted
+    files = extract_files(uploads)
+    assert [file.filename for file in files] == ["dir/s1_Variant.tsv", "s2_CaseData.tsv"]
+
+
+def test_extract_files_too_large():
+    """Test that archives larger than the limit once extracted are rejected"""
+    upload = _zip_upload({"s1_Variant.csv": b"a" * 100})
+    with pytest.raises(ArchiveError):
+        extract_files([upload], max_bytes=10)
+
+
+def test_extract_files_malformed():
+    """Test that malformed archives are rejected"""
+    with pytest.raises(ArchiveError):
+        extract_files([UploadFile(io.BytesIO(b"not a zip"), filename="batch.zip")])
+
+
+def test_match_file_pairs():
+    """Test grouping files by prefix"""
+    files = [
+        UploadFile(io.BytesIO(), filename=name)
+        for name in ["s2_Variant.csv", "s1_CaseData.csv", "s1_Variant.csv", "notes.txt"]
+    ]
+    pairs = match_file_pairs(files)
+    assert list(pairs) == ["s1", "s2"]
+    assert [file.filename for file in pairs["s1"]["variants"]] == ["s1_Variant.csv"]
+    assert pairs["s2"]["casedata"] == []
+
+
+def test_results():
+    """Test encoding the results of a batch conversion as NDJSON and as a zip archive"""
+    results = [
+        ({"pair": "s1", "status_code": 200}, b'{"clinvarSubmission":[]}'),
+        ({"pair": "s2", "status_code": 400, "message": "error"}, None),
+    ]
+    assert result_line(*results[0]) == (
+        b'{"pair":"s1","status_code":200,"submission":{"clinvarSubmission":[]}}\n'
+    )
+
+    with zipfile.ZipFile(io.BytesIO(results_archive(results))) as archive:
+        assert archive.namelist() == ["s1.json", "results.ndjson"]
+        assert archive.read("results.ndjson").count(b"\n") == 2
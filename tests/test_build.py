@@ -0,0 +1,99 @@
+import json
+
+from preClinVar.build import build_add_data_payload, count_items, split_submission
+
+
+def test_split_submission():
+    """Test the function that splits a submission into submissions with fewer items."""
+
+    # GIVEN a submission with top-level fields and 5 items
+    subm_obj = {
+        "submissionName": "SUB1234",
+        "clinvarSubmissionReleaseStatus": "public",
+        "assertionCriteria": {"db": "PubMed", "id": "25741868"},
+        "clinvarSubmission": [{"localID": str(n)} for n in range(5)],
+    }
+
+    # WHEN the submission is split into chunks of at most 2 items
+    chunks = split_submission(subm_obj, 2)
+
+    # THEN 3 submissions should be created, with the items in the original order
+    assert [[item["localID"] for item in chunk["clinvarSubmission"]] for chunk in chunks] == [
+        ["0", "1"],
+        ["2", "3"],
+        ["4"],
+    ]
+    # AND each submission should contain the top-level fields of the original submission
+    for chunk in chunks:
+        assert list(chunk) == list(subm_obj)
+        for key in ["submissionName", "clinvarSubmissionReleaseStatus", "assertionCriteria"]:
+            assert chunk[key] == subm_obj[key]
+
+
+def test_split_submission_small():
+    """Test the function that splits a submission when the submission doesn't exceed the maximum number of items."""
+
+    # GIVEN a germline submission with 2 items
+    subm_obj = {"germlineSubmission": [{"localID": "1"}, {"localID": "2"}]}
+
+    # THEN it should not be split
+    assert split_submission(subm_obj, 2) == [subm_obj]
+
+
+def test_build_add_data_payload():
+    """Test the function that creates the body of a request adding data to ClinVar."""
+
+    # GIVEN a deletion object
+    delete_obj = {"clinvarDeletion": {"accessionSet": [{"accession": "SCV005395965"}]}}
+
+    # THEN the payload should contain it in an AddData action
+    assert build_add_data_payload(delete_obj)["actions"] == [
+        {"type": "AddData", "targetDb": "clinvar", "data": {"content": delete_obj}}
+    ]
+
+
+def test_split_submission_max_bytes():
+    """Test the function that splits a submission into submissions not exceeding a size once encoded in json."""
+
+    # GIVEN a submission with 10 items of different sizes
+    subm_obj = {
+        "submissionName": "SUB1234",
+        "clinvarSubmission": [{"localID": str(n), "note": "x" * 10 * n} for n in range(10)],
+    }
+
+    # WHEN the submission is split into chunks of at most 300 bytes
+    chunks = split_submission(subm_obj, max_bytes=300)
+
+    # THEN no chunk should exceed 300 bytes, and all the items should be kept in order
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(json.dumps(chunk)) <= 300
+        assert chunk["submissionName"] == "SUB1234"
+    assert [item for chunk in chunks for item in chunk["clinvarSubmission"]] == subm_obj[
+        "clinvarSubmission"
+    ]
+
+    # WHEN an item exceeds the maximum size on its own
+    chunks = split_submission(subm_obj, max_bytes=50)
+
+    # THEN it should be alone in its chunk
+    assert [count_items(chunk) for chunk in chunks] == [1] * 10
+
+
+def test_split_submission_all_items_lists():
+    """Test that the items of all the lists of items of a submission are split."""
+
+    # GIVEN a submission with 2 lists of items
+    subm_obj = {
+        "clinvarSubmission": [{"localID": "c1"}, {"localID": "c2"}],
+        "germlineSubmission": [{"localID": "g1"}],
+    }
+
+    # WHEN it is split into chunks of at most 2 items
+    chunks = split_submission(subm_obj, 2)
+
+    # THEN the chunks should contain the items of both lists, and only the lists having items in the chunk
+    assert chunks == [
+        {"clinvarSubmission": [{"localID": "c1"}, {"localID": "c2"}]},
+        {"germlineSubmission": [{"localID": "g1"}]},
+    ]
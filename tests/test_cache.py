@@ -0,0 +1,147 @@
+import asyncio
+import io
+
+from preClinVar.cache import (
+    STATUS_CACHE_TERMINAL_TTL,
+    STATUS_CACHE_TTL,
+    LRUCache,
+    SingleFlight,
+    file_digest,
+    status_cache_key,
+    status_ttl,
+)
+from preClinVar.metrics import render_metrics
+
+
+class FakeClock:
+    """A clock whose time is set by the tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_eviction():
+    """Test that the least recently used entries are evicted when the cache exceeds its maximum number of entries or size."""
+
+    # GIVEN a cache with at most 3 entries and 10 bytes
+    cache = LRUCache(max_entries=3, max_size=10, ttl=60)
+    cache.set("a", b"aaa", size=3)
+    cache.set("b", b"bbb", size=3)
+    cache.set("c", b"ccc", size=3)
+
+    # WHEN the oldest entry is used
+    assert cache.get("a") == b"aaa"
+
+    # AND a new entry is added
+    cache.set("d", b"d", size=1)
+
+    # THEN the least recently used entry should be evicted
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaa"
+
+    # WHEN a larger entry is added
+    cache.set("e", b"eeeee", size=5)
+
+    # THEN the least recently used entries should be evicted until the cache doesn't exceed its maximum size
+    assert cache.get("c") is None
+    assert cache.get("d") == b"d"
+    assert cache.stats() == {
+        "entries": 3,
+        "size": 9,
+        "hits": 3,
+        "misses": 2,
+        "evictions": 2,
+        "hit_ratio": 0.6,
+    }
+
+
+def test_lru_cache_ttl():
+    """Test that entries expire after their time to live."""
+
+    # GIVEN a cache with a default time to live of 60 seconds
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, max_size=100, ttl=60, clock=clock)
+
+    # WHEN an entry is added with the default time to live, and another with a longer time to live
+    cache.set("default", "value")
+    cache.set("longer", "value", ttl=120)
+
+    # THEN both should be returned before 60 seconds have passed
+    clock.now = 59
+    assert cache.get("default") == cache.get("longer") == "value"
+
+    # AND only the one with the longer time to live after 60 seconds
+    clock.now = 60
+    assert cache.get("default") is None
+    assert cache.get("longer") == "value"
+
+
+def test_lru_cache_disabled():
+    """Test that a cache with no entries doesn't store values."""
+    cache = LRUCache(max_entries=0, max_size=100, ttl=60)
+    cache.set("a", "value")
+    assert cache.enabled is False
+    assert cache.get("a") is None
+
+
+def test_file_digest():
+    """Test the function that computes the hash of a file content and rewinds the file."""
+
+    # GIVEN 2 files with the same content, one of them already read
+    file_1 = io.BytesIO(b"Linking ID,Individual ID\n")
+    file_2 = io.BytesIO(b"Linking ID,Individual ID\n")
+    file_2.read()
+
+    # THEN their hash should be the same and they should be rewound
+    assert file_digest(file_1, chunk_size=4) == file_digest(file_2)
+    assert file_1.read() == file_2.read() == b"Linking ID,Individual ID\n"
+
+
+def test_single_flight():
+    """Test that concurrent calls with the same key are executed once"""
+
+    # GIVEN a slow function counting its calls
+    calls = []
+
+    async def lookup():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("key", lookup) for _ in range(5)])
+        # WHEN the calls are completed, the next call should execute the function again
+        return results, await flight.do("key", lookup), flight.stats()
+
+    # THEN concurrent calls should share the result of a single call
+    results, next_result, stats = asyncio.run(run())
+    assert results == [1] * 5
+    assert next_result == 2
+    assert stats == {"in_flight": 0, "coalesced": 4}
+
+
+def test_status_cache_key_and_ttl():
+    """Test the keys of the cached submission statuses, and their time to live"""
+
+    # THEN API keys should not be kept in the keys
+    key = status_cache_key("/status", "secret_api_key", "SUB1")
+    assert "secret_api_key" not in key
+    assert key != status_cache_key("/status", "other_api_key", "SUB1")
+
+    # AND final statuses should be kept longer than the others
+    assert status_ttl({"actions": [{"status": "processed"}]}) == STATUS_CACHE_TERMINAL_TTL
+    assert status_ttl({"actions": [{"status": "error"}]}) == STATUS_CACHE_TERMINAL_TTL
+    assert status_ttl({"actions": [{"status": "submitted"}]}) == STATUS_CACHE_TTL
+    assert status_ttl({"actions": []}) == STATUS_CACHE_TTL
+
+
+def test_cache_metrics():
+    """Test that the statistics of the caches are exported with the other metrics"""
+    metrics = render_metrics()
+    assert "# TYPE preclinvar_cache_hits_total counter" in metrics
+    assert 'preclinvar_cache_evictions_total{cache="status"}' in metrics
+    assert 'preclinvar_cache_hit_ratio{cache="conversion"}' in metrics
@@ -0,0 +1,128 @@
+import json
+import shutil
+
+from preClinVar.cli import convert_pair, find_file_pairs, main, throughput_summary
+from preClinVar.demo import (
+    casedata_snv_csv_path,
+    casedata_sv_csv_path,
+    variants_hgvs_csv_path,
+    variants_sv_range_coords_csv_path,
+)
+
+
+def _copy_demo_files(input_dir):
+    """Create a folder with a valid pair of files in a subfolder and a pair without CaseData file"""
+    (input_dir / "batch1").mkdir(parents=True)
+    shutil.copy(variants_sv_range_coords_csv_path, input_dir / "batch1" / "sample1_Variant.csv")
+    shutil.copy(casedata_sv_csv_path, input_dir / "batch1" / "sample1_CaseData.csv")
+    shutil.copy(variants_hgvs_csv_path, input_dir / "sample2_Variant.csv")
+    shutil.copy(casedata_snv_csv_path, input_dir / "notes.txt")
+
+
+def test_find_file_pairs(tmp_path):
+    """Test finding the pairs of files in a folder and its subfolders"""
+    _copy_demo_files(tmp_path)
+    assert find_file_pairs(str(tmp_path)) == {
+        "batch1/sample1": {
+            "variants": ["batch1/sample1_Variant.csv"],
+            "casedata": ["batch1/sample1_CaseData.csv"],
+        },
+        "sample2": {"variants": ["sample2_Variant.csv"], "casedata": []},
+    }
+
+
+def test_main(tmp_path, capsys):
+    """Test converting a folder of files with the command-line converter"""
+    # GIVEN a folder with a valid pair of files and an incomplete pair
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    _copy_demo_files(input_dir)
+
+    # WHEN the folder is converted with submission parameters
+    exit_code = main(
+        [
+            str(input_dir),
+            "--output-dir",
+            str(output_dir),
+            "--assembly",
+            "GRCh37",
+            "--submission-name",
+            "batch1",
+            "--processes",
+            "1",
+        ]
+    )
+
+    # THEN the valid pair should be converted, with the submission parameters
+    submission = json.loads((output_dir / "batch1" / "sample1.json").read_text())
+    assert submission["submissionName"] == "batch1"
+    variant = submission["clinvarSubmission"][0]["variantSet"]["variant"][0]
+    assert variant["chromosomeCoordinates"]["assembly"] == "GRCh37"
+
+    # AND the incomplete pair should be reported as failed, with a throughput summary
+    assert exit_code == 1
+    captured = capsys.readouterr()
+    assert "sample2: FAILED Expected one CaseData file, found 0" in captured.err
+    assert "Pairs converted: 1, failed: 1" in captured.out
+
+
+def test_throughput_summary():
+    """Test the summary printed at the end of a conversion"""
+    results = [
+        {"status": "converted", "items": 100, "bytes": 1024 * 1024},
+        {"status": "failed", "items": 0, "bytes": 0},
+    ]
+    summary = throughput_summary(results, 2.0)
+    assert "Pairs converted: 1, failed: 1" in summary
+    assert "Throughput: 0.50 pairs/s, 50 items/s, 0.50 MiB/s" in summary
+
+
+def test_convert_pair_items(tmp_path):
+    """Test that the number of items of a converted pair is the number of items of its submission"""
+    # GIVEN a folder with a valid pair of files
+    input_dir = tmp_path / "input"
+    _copy_demo_files(input_dir)
+    pair = find_file_pairs(str(input_dir))["batch1/sample1"]
+
+    # WHEN the pair is converted
+    result = convert_pair(
+        "batch1/sample1", pair, str(input_dir), str(tmp_path / "output"), {"assembly": "GRCh37"}
+    )
+
+    # THEN the number of items should be read from the submission
+    assert result["status"] == "converted"
+    with open(result["output"]) as output_file:
+        submission = json.load(output_file)
+    assert result["items"] == len(submission["clinvarSubmission"])
+
+
+def test_main_unreadable_file(tmp_path, capsys, monkeypatch):
+    """Test that a pair whose files can't be read is reported as failed, without stopping the other conversions"""
+    # GIVEN a folder with a valid pair of files and another pair whose Variant file vanishes before it is read
+    input_dir = tmp_path / "input"
+    _copy_demo_files(input_dir)
+    shutil.copy(casedata_snv_csv_path, input_dir / "sample2_CaseData.csv")
+    (input_dir / "sample2_Variant.csv").unlink()
+    monkeypatch.setattr(
+        "preClinVar.cli.find_file_pairs",
+        lambda _: {
+            "batch1/sample1": {
+                "variants": ["batch1/sample1_Variant.csv"],
+                "casedata": ["batch1/sample1_CaseData.csv"],
+            },
+            "sample2": {"variants": ["sample2_Variant.csv"], "casedata": ["sample2_CaseData.csv"]},
+        },
+    )
+
+    # WHEN the folder is converted by 2 processes
+    output_dir = str(tmp_path / "output")
+    exit_code = main(
+        [str(input_dir), "--output-dir", output_dir, "--assembly", "GRCh37", "--processes", "2"]
+    )
+
+    # THEN the pair with the missing file should be reported as failed and the other one converted
+    assert exit_code == 1
+    captured = capsys.readouterr()
+    assert "sample2: FAILED" in captured.err
+    assert "No such file or directory" in captured.err
+    assert "Pairs converted: 1, failed: 1" in captured.out
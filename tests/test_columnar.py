@@ -0,0 +1,141 @@
+import gc
+import io
+
+import pytest
+
+from preClinVar import columnar
+from preClinVar.columnar import (
+    _delimited_file_columns,
+    build_reference_copy_numbers,
+    file_columns_to_submission,
+    normalize_clinsig,
+    paused_gc,
+    read_file_columns,
+)
+from preClinVar.demo import (
+    casedata_old_csv_path,
+    casedata_snv_csv_path,
+    casedata_sv_csv_path,
+    variants_hgvs_csv_path,
+    variants_old_csv_path,
+    variants_sv_breakpoints_csv_path,
+    variants_sv_range_coords_csv_path,
+)
+from preClinVar.demo.generator import generate_submission_files
+from preClinVar.file_parser import _delimited_file_lines, file_fields_to_submission
+from preClinVar.json_stream import dumps
+from preClinVar.offload import ExecutorKind
+
+CASEDATA = (
+    b'"Linking ID","Affected status","Clinical features"\n"L1","yes","HP:1;HP:2"\n"","no",""\n'
+)
+
+
+def convert_with_both_engines(variants_contents, casedata_contents, delimiter=","):
+    """Convert the same files with the rows and the columns engine and return the encoded submissions"""
+    casedata_lines = _delimited_file_lines(casedata_contents, delimiter)
+    rows_submission = file_fields_to_submission(
+        _delimited_file_lines(variants_contents, delimiter), casedata_lines
+    )
+    columns_submission = file_columns_to_submission(
+        *_delimited_file_columns(variants_contents, delimiter), casedata_lines
+    )
+    return dumps(rows_submission), dumps(columns_submission)
+
+
+@pytest.mark.parametrize(
+    "variants_path, casedata_path",
+    [
+        (variants_hgvs_csv_path, casedata_snv_csv_path),
+        (variants_old_csv_path, casedata_old_csv_path),
+        (variants_sv_breakpoints_csv_path, casedata_sv_csv_path),
+        (variants_sv_range_coords_csv_path, casedata_sv_csv_path),
+    ],
+)
+def test_columns_engine_demo_files(variants_path, casedata_path):
+    """Test that the columns engine converts the demo files like the rows engine"""
+    with open(variants_path, "rb") as variants_file, open(casedata_path, "rb") as casedata_file:
+        rows_json, columns_json = convert_with_both_engines(
+            variants_file.read(), casedata_file.read()
+        )
+    assert rows_json == columns_json
+
+
+@pytest.mark.parametrize("delimiter", [",", "\t"])
+def test_columns_engine_generated_files(delimiter):
+    """Test that the columns engine converts synthetic files like the rows engine"""
+    rows_json, columns_json = convert_with_both_engines(
+        *generate_submission_files(200, delimiter=delimiter, seed=1), delimiter
+    )
+    assert rows_json == columns_json
+
+
+def test_build_reference_copy_numbers(caplog):
+    """Test that copy numbers which aren't integers are logged with their value"""
+    columns = {"Reference copy number": ["2", "2", ""], "Copy number": ["3", "x", "4"]}
+    assert build_reference_copy_numbers(columns, 3) == [3, None, None]
+    assert "Error while converting referenceCopyNumber x to int" in caplog.text
+
+
+def test_columns_engine_invalid_values():
+    """Test the columns engine with short and long lines, invalid coordinates and chromosome M"""
+    # GIVEN a Variant file with invalid and missing values, and several variants with the same Linking ID
+    variants_contents = (
+        b'"##Local ID","Linking ID","Clinical significance","Chromosome","Start","Stop","Variant type",'
+        b'"Copy number","Reference copy number","Condition ID type","Condition ID value"\n'
+        b'"1","L1","pathogenic","M","12","x","","3","2","OMIM","1;2"\n'
+        b'"2","L1","Benign","1","5"\n'
+        b"\n"
+        b'"3","","other","chr2","abc","7","Deletion","x","2","HPO","",extra\n'
+    )
+    # WHEN the file is converted by both engines
+    rows_json, columns_json = convert_with_both_engines(variants_contents, CASEDATA)
+
+    # THEN the submissions should be identical
+    assert rows_json == columns_json
+    assert b'"chromosome":"MT"' in columns_json
+
+
+def test_columns_engine_missing_clinsig():
+    """Test that the columns engine raises the same error as the rows engine when clinical significance is missing"""
+    variants_contents = b'"##Local ID","Linking ID","Clinical significance"\n"1","L1",""\n'
+    casedata_lines = _delimited_file_lines(CASEDATA, ",")
+
+    with pytest.raises(AttributeError) as rows_error:
+        file_fields_to_submission(_delimited_file_lines(variants_contents, ","), casedata_lines)
+    with pytest.raises(AttributeError) as columns_error:
+        file_columns_to_submission(*_delimited_file_columns(variants_contents, ","), casedata_lines)
+    assert str(rows_error.value) == str(columns_error.value)
+
+
+def test_read_file_columns():
+    """Test reading a file into columns"""
+    # GIVEN a file with a short line
+    contents = b"a,b\n1,2\n3\n"
+    # THEN missing values should be None
+    assert read_file_columns(io.BytesIO(contents), ",") == (2, {"a": ["1", "3"], "b": ["2", None]})
+
+
+def test_normalize_clinsig():
+    """Test that clinical significance terms are made compliant, ignoring case"""
+    assert normalize_clinsig(["LIKELY Pathogenic", "unknown"]) == ["Likely pathogenic", "unknown"]
+
+
+def test_paused_gc(monkeypatch):
+    """Test that the garbage collector is paused only outside of threads, until the last pause ends"""
+    assert gc.isenabled()
+
+    # GIVEN CPU-bound stages run in threads
+    monkeypatch.setattr(columnar, "CPU_EXECUTOR", ExecutorKind.THREAD)
+    # THEN the collector should not be paused
+    with paused_gc():
+        assert gc.isenabled()
+
+    # GIVEN CPU-bound stages run in processes
+    monkeypatch.setattr(columnar, "CPU_EXECUTOR", ExecutorKind.PROCESS)
+    with paused_gc():
+        # THEN the collector should stay paused until the last pause ends
+        with paused_gc():
+            assert not gc.isenabled()
+        assert not gc.isenabled()
+    assert gc.isenabled()
@@ -0,0 +1,87 @@
+import gzip
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from preClinVar.compression import (
+    CompressionMiddleware,
+    accepted_encoding,
+    load_json,
+    open_decompressed,
+)
+
+
+def test_open_decompressed():
+    """Test reading gzip-compressed and uncompressed files"""
+    assert open_decompressed(io.BytesIO(gzip.compress(b"a,b\n1,2\n"))).read() == b"a,b\n1,2\n"
+    plain_file = io.BytesIO(b"a,b\n")
+    assert open_decompressed(plain_file) is plain_file
+
+
+def test_open_decompressed_zstd():
+    """Test reading zstd-compressed files"""
+    zstandard = pytest.importorskip("zstandard")
+    compressed = zstandard.ZstdCompressor().compress(b"a,b\n1,2\n")
+    assert open_decompressed(io.BytesIO(compressed)).read() == b"a,b\n1,2\n"
+
+
+def test_load_json():
+    """Test parsing compressed json documents"""
+    assert load_json(gzip.compress(b'{"a": 1}')) == {"a": 1}
+    assert load_json(b'{"a": 1}') == {"a": 1}
+
+
+def test_accepted_encoding():
+    """Test choosing the compression of a response from the Accept-Encoding header"""
+    assert accepted_encoding("gzip, deflate") == "gzip"
+    assert accepted_encoding("deflate, gzip;q=0") is None
+    assert accepted_encoding("br") is None
+    assert accepted_encoding("") is None
+
+
+def _create_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("a" * 10)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("a" * 1000)
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a" * 10, b"b" * 10]), media_type="text/plain")
+
+    return app
+
+
+def test_compression_middleware():
+    """Test that responses are compressed above the minimum size, when accepted by the client"""
+    client = TestClient(_create_app())
+    headers = {"Accept-Encoding": "gzip"}
+
+    # Small responses should not be compressed
+    response = client.get("/small", headers=headers)
+    assert "content-encoding" not in response.headers
+
+    # Large responses should be compressed
+    response = client.get("/large", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 1000
+    assert response.text == "a" * 1000
+
+    # Streaming responses should be compressed chunk by chunk
+    response = client.get("/stream", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "a" * 10 + "b" * 10
+
+    # Responses should not be compressed if the client doesn't accept it
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+from preClinVar.fake_clinvar import DEMO_SUBMISSION_ID, create_fake_clinvar_app
+
+HEADERS = {"SP-API-KEY": "test_api_key"}
+ACTIONS_PATH = f"/api/v1/submissions/{DEMO_SUBMISSION_ID}/actions/"
+
+
+def test_fake_clinvar_endpoints():
+    """Test the responses of the fake ClinVar API to the requests sent by the proxy endpoints"""
+    client = TestClient(create_fake_clinvar_app())
+
+    # THEN submissions, test submissions and deletions should be accepted
+    for path in ["/api/v1/submissions/", "/apitest/v1/submissions", "/api/v1/submissions"]:
+        response = client.post(path, headers=HEADERS, json={})
+        assert response.status_code == 201
+        assert response.json() == {"id": DEMO_SUBMISSION_ID}
+    # AND dry-run submissions should return an empty response
+    assert client.post("/api/v1/submissions/?dry-run=true", headers=HEADERS).status_code == 204
+    # AND requests without API key should be rejected
+    assert client.get(ACTIONS_PATH).status_code == 401
+
+
+def test_fake_clinvar_error_rate():
+    """Test that the fake ClinVar API fails a fraction of the requests"""
+
+    # GIVEN a fake ClinVar API failing 30% of the requests
+    client = TestClient(create_fake_clinvar_app(error_rate=0.3, seed=1))
+
+    # WHEN 200 requests are sent
+    status_codes = [client.get(ACTIONS_PATH, headers=HEADERS).status_code for _ in range(200)]
+
+    # THEN about 30% of them should fail with a 503
+    assert set(status_codes) == {200, 503}
+    assert 40 < status_codes.count(503) < 80
+
+
+def test_fake_clinvar_payload_size():
+    """Test that the statuses returned by the fake ClinVar API can be made larger"""
+
+    # GIVEN a fake ClinVar API returning 10kB statuses
+    client = TestClient(create_fake_clinvar_app(payload_size=10000))
+
+    # THEN the status of a submission should contain a message of that size
+    response = client.get(ACTIONS_PATH, headers=HEADERS)
+    assert len(response.content) > 10000
+    assert response.json()["actions"][0]["responses"][0]["message"]["text"] == "x" * 10000
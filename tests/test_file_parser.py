@@ -1,5 +1,12 @@
+import io
+
 from preClinVar.constants import CLNSIG_TERMS, SNV_COORDS, SV_COORDS
 from preClinVar.file_parser import (
+    _csv_file_lines,
+    _tsv_file_lines,
+    file_fields_to_submission,
+    index_casedata_lines,
+    iter_file_lines,
     parse_coords,
     set_item_clin_sig,
     set_item_condition_set,
@@ -102,3 +109,146 @@ def test_parse_coords_snv_m_chrom():
 
     # And chromosome 'M' should be remapped to 'MT'
     assert parsed_variant["chromosome"] == "MT"
+
+
+class IterCountingList(list):
+    """A list that counts how many times it was iterated over"""
+
+    iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return super().__iter__()
+
+
+def test_index_casedata_lines():
+    """Test the function that groups CaseData lines by Linking ID"""
+
+    # GIVEN CaseData lines from 2 variants, with individuals sharing the same variant on non-consecutive lines
+    casedata_lines = [
+        {"Linking ID": "var1", "Individual ID": "ind1"},
+        {"Linking ID": "var2", "Individual ID": "ind2"},
+        {"Linking ID": "var1", "Individual ID": "ind3"},
+    ]
+
+    # WHEN the lines are indexed
+    casedata_index = index_casedata_lines(casedata_lines)
+
+    # THEN lines should be grouped by Linking ID, preserving the original order
+    assert [line["Individual ID"] for line in casedata_index["var1"]] == ["ind1", "ind3"]
+    assert [line["Individual ID"] for line in casedata_index["var2"]] == ["ind2"]
+
+
+def test_file_fields_to_submission_scales_linearly():
+    """Test that the observedIn field of all submission items is created by reading the CaseData lines only once"""
+
+    # GIVEN many variants, each one observed in 2 individuals
+    n_variants = 2000
+    variants_lines = [
+        {
+            "Linking ID": f"var{n}",
+            "Clinical significance": "Pathogenic",
+            "Reference sequence": "NM_000379.4",
+            "HGVS": "c.2751del",
+        }
+        for n in range(n_variants)
+    ]
+    casedata_lines = IterCountingList(
+        {
+            "Linking ID": f"var{n % n_variants}",
+            "Affected status": "yes",
+            "Allele origin": "germline",
+            "Collection method": "clinical testing",
+            "Clinical features": f"HP:{n:07}",
+        }
+        for n in range(n_variants * 2)
+    )
+
+    # WHEN the submission object is created
+    subm_obj = file_fields_to_submission(variants_lines, casedata_lines)
+
+    # THEN the CaseData lines should have been scanned just once, and not once per variant
+    assert casedata_lines.iterations == 1
+
+    # AND each item should contain the expected individuals, in the same order as in the CaseData file
+    for n, item in enumerate(subm_obj["clinvarSubmission"]):
+        assert [obs["clinicalFeatures"] for obs in item["observedIn"]] == [
+            [f"HP:{n:07}"],
+            [f"HP:{n + n_variants:07}"],
+        ]
+
+
+def test_tsv_file_lines_quoted_tab_bom_crlf():
+    """Test the function that parses the contents of a TSV file with BOM, Windows line endings and a quoted tab"""
+
+    # GIVEN the contents of a TSV file
+    contents = (
+        '\ufeff"Linking ID"\tComment\r\nvar1\t"a quoted\ttab"\r\nvar2\tno comment\r\n'.encode(
+            "utf-8"
+        )
+    )
+
+    # WHEN the file is parsed
+    lines = _tsv_file_lines(contents)
+
+    # THEN the lines should contain the expected keys and values
+    assert lines == [
+        {"Linking ID": "var1", "Comment": "a quoted\ttab"},
+        {"Linking ID": "var2", "Comment": "no comment"},
+    ]
+
+
+def test_csv_file_lines_bom_crlf():
+    """Test the function that parses the contents of a CSV file with BOM and Windows line endings"""
+
+    # GIVEN the contents of a CSV file
+    contents = '\ufeffLinking ID,Comment\r\nvar1,"multi\r\nline, comment"\r\n\r\n'.encode("utf-8")
+
+    # WHEN the file is parsed
+    lines = _csv_file_lines(contents)
+
+    # THEN the lines should contain the expected keys and values
+    assert lines == [{"Linking ID": "var1", "Comment": "multi\r\nline, comment"}]
+
+
+def test_csv_file_lines_not_utf8():
+    """Test the function that parses the contents of a CSV file when the file is not a text file"""
+
+    # GIVEN binary content
+    contents = b"Linking ID,Comment\n\xff\xfe\x00\x00"
+
+    # THEN no lines should be returned
+    assert _csv_file_lines(contents) == []
+
+
+class ChunkRecordingFile(io.BytesIO):
+    """A binary file that keeps track of the size of the chunks read from it"""
+
+    def __init__(self, contents):
+        super().__init__(contents)
+        self.read_sizes = []
+
+    def read(self, size=-1):
+        self.read_sizes.append(size)
+        return super().read(size)
+
+
+def test_iter_file_lines_chunks():
+    """Test the function that parses a delimited file while it is read one chunk at a time"""
+
+    # GIVEN a CSV file with non-ASCII characters and a quoted field spanning more lines
+    contents = '\ufeffLinking ID,Comment\r\nvar1,"Åsa\r\nsaid ""hi"""\r\nvar2,ø\r\n'.encode("utf-8")
+    file_obj = ChunkRecordingFile(contents)
+
+    # WHEN the file is parsed reading chunks smaller than its characters and lines
+    lines = list(iter_file_lines(file_obj, delimiter=",", chunk_size=3))
+
+    # THEN the file should have been read in chunks of the given size
+    assert set(file_obj.read_sizes) == {3}
+
+    # AND the lines should be the same as those parsed from the whole file
+    assert lines == _csv_file_lines(contents)
+    assert lines == [
+        {"Linking ID": "var1", "Comment": 'Åsa\r\nsaid "hi"'},
+        {"Linking ID": "var2", "Comment": "ø"},
+    ]
@@ -0,0 +1,67 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from preClinVar.build import build_submission
+from preClinVar.demo.generator import (
+    KIND_SV_BREAKPOINTS,
+    generate_submission_files,
+    generate_variant_lines,
+)
+from preClinVar.file_parser import _csv_file_lines, _tsv_file_lines, file_fields_to_submission
+from preClinVar.validate import validate_submission
+
+
+def test_generate_variant_lines_same_seed():
+    """Test that the generator returns the same lines when called with the same seed"""
+    # GIVEN two sets of variant lines generated with the same seed
+    lines = generate_variant_lines(20, seed=3)
+    # THEN they should be identical
+    assert lines == generate_variant_lines(20, seed=3)
+    # AND differ from lines generated with another seed
+    assert lines != generate_variant_lines(20, seed=4)
+
+
+def test_generate_submission_files_csv():
+    """Test that generated CSV files are converted into a valid submission"""
+    # GIVEN synthetic CSV Variant and CaseData files
+    variants_contents, casedata_contents = generate_submission_files(40, delimiter=",")
+    casedata_lines = _csv_file_lines(casedata_contents)
+
+    # THEN several individuals should share the same Linking ID
+    assert max(Counter(line["Linking ID"] for line in casedata_lines).values()) > 1
+
+    # WHEN the files are converted into a submission
+    submission = file_fields_to_submission(_csv_file_lines(variants_contents), casedata_lines)
+    build_submission(submission, SimpleNamespace(query_params={"assembly": "GRCh37"}))
+
+    # THEN the submission should contain one item for each variant
+    items = submission["clinvarSubmission"]
+    assert len(items) == 40
+    # AND variants should be described by HGVS, coordinates, breakpoints and range coordinates
+    variants = [item["variantSet"]["variant"][0] for item in items]
+    assert any("hgvs" in variant for variant in variants)
+    coords = [variant["chromosomeCoordinates"] for variant in variants if "hgvs" not in variant]
+    assert any("start" in coord and "variantType" not in coord for coord in coords)
+    assert any("innerStart" in coord for coord in coords)
+    # AND all individuals should be observed in their variant
+    assert sum(len(item["observedIn"]) for item in items) == len(casedata_lines)
+    # AND the submission should be valid
+    assert validate_submission(submission, processes=1) == (True, [])
+
+
+def test_generate_submission_files_tsv():
+    """Test that generated TSV files contain only the variant types requested"""
+    # GIVEN synthetic TSV files containing only SVs with breakpoints
+    variants_contents, casedata_contents = generate_submission_files(
+        10, delimiter="\t", kinds=[KIND_SV_BREAKPOINTS], max_individuals=1
+    )
+
+    # WHEN the files are converted into a submission
+    submission = file_fields_to_submission(
+        _tsv_file_lines(variants_contents), _tsv_file_lines(casedata_contents)
+    )
+
+    # THEN all variants should be SVs with one individual each
+    for item in submission["clinvarSubmission"]:
+        assert "hgvs" not in item["variantSet"]["variant"][0]
+        assert len(item["observedIn"]) == 1
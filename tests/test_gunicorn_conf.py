@@ -0,0 +1,49 @@
+import gc
+import logging
+from types import SimpleNamespace
+
+from preClinVar import gunicorn_conf
+from preClinVar.validate import get_compiled_validator, get_document_validator
+from preClinVar.vocabulary import get_vocabularies
+
+
+def _server(preload_app: bool) -> SimpleNamespace:
+    """Gunicorn master process, as passed to the server hooks"""
+    return SimpleNamespace(
+        cfg=SimpleNamespace(preload_app=preload_app), log=logging.getLogger("gunicorn.error")
+    )
+
+
+def test_when_ready_preload():
+    """Test that the shared state is built and frozen by the master process when the app is preloaded"""
+
+    # GIVEN caches of the validators and lookup tables which are empty
+    get_document_validator.cache_clear()
+    get_vocabularies.cache_clear()
+
+    # WHEN the master process is ready to fork the workers of a preloaded app
+    try:
+        gunicorn_conf.when_ready(_server(preload_app=True))
+
+        # THEN validators and lookup tables should be built
+        assert get_document_validator.cache_info().currsize == 1
+        assert get_compiled_validator.cache_info().currsize == 1
+        assert get_vocabularies.cache_info().currsize == 1
+        # AND moved to the permanent generation of the garbage collector
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_when_ready_without_preload():
+    """Test that nothing is built by the master process when the app is not preloaded"""
+
+    # GIVEN an empty cache of the lookup tables
+    get_vocabularies.cache_clear()
+
+    # WHEN the master process is ready to fork the workers, which load the app themselves
+    gunicorn_conf.when_ready(_server(preload_app=False))
+
+    # THEN the lookup tables should not be built
+    assert get_vocabularies.cache_info().currsize == 0
+    assert gc.get_freeze_count() == 0
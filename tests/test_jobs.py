@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+from fastapi.responses import Response
+
+from preClinVar.jobs import (
+    JobManager,
+    JobStatus,
+    QueueFullError,
+    progress_callback,
+    report_progress,
+    track_rows,
+)
+
+
+def test_job_progress():
+    """Test that a job reports its progress and stores its result"""
+    # GIVEN a job manager
+    manager = JobManager(max_workers=1, max_queued=1)
+
+    def run():
+        list(track_rows(range(3), "rows_parsed"))
+        report_progress(stage="validate")
+        progress_callback("items_validated")(3)
+        return Response(content=b"{}", media_type="application/json")
+
+    # WHEN a job is run
+    job = manager.submit("test", run)
+    manager._executor.shutdown(wait=True)
+
+    # THEN its progress and result should be available
+    job = manager.get(job.id)
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.progress == {"rows_parsed": 3, "stage": "validate", "items_validated": 3}
+    assert job.to_dict()["result_status_code"] == 200
+    assert job.response.body == b"{}"
+
+
+def test_progress_outside_job():
+    """Test that progress helpers do nothing when not called from a job"""
+    rows = [1, 2]
+    assert track_rows(rows, "rows_parsed") is rows
+    assert progress_callback("items_validated") is None
+    report_progress(stage="validate")
+
+
+def test_job_failed():
+    """Test that a job raising an exception or returning an error response is failed"""
+    # GIVEN a job manager
+    manager = JobManager(max_workers=1, max_queued=2)
+
+    def raise_error():
+        raise ValueError("boom")
+
+    def return_error():
+        return Response(status_code=400)
+
+    # WHEN the jobs are run
+    jobs = [manager.submit("test", raise_error), manager.submit("test", return_error)]
+    manager._executor.shutdown(wait=True)
+
+    # THEN they should be failed
+    assert [job.status for job in jobs] == [JobStatus.FAILED, JobStatus.FAILED]
+    assert [job.response.status_code for job in jobs] == [500, 400]
+
+
+def test_job_queue_full():
+    """Test that jobs are rejected when the queue is full"""
+    # GIVEN a job manager running a job and with a full queue
+    manager = JobManager(max_workers=1, max_queued=1)
+    release = threading.Event()
+    started = threading.Event()
+    cleaned = []
+
+    def wait_release():
+        started.set()
+        release.wait(5)
+        return Response()
+
+    manager.submit("test", wait_release)
+    started.wait(5)
+    queued_job = manager.submit("test", wait_release, cleanup=lambda: cleaned.append(True))
+    assert queued_job.status == JobStatus.QUEUED
+
+    # THEN a new job should be rejected
+    with pytest.raises(QueueFullError):
+        manager.submit("test", wait_release)
+
+    # AND accepted jobs should be run once the running job finishes
+    release.set()
+    manager._executor.shutdown(wait=True)
+    assert queued_job.status == JobStatus.SUCCEEDED
+    assert cleaned == [True]
+
+
+def test_job_expired():
+    """Test that finished jobs are removed after their time to live"""
+    # GIVEN a job manager keeping results for 0 seconds
+    manager = JobManager(max_workers=1, max_queued=1, result_ttl=-1)
+    job = manager.submit("test", Response)
+    manager._executor.shutdown(wait=True)
+
+    # THEN the finished job should not be found
+    assert manager.get(job.id) is None
+
+
+def test_job_results_max_bytes():
+    """Test that the oldest results are removed when the results of the finished jobs exceed their maximum size"""
+    # GIVEN a job manager keeping at most 10 bytes of results
+    manager = JobManager(max_workers=1, max_queued=3, results_max_bytes=10)
+
+    # WHEN 3 jobs returning 4 bytes each are run
+    jobs = [manager.submit("test", lambda: Response(content=b"1234")) for _ in range(3)]
+    manager._executor.shutdown(wait=True)
+
+    # THEN the result of the oldest job should be removed
+    assert manager.get(jobs[0].id) is None
+    assert [manager.get(job.id) for job in jobs[1:]] == jobs[1:]
+
+
+def test_job_cancelled_on_shutdown():
+    """Test that queued jobs are cancelled when the job manager is shut down"""
+    # GIVEN a job manager running a job, with another job queued
+    manager = JobManager(max_workers=1, max_queued=1)
+    release = threading.Event()
+    started = threading.Event()
+    cleaned = []
+
+    def wait_release():
+        started.set()
+        release.wait(5)
+        return Response()
+
+    running_job = manager.submit("test", wait_release)
+    started.wait(5)
+    queued_job = manager.submit("test", Response, cleanup=lambda: cleaned.append(True))
+
+    # WHEN the manager is shut down
+    manager.shutdown()
+    release.set()
+
+    # THEN the queued job should be cancelled and its files cleaned up
+    assert queued_job.status == JobStatus.CANCELLED
+    assert queued_job.to_dict()["result_status_code"] == 503
+    assert cleaned == [True]
+    # AND the running job should not be cancelled
+    assert running_job.status != JobStatus.CANCELLED
@@ -0,0 +1,26 @@
+import json
+
+from preClinVar import json_stream
+from preClinVar.demo import germline_subm_json_path
+from preClinVar.json_stream import iter_submission_json
+
+
+def test_iter_submission_json(monkeypatch):
+    """Test the function that encodes a submission object one piece at a time, with and without orjson."""
+
+    # GIVEN a submission object with several items
+    with open(germline_subm_json_path) as json_file:
+        submission_dict = json.load(json_file)
+    submission_dict["germlineSubmission"] = submission_dict["germlineSubmission"] * 10
+
+    for orjson_lib in [json_stream.orjson, None]:
+        monkeypatch.setattr(json_stream, "orjson", orjson_lib)
+
+        # WHEN the submission is encoded in small chunks
+        chunks = list(iter_submission_json(submission_dict, chunk_size=100))
+
+        # THEN more chunks should be created
+        assert len(chunks) > 10
+
+        # AND together they should contain the encoded submission
+        assert json.loads(b"".join(chunks)) == submission_dict
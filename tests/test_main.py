@@ -1,12 +1,19 @@
+import asyncio
 import copy
 import csv
+import gzip
+import io
 import json
+import threading
+import zipfile
 from tempfile import NamedTemporaryFile
 
-import responses
+import httpx
 from fastapi.testclient import TestClient
 
+from preClinVar import main
 from preClinVar.__version__ import VERSION
+from preClinVar.cache import conversion_cache
 from preClinVar.constants import DRY_RUN_SUBMISSION_URL, SUBMISSION_URL, VALIDATE_SUBMISSION_URL
 from preClinVar.demo import (
     casedata_old_csv,
@@ -25,6 +32,7 @@ from preClinVar.demo import (
     variants_sv_range_coords_csv,
     variants_sv_range_coords_csv_path,
 )
+from preClinVar.demo.generator import generate_submission_files
 from preClinVar.main import app
 
 client = TestClient(app)
@@ -86,6 +94,38 @@ def test_csv_2_json_malformed_file():
     assert response.json()["message"]
 
 
+def test_csv_2_json_not_a_text_file():
+    """Test the endpoint that converts 2 cvs files (CaseData.csv, Variant.csv)
+    into one json API submission object, when one of the files can't be decoded"""
+
+    # GIVEN a POST request with a CaseData file that is not a text file
+    files = [
+        ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+        ("files", (casedata_snv_csv, b"Linking ID,Individual ID\n\xff\xfe\x00\x01")),
+    ]
+    response = client.post("/csv_2_json", files=files)
+
+    # THEN the endpoint should return error with the name of the malformed file
+    assert response.status_code == 400
+    assert response.json()["message"] == f"Malformed file {casedata_snv_csv}"
+
+
+def test_csv_2_json_no_lines():
+    """Test the endpoint that converts 2 cvs files (CaseData.csv, Variant.csv)
+    into one json API submission object, when one of the files contains no lines"""
+
+    # GIVEN a POST request with a CaseData file containing only a header
+    files = [
+        ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+        ("files", (casedata_snv_csv, b"Linking ID,Individual ID\n")),
+    ]
+    response = client.post("/csv_2_json", files=files)
+
+    # THEN the endpoint should return error with the name of the malformed file
+    assert response.status_code == 400
+    assert response.json()["message"] == f"Malformed file {casedata_snv_csv}"
+
+
 def test_csv_2_json_old_format():
     """Test the function that sends a request to the app to convert 2 cvs files (CaseData.csv, Variant.csv)
     into one json API submission object. Variant files contain 4 SNV with HGVS descriptors.
@@ -151,7 +191,7 @@ def test_tsv_2_json_old_format():
 
         # THEN the response should be successful (code 200)
         response = client.post("/tsv_2_json", params=OPTIONAL_PARAMETERS, files=files)
-        # assert response.status_code == 200
+        assert response.status_code == 200
 
         # AND it should be a json object with the expected fields
         json_resp = response.json()
@@ -270,16 +310,15 @@ def test_dry_run_wrong_api_key():
     assert response.json()["message"] == "No valid API key provided"
 
 
-@responses.activate
-def test_dry_run():
+def test_dry_run(mock_clinvar):
     """Test the dry_run API proxy endpoint (with a mocked ClinVar API response)"""
 
     # GIVEN a json submission file
     json_file = {"json_file": open(germline_subm_json_path, "rb")}
 
     # AND a mocked ClinVar API
-    responses.add(
-        responses.POST,
+    mock_clinvar.add(
+        "POST",
         DRY_RUN_SUBMISSION_URL,
         status=204,  # The ClinVar API returns 204 (no content) when a dry-run submission was successful and no submission was created
     )
@@ -290,16 +329,15 @@ def test_dry_run():
     assert response.json()["message"] == "success"
 
 
-@responses.activate
-def test_apitest_wrong_api_key():
+def test_apitest_wrong_api_key(mock_clinvar):
     """Test the apitest API proxy endpoint without a valid ClinVar API key"""
 
     # GIVEN a json submission file
     json_file = {"json_file": open(germline_subm_json_path, "rb")}
 
     # AND a mocked ClinVar API
-    responses.add(
-        responses.POST,
+    mock_clinvar.add(
+        "POST",
         VALIDATE_SUBMISSION_URL,
         json={"message": "No valid API key provided"},
         status=401,  # The ClinVar API returs code 201 when request is successful (created)
@@ -312,16 +350,15 @@ def test_apitest_wrong_api_key():
     assert response.json()["message"] == "No valid API key provided"
 
 
-@responses.activate
-def test_apitest():
+def test_apitest(mock_clinvar):
     """Tests the endpoint apitest, a proxy to ClinVar apitest, with a mocked ClinVar API response."""
 
     # GIVEN a json submission file
     json_file = {"json_file": open(germline_subm_json_path, "rb")}
 
     # AND a mocked ClinVar API
-    responses.add(
-        responses.POST,
+    mock_clinvar.add(
+        "POST",
         VALIDATE_SUBMISSION_URL,
         json={"id": DEMO_SUBMISSION_ID},
         status=201,  # The ClinVar API returs code 201 when request is successful (created)
@@ -348,8 +385,7 @@ def test_validate():
     assert response.json()["message"] == "Validation OK"
 
 
-@responses.activate
-def test_apitest_status():
+def test_apitest_status(mock_clinvar):
     """Test the endpoint that sends GET requests to the apitest actions ClinVar endpoint."""
 
     # GIVEN a mocked error response from apitest actions endpoint
@@ -378,8 +414,8 @@ def test_apitest_status():
         }
     ]
 
-    responses.add(
-        responses.GET,
+    mock_clinvar.add(
+        "GET",
         f"{VALIDATE_SUBMISSION_URL}/{DEMO_SUBMISSION_ID}/actions/",
         json={"actions": actions},
         status=200,
@@ -396,8 +432,7 @@ def test_apitest_status():
     assert response.json()["actions"][0]["responses"][0]["files"]
 
 
-@responses.activate
-def test_status_submitted():
+def test_status_submitted(mock_clinvar):
     """Test the status endpoint, proxy to the https://submit.ncbi.nlm.nih.gov/api/v1/submissions/SUBnnnnnn/actions ClinVar endpoint."""
 
     # GIVEN a mocked submitted response from ClinVar:
@@ -411,8 +446,8 @@ def test_status_submitted():
         }
     ]
 
-    responses.add(
-        responses.GET,
+    mock_clinvar.add(
+        "GET",
         f"{SUBMISSION_URL}/{DEMO_SUBMISSION_ID}/actions/",
         json={"actions": actions},
         status=200,
@@ -428,13 +463,12 @@ def test_status_submitted():
     assert response.json()["actions"][0]["status"] == "submitted"
 
 
-@responses.activate
-def test_delete():
+def test_delete(mock_clinvar):
     """Test the endpoint that deletes ClinVar submissions sing the API."""
 
     # GIVEN a mocked submitted response from ClinVar:
-    responses.add(
-        responses.POST,
+    mock_clinvar.add(
+        "POST",
         SUBMISSION_URL,
         json={"id": DEMO_SUBMISSION_ID},
         status=201,
@@ -448,3 +482,627 @@ def test_delete():
     # THEN the response should contain the provided status
     assert response.status_code == 201
     assert response.json()["id"] == DEMO_SUBMISSION_ID
+
+
+def test_proxy_endpoints_request_failed(mock_clinvar):
+    """Test that the proxy endpoints return a 502 error when the ClinVar API can't be reached"""
+
+    # GIVEN a ClinVar API which can't be reached (no mocked response)
+    with open(germline_subm_json_path, "rb") as json_file:
+        json_submission = json_file.read()
+
+    # WHEN the proxy endpoints are called
+    responses = [
+        client.post(
+            "/apitest",
+            data={"api_key": DEMO_API_KEY},
+            files={"json_file": ("subm.json", json_submission)},
+        ),
+        client.post(
+            "/dry-run",
+            data={"api_key": DEMO_API_KEY},
+            files={"json_file": ("subm.json", json_submission)},
+        ),
+        client.post("/status", data={"api_key": DEMO_API_KEY, "submission_id": DEMO_SUBMISSION_ID}),
+        client.post(
+            "/apitest-status",
+            data={"api_key": DEMO_API_KEY, "submission_id": DEMO_SUBMISSION_ID},
+        ),
+        client.post(
+            "/delete", data={"api_key": DEMO_API_KEY, "clinvar_accession": DEMO_ACCESSION_ID}
+        ),
+    ]
+
+    # THEN they should all return a 502 error, as the batch endpoints
+    for response in responses:
+        assert response.status_code == 502
+        assert response.json()["message"].startswith("ClinVar API request failed")
+
+
+def test_proxy_endpoints_non_json_response(mock_clinvar):
+    """Test that responses of the ClinVar API which are not json, for instance HTML error pages, are returned as a message"""
+
+    # GIVEN a ClinVar API returning an HTML error page
+    mock_clinvar.add("POST", SUBMISSION_URL, text="<html>Bad Gateway</html>", status=400)
+
+    # WHEN a submission is deleted
+    response = client.post(
+        "/delete", data={"api_key": DEMO_API_KEY, "clinvar_accession": DEMO_ACCESSION_ID}
+    )
+
+    # THEN the error page should be returned in the message of the response
+    assert response.status_code == 400
+    assert response.json() == {"message": "<html>Bad Gateway</html>"}
+
+
+def test_proxy_calls_overlap(fake_clinvar):
+    """Test that concurrent requests to a proxy endpoint are forwarded to the ClinVar API at the same time,
+    using a local stand-in for the ClinVar API which is slow to respond."""
+
+    # GIVEN a ClinVar API which takes some time to respond
+    fake_app = fake_clinvar(latency=0.2)
+
+    # WHEN the status of several submissions is requested to preClinVar at the same time
+    async def send_status_requests(n_requests):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://testserver"
+        ) as async_client:
+            return await asyncio.gather(
+                *[
+                    async_client.post(
+                        "/status", data={"api_key": DEMO_API_KEY, "submission_id": f"SUB{i}"}
+                    )
+                    for i in range(n_requests)
+                ]
+            )
+
+    status_responses = asyncio.run(send_status_requests(5))
+
+    # THEN all requests should be successful
+    for response in status_responses:
+        assert response.status_code == 200
+        assert response.json()["actions"][0]["status"] == "submitted"
+
+    # AND the ClinVar API should have been serving them at the same time
+    assert fake_app.state.max_in_flight == 5
+
+
+def test_status_lookups_coalesced(fake_clinvar):
+    """Test that concurrent requests for the status of the same submission are sent once to the ClinVar API,
+    and that the status is then returned from the cache."""
+
+    # GIVEN a ClinVar API which takes some time to respond
+    fake_app = fake_clinvar(latency=0.2)
+
+    data = {"api_key": DEMO_API_KEY, "submission_id": DEMO_SUBMISSION_ID}
+    client = TestClient(app)
+    stats_before = client.get("/status-cache").json()
+
+    async def send_status_requests(endpoint, n_requests):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://testserver"
+        ) as async_client:
+            return await asyncio.gather(
+                *[async_client.post(endpoint, data=data) for _ in range(n_requests)]
+            )
+
+    # WHEN the status of a submission is requested 5 times at the same time
+    status_responses = asyncio.run(send_status_requests("/status", 5))
+
+    # THEN all requests should receive the status, retrieved with a single request to the API
+    for response in status_responses:
+        assert response.status_code == 200
+        assert response.json()["actions"][0]["status"] == "submitted"
+    assert fake_app.state.requests == 1
+
+    # WHEN the status is requested again
+    assert asyncio.run(send_status_requests("/status", 1))[0].status_code == 200
+    # THEN it should be returned from the cache
+    assert fake_app.state.requests == 1
+
+    # WHEN the status of the test submission with the same ID is requested
+    assert asyncio.run(send_status_requests("/apitest-status", 1))[0].status_code == 200
+    # THEN it should be retrieved from the test API
+    assert fake_app.state.requests == 2
+
+    # AND the lookups should be counted in the statistics of the cache
+    stats = client.get("/status-cache").json()
+    assert stats["hits"] == stats_before["hits"] + 1
+    assert stats["coalesced"] == stats_before["coalesced"] + 4
+
+
+def test_status_batch(mock_clinvar):
+    """Test the endpoint returning the status of several submissions, when one of the submissions can't be retrieved."""
+
+    # GIVEN a mocked ClinVar API returning the status of one submission and an error for another
+    mock_clinvar.add(
+        "GET",
+        f"{SUBMISSION_URL}/{DEMO_SUBMISSION_ID}/actions/",
+        json={"actions": [{"id": f"{DEMO_SUBMISSION_ID}-1", "status": "processed"}]},
+        status=200,
+    )
+    mock_clinvar.add(
+        "GET",
+        f"{SUBMISSION_URL}/SUB00000000/actions/",
+        json={"message": "Submission not found"},
+        status=404,
+    )
+
+    # GIVEN a call to the status-batch endpoint with 3 submission IDs, the last one not reachable
+    response = client.post(
+        "/status-batch",
+        data={
+            "api_key": DEMO_API_KEY,
+            "submission_ids": [DEMO_SUBMISSION_ID, "SUB00000000", "SUB11111111"],
+        },
+    )
+
+    # THEN the response should contain the results for each submission, keyed by ID
+    assert response.status_code == 200
+    results = response.json()
+    assert list(results) == [DEMO_SUBMISSION_ID, "SUB00000000", "SUB11111111"]
+    assert results[DEMO_SUBMISSION_ID]["status_code"] == 200
+    assert results[DEMO_SUBMISSION_ID]["actions"][0]["status"] == "processed"
+    assert results["SUB00000000"]["status_code"] == 404
+    assert results["SUB00000000"]["error"]["message"] == "Submission not found"
+    assert results["SUB11111111"]["status_code"] == 502
+    assert results["SUB11111111"]["error"]["message"]
+
+
+def test_apitest_status_batch_concurrency(fake_clinvar):
+    """Test that the apitest-status-batch endpoint doesn't send more concurrent requests to the ClinVar API than requested."""
+
+    # GIVEN a ClinVar API which takes some time to respond
+    fake_app = fake_clinvar(latency=0.05)
+
+    # WHEN the status of 6 submissions is requested with a maximum of 2 concurrent requests
+    submission_ids = [f"SUB0000000{n}" for n in range(6)]
+    response = client.post(
+        "/apitest-status-batch",
+        data={"api_key": DEMO_API_KEY, "submission_ids": submission_ids, "max_concurrency": 2},
+    )
+
+    # THEN the status of all submissions should be returned
+    assert response.status_code == 200
+    for submission_id in submission_ids:
+        assert response.json()[submission_id]["actions"][0]["id"] == f"{submission_id}-1"
+
+    # AND the ClinVar API should have received at most 2 requests at a time
+    assert fake_app.state.max_in_flight == 2
+
+
+def test_apitest_chunks(fake_clinvar):
+    """Test the apitest endpoint when the submission is split into chunks sent in parallel."""
+
+    # GIVEN a ClinVar API which takes some time to respond
+    fake_app = fake_clinvar(latency=0.05)
+
+    # GIVEN a submission containing 5 items
+    with open(germline_subm_json_path) as json_file:
+        submission_obj = json.load(json_file)
+    submission_obj["germlineSubmission"] = submission_obj["germlineSubmission"][:1] * 5
+
+    # WHEN it is sent to the apitest endpoint in chunks of 2 items
+    response = client.post(
+        "/apitest",
+        data={"api_key": DEMO_API_KEY, "chunk_size": 2},
+        files={"json_file": ("submission.json", json.dumps(submission_obj))},
+    )
+
+    # THEN the response should contain a submission ID for each of the 3 chunks
+    assert response.status_code == 201
+    chunks = response.json()["chunks"]
+    assert [chunk["first_item"] for chunk in chunks] == [0, 2, 4]
+    for chunk in chunks:
+        assert chunk["status_code"] == 201
+        assert chunk["id"]
+
+    # AND the chunks should have been sent in parallel
+    assert fake_app.state.max_in_flight == 3
+
+
+def test_dry_run_chunks(mock_clinvar):
+    """Test the dry-run endpoint when the submission is split into chunks and one of them is not accepted."""
+
+    # GIVEN a mocked ClinVar API not accepting the submission
+    mock_clinvar.add(
+        "POST",
+        DRY_RUN_SUBMISSION_URL,
+        json={"message": "Submission contains errors"},
+        status=400,
+    )
+
+    # GIVEN a submission containing 3 items
+    with open(germline_subm_json_path) as json_file:
+        submission_obj = json.load(json_file)
+    submission_obj["germlineSubmission"] = submission_obj["germlineSubmission"][:1] * 3
+
+    # WHEN it is sent to the dry-run endpoint in chunks of 2 items
+    response = client.post(
+        "/dry-run",
+        data={"api_key": DEMO_API_KEY, "chunk_size": 2},
+        files={"json_file": ("submission.json", json.dumps(submission_obj))},
+    )
+
+    # THEN the errors for each chunk should be returned
+    assert response.status_code == 400
+    for chunk in response.json()["chunks"]:
+        assert chunk["error"]["message"] == "Submission contains errors"
+
+
+def test_dry_run_chunk_max_bytes(mock_clinvar):
+    """Test the dry-run endpoint when the submission is split into chunks not exceeding a size."""
+
+    # GIVEN a mocked ClinVar API accepting the submissions
+    mock_clinvar.add("POST", DRY_RUN_SUBMISSION_URL, status=204)
+
+    # GIVEN a submission containing 4 items
+    with open(germline_subm_json_path) as json_file:
+        submission_obj = json.load(json_file)
+    submission_obj["germlineSubmission"] = submission_obj["germlineSubmission"][:1] * 4
+    item_size = len(json.dumps(submission_obj["germlineSubmission"][0]))
+
+    # WHEN it is sent to the dry-run endpoint with request bodies big enough for 2 items
+    response = client.post(
+        "/dry-run",
+        data={"api_key": DEMO_API_KEY, "chunk_max_bytes": 2 * item_size + 500},
+        files={"json_file": ("submission.json", json.dumps(submission_obj))},
+    )
+
+    # THEN the submission should be sent in 2 chunks of 2 items
+    assert response.status_code == 200
+    assert [chunk["first_item"] for chunk in response.json()["chunks"]] == [0, 2]
+
+
+def test_csv_2_json_stream():
+    """Test the csv_2_json endpoint when the submission is returned by a streaming response"""
+
+    # GIVEN a request to convert a Variant and a CaseData file
+    def post_files(params):
+        files = [
+            ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+            ("files", (casedata_snv_csv, open(casedata_snv_csv_path, "rb"))),
+        ]
+        return client.post("/csv_2_json", params=params, files=files)
+
+    # WHEN the streaming response is requested
+    stream_params = copy.deepcopy(OPTIONAL_PARAMETERS)
+    stream_params["stream"] = "true"
+    response = post_files(stream_params)
+
+    # THEN it should contain the same submission returned without streaming
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == post_files(OPTIONAL_PARAMETERS).json()
+
+
+def test_validate_first_error():
+    """Test the endpoint that validates a json submission when validation stops at the first error."""
+
+    # GIVEN a json submission file with 2 errors
+    with open(germline_subm_json_path) as json_file:
+        submission_obj = json.load(json_file)
+    submission_obj["germlineSubmission"][0]["recordStatus"] = "unknown"
+    submission_obj["submissionName"] = 1
+
+    # GIVEN a call to the validate endpoint, requesting only the first error
+    response = client.post(
+        "/validate",
+        params={"validation_mode": "first"},
+        files={"json_file": ("submission.json", json.dumps(submission_obj))},
+    )
+
+    # THEN only the first error should be returned
+    assert response.status_code == 400
+    assert (
+        response.json()["message"]
+        == "Validation returned the following errors: [\"1 is not of type 'string'\"]"
+    )
+
+
+def test_csv_2_json_cache():
+    """Test that the csv_2_json endpoint returns cached submissions when the same files and parameters are posted again"""
+
+    # GIVEN an empty cache of converted submissions
+    conversion_cache.clear()
+    hits = conversion_cache.hits
+
+    def post_files(params):
+        files = [
+            ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+            ("files", (casedata_snv_csv, open(casedata_snv_csv_path, "rb"))),
+        ]
+        return client.post("/csv_2_json", params=params, files=files)
+
+    # WHEN the same files are converted twice
+    first_response = post_files(OPTIONAL_PARAMETERS)
+    second_response = post_files(OPTIONAL_PARAMETERS)
+
+    # THEN the second response should come from the cache and contain the same submission
+    assert second_response.status_code == 200
+    assert second_response.json() == first_response.json()
+    assert conversion_cache.hits == hits + 1
+
+    # WHEN the same files are converted with a different submission name
+    other_params = copy.deepcopy(OPTIONAL_PARAMETERS)
+    other_params["submissionName"] = "SUB5678"
+    third_response = post_files(other_params)
+
+    # THEN a new submission should be created
+    assert third_response.json()["submissionName"] == "SUB5678"
+    assert conversion_cache.hits == hits + 1
+    assert client.get("/conversion-cache").json()["entries"] == 2
+
+
+def test_csv_2_json_server_timing():
+    """Test that the csv_2_json endpoint reports the duration of the conversion stages"""
+
+    # GIVEN a Variant and a CaseData file which were never converted before
+    conversion_cache.clear()
+    files = [
+        ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+        ("files", (casedata_snv_csv, open(casedata_snv_csv_path, "rb"))),
+    ]
+
+    # WHEN the files are converted
+    response = client.post("/csv_2_json", params=OPTIONAL_PARAMETERS, files=files)
+    assert response.status_code == 200
+
+    # THEN the response should contain the duration of each stage in its Server-Timing header
+    server_timing = response.headers["Server-Timing"]
+    for stage in [
+        "parse_casedata",
+        "parse_variants",
+        "build_items",
+        "build_submission",
+        "validate",
+        "serialize",
+    ]:
+        assert f"{stage};dur=" in server_timing
+
+    # AND the durations should be exported by the metrics endpoint
+    metrics = client.get("/metrics").text
+    assert 'preclinvar_stage_duration_seconds_count{stage="validate"}' in metrics
+    assert 'preclinvar_stage_rows_total{stage="parse_variants"}' in metrics
+
+
+def test_metrics_clinvar_api(mock_clinvar):
+    """Test that latency and status codes of the ClinVar API responses are exported by the metrics endpoint"""
+
+    # GIVEN a mocked ClinVar API returning the status of a submission
+    mock_clinvar.add(
+        "GET",
+        f"{SUBMISSION_URL}/{DEMO_SUBMISSION_ID}/actions/",
+        json={"actions": [{"status": "processed"}]},
+        status=200,
+    )
+
+    # WHEN the status of the submission is requested
+    response = client.post(
+        "/status", data={"api_key": DEMO_API_KEY, "submission_id": DEMO_SUBMISSION_ID}
+    )
+
+    # THEN the response should contain the duration of the ClinVar API request
+    assert "clinvar_api;dur=" in response.headers["Server-Timing"]
+
+    # AND the metrics should contain the request, with submission ID replaced by a placeholder
+    metrics = client.get("/metrics").text
+    assert (
+        'preclinvar_clinvar_api_responses_total{method="GET",endpoint="/api/v1/submissions/{submission_id}/actions/",status_code="200"}'
+        in metrics
+    )
+
+
+def test_csv_2_json_columns_engine():
+    """Test that the csv_2_json endpoint creates the same submission with the columns engine"""
+
+    # GIVEN an empty cache of converted submissions
+    conversion_cache.clear()
+
+    def post_files(engine):
+        files = [
+            (
+                "files",
+                (variants_sv_range_coords_csv, open(variants_sv_range_coords_csv_path, "rb")),
+            ),
+            ("files", (casedata_sv_csv, open(casedata_sv_csv_path, "rb"))),
+        ]
+        params = {"assembly": "GRCh37", "engine": engine}
+        return client.post("/csv_2_json", params=params, files=files)
+
+    # WHEN the same files are converted by the two engines
+    rows_response = post_files("rows")
+    conversion_cache.clear()
+    columns_response = post_files("columns")
+
+    # THEN the responses should be identical
+    assert columns_response.status_code == 200
+    assert columns_response.content == rows_response.content
+
+
+def test_csv_2_json_invalid_values():
+    """Test that invalid values of controlled fields are reported by row, with both conversion engines"""
+
+    # GIVEN a CaseData file with an invalid affected status
+    casedata_lines = list(csv.DictReader(open(casedata_snv_csv_path)))
+    casedata_lines[0]["Affected status"] = "maybe"
+    casedata_contents = io.StringIO()
+    writer = csv.DictWriter(casedata_contents, fieldnames=list(casedata_lines[0]))
+    writer.writeheader()
+    writer.writerows(casedata_lines)
+
+    for engine in ["rows", "columns"]:
+        conversion_cache.clear()
+        files = [
+            ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+            ("files", (casedata_snv_csv, casedata_contents.getvalue().encode())),
+        ]
+        # WHEN the files are converted
+        response = client.post("/csv_2_json", params={"engine": engine}, files=files)
+
+        # THEN the invalid value should be reported with its row
+        assert response.status_code == 400
+        message = response.json()["message"]
+        assert "CaseData file, row 1: 'maybe' is not a valid Affected status" in message
+        # AND the accepted values of the field should be listed once
+        assert message.count("Accepted values of Affected status") == 1
+
+
+def test_csv_2_json_job():
+    """Test converting files in a background job, then retrieving its status and result"""
+
+    # GIVEN an empty cache of converted submissions
+    conversion_cache.clear()
+    files = [
+        ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+        ("files", (casedata_snv_csv, open(casedata_snv_csv_path, "rb"))),
+    ]
+
+    # WHEN the files are sent to the jobs endpoint
+    response = client.post("/jobs/csv_2_json", files=files)
+
+    # THEN a job ID should be returned immediately
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status_url"] == f"/jobs/{job_id}"
+
+    # AND the status of the job should be available until it is finished
+    job_status = response.json()
+    while job_status["status"] in ["queued", "running"]:
+        job_status = client.get(f"/jobs/{job_id}", params={"wait": 1}).json()
+    assert job_status["status"] == "succeeded"
+    assert job_status["progress"]["rows_parsed"] == 1
+    assert job_status["progress"]["items_built"] == 1
+    assert job_status["progress"]["items_validated"] == 1
+
+    # AND the result should be the converted submission
+    result = client.get(f"/jobs/{job_id}/result")
+    assert result.status_code == 200
+    assert result.json()["clinvarSubmission"][0]["variantSet"]
+
+
+def test_csv_2_json_job_missing_file():
+    """Test that jobs are not created when a file is missing"""
+    files = [("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb")))]
+    response = client.post("/jobs/csv_2_json", files=files)
+    assert response.status_code == 400
+
+
+def test_job_not_found():
+    """Test the response to status and result requests for unknown jobs"""
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.get("/jobs/unknown/result").status_code == 404
+
+
+def test_csv_2_json_heartbeat_responsive(monkeypatch):
+    """Test that the heartbeat endpoint responds while a conversion is running"""
+
+    # GIVEN a conversion stage blocked until the heartbeat endpoint has responded
+    conversion_cache.clear()
+    heartbeat_done = threading.Event()
+    original_parse_casedata = main.parse_casedata
+
+    def blocking_parse_casedata(*args):
+        assert heartbeat_done.wait(5)
+        return original_parse_casedata(*args)
+
+    monkeypatch.setattr(main, "parse_casedata", blocking_parse_casedata)
+
+    async def convert_and_probe():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            files = [
+                ("files", (variants_hgvs_csv, open(variants_hgvs_csv_path, "rb"))),
+                ("files", (casedata_snv_csv, open(casedata_snv_csv_path, "rb"))),
+            ]
+            conversion = asyncio.ensure_future(async_client.post("/csv_2_json", files=files))
+            await asyncio.sleep(0.1)
+            # WHEN the heartbeat endpoint is called during the conversion
+            heartbeat = await async_client.get("/")
+            heartbeat_done.set()
+            return heartbeat, await conversion
+
+    heartbeat, conversion = asyncio.run(convert_and_probe())
+
+    # THEN both requests should succeed
+    assert heartbeat.status_code == 200
+    assert conversion.status_code == 200
+
+
+def test_csv_2_json_batch():
+    """Test converting the pairs of files of a zip archive"""
+
+    # GIVEN a zip archive with a valid pair of files and a pair without CaseData file
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.write(variants_hgvs_csv_path, "sample1_Variant.csv")
+        archive.write(casedata_snv_csv_path, "sample1_CaseData.csv")
+        archive.write(variants_hgvs_csv_path, "sample2_Variant.csv")
+    files = [("files", ("batch.zip", buffer.getvalue()))]
+
+    # WHEN the archive is converted
+    response = client.post("/csv_2_json-batch", files=files)
+
+    # THEN a line with the result of each pair should be returned
+    assert response.status_code == 200
+    results = {result["pair"]: result for result in map(json.loads, response.text.splitlines())}
+    assert results["sample1"]["status_code"] == 200
+    assert results["sample1"]["submission"]["clinvarSubmission"]
+    assert results["sample2"]["status_code"] == 400
+    assert "Expected one CaseData csv file" in results["sample2"]["message"]
+
+    # AND the results can also be returned as a zip archive
+    response = client.post("/csv_2_json-batch", params={"output": "zip"}, files=files)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert sorted(archive.namelist()) == ["results.ndjson", "sample1.json"]
+
+
+def test_csv_2_json_batch_no_pairs():
+    """Test the response when no Variant or CaseData files are uploaded"""
+    files = [("files", ("notes.txt", b"text"))]
+    response = client.post("/csv_2_json-batch", files=files)
+    assert response.status_code == 400
+
+
+def test_csv_2_json_compressed():
+    """Test converting gzip-compressed files and receiving a compressed response"""
+
+    # GIVEN gzip-compressed Variant and CaseData files
+    conversion_cache.clear()
+    variants_contents, casedata_contents = generate_submission_files(20)
+    files = [
+        ("files", ("Variant.csv.gz", gzip.compress(variants_contents))),
+        ("files", ("CaseData.csv.gz", gzip.compress(casedata_contents))),
+    ]
+
+    # WHEN the files are converted by a client accepting gzip responses
+    response = client.post(
+        "/csv_2_json",
+        params={"assembly": "GRCh37"},
+        files=files,
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    # THEN the response should be compressed
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+    # AND contain the same submission as the uncompressed files
+    conversion_cache.clear()
+    uncompressed_files = [
+        ("files", ("Variant.csv", variants_contents)),
+        ("files", ("CaseData.csv", casedata_contents)),
+    ]
+    uncompressed_response = client.post(
+        "/csv_2_json", params={"assembly": "GRCh37"}, files=uncompressed_files
+    )
+    assert response.json() == uncompressed_response.json()
+
+
+def test_validate_compressed():
+    """Test validating a gzip-compressed json submission"""
+    with open(germline_subm_json_path, "rb") as json_file:
+        contents = gzip.compress(json_file.read())
+    response = client.post("/validate", files={"json_file": ("subm.json.gz", contents)})
+    assert response.status_code == 200
@@ -0,0 +1,88 @@
+import httpx
+
+from preClinVar.metrics import (
+    STAGE_DURATION,
+    STAGE_ROWS,
+    Counter,
+    Histogram,
+    StageRecord,
+    iter_timed,
+    server_timing_header,
+    timed_stage,
+    upstream_endpoint,
+)
+
+
+def test_histogram_render():
+    """Test the Prometheus text format of a histogram"""
+    # GIVEN a histogram with 2 observations
+    histogram = Histogram("test_seconds", "Test histogram", ["stage"], buckets=[0.1, 1])
+    histogram.observe(0.05, stage="parse")
+    histogram.observe(0.5, stage="parse")
+
+    # THEN its buckets should be cumulative and report sum and count of the observations
+    lines = histogram.render()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 2' in lines
+    assert 'test_seconds_sum{stage="parse"} 0.55' in lines
+    assert 'test_seconds_count{stage="parse"} 2' in lines
+
+
+def test_counter_escape_labels():
+    """Test that quotes in label values are escaped"""
+    counter = Counter("test_total", "Test counter", ["path"])
+    counter.inc(2, path='a"b')
+    assert 'test_total{path="a\\"b"} 2' in counter.render()
+
+
+def test_timed_stage_rows():
+    """Test that rows set while a stage runs are recorded"""
+    # GIVEN the number of runs of a stage
+    runs = STAGE_DURATION.count(stage="test_stage")
+    rows = STAGE_ROWS.value(stage="test_stage")
+
+    # WHEN the stage is run
+    with timed_stage("test_stage") as stage:
+        stage.rows = 3
+
+    # THEN the run and its rows should be recorded
+    assert STAGE_DURATION.count(stage="test_stage") == runs + 1
+    assert STAGE_ROWS.value(stage="test_stage") == rows + 3
+
+
+def test_iter_timed():
+    """Test that the elements of an iterable are counted when they are consumed"""
+    rows = STAGE_ROWS.value(stage="test_iter")
+    assert list(iter_timed(iter(range(5)), "test_iter")) == [0, 1, 2, 3, 4]
+    assert STAGE_ROWS.value(stage="test_iter") == rows + 5
+
+
+def test_server_timing_header():
+    """Test the format of the Server-Timing header"""
+    timings = [StageRecord("parse", 0.0015, 10), StageRecord("clinvar_api", 0.2)]
+    assert server_timing_header(timings) == 'parse;dur=1.50;desc="10 rows", clinvar_api;dur=200.00'
+
+
+def test_upstream_endpoint():
+    """Test that submission IDs are removed from the metric labels"""
+    url = httpx.URL("https://submit.ncbi.nlm.nih.gov/api/v1/submissions/SUB99999999/actions/")
+    assert upstream_endpoint(url) == "/api/v1/submissions/{submission_id}/actions/"
+
+
+def test_upstream_endpoint_any_submission_id():
+    """Test that submission IDs in any format provided by the users map to the same metric label"""
+    expected = upstream_endpoint(
+        httpx.URL("https://submit.ncbi.nlm.nih.gov/api/v1/submissions/SUB99999999/actions/")
+    )
+    for submission_id in ["foo", "sub123", "a/b", "SUB1%20x"]:
+        url = httpx.URL(
+            f"https://submit.ncbi.nlm.nih.gov/api/v1/submissions/{submission_id}/actions/"
+        )
+        assert upstream_endpoint(url) == expected
+    # Submissions and deletions are posted to URLs without submission ID
+    assert (
+        upstream_endpoint(httpx.URL("https://a.org/api/v1/submissions/")) == "/api/v1/submissions/"
+    )
+    assert upstream_endpoint(httpx.URL("https://a.org/api/v1/submissions")) == "/api/v1/submissions"
@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+import io
+import os
+import pickle
+import threading
+
+from preClinVar import offload
+from preClinVar.offload import ExecutorKind, copy_to_disk, run_cpu_bound, shutdown_cpu_executor
+
+test_var = contextvars.ContextVar("test_var", default=None)
+
+
+def _read_upload(upload_file):
+    return upload_file.filename, upload_file.file.read()
+
+
+def _thread_and_context():
+    return threading.get_ident(), test_var.get()
+
+
+def test_run_cpu_bound_thread(monkeypatch):
+    """Test that CPU-bound functions run in another thread, with the context of the caller"""
+    # GIVEN CPU-bound stages run by a pool of threads
+    monkeypatch.setattr(offload, "CPU_EXECUTOR", ExecutorKind.THREAD)
+
+    async def run():
+        test_var.set("request")
+        return await run_cpu_bound(_thread_and_context)
+
+    # WHEN a function is run from the event loop
+    thread_id, value = asyncio.run(run())
+
+    # THEN it should run in another thread and see the context variables of the caller
+    assert thread_id != threading.get_ident()
+    assert value == "request"
+
+
+def test_run_cpu_bound_inline(monkeypatch):
+    """Test that CPU-bound functions can be run in the event loop"""
+    monkeypatch.setattr(offload, "CPU_EXECUTOR", ExecutorKind.INLINE)
+    thread_id, _ = asyncio.run(run_cpu_bound(_thread_and_context))
+    assert thread_id == threading.get_ident()
+
+
+def test_run_cpu_bound_process(monkeypatch):
+    """Test that CPU-bound functions can be run by a pool of processes"""
+    # GIVEN CPU-bound stages run by a pool of processes
+    monkeypatch.setattr(offload, "CPU_EXECUTOR", ExecutorKind.PROCESS)
+    monkeypatch.setattr(offload, "_cpu_executor", None)
+    try:
+        # THEN functions should run in another process
+        assert asyncio.run(run_cpu_bound(os.getpid)) != os.getpid()
+        assert offload.validation_processes(4) == 1
+    finally:
+        shutdown_cpu_executor()
+
+
+def test_copy_to_disk(monkeypatch):
+    """Test that uploaded files are sent to a pool of processes by path, and read by the processes"""
+    # GIVEN CPU-bound stages run by a pool of processes
+    monkeypatch.setattr(offload, "CPU_EXECUTOR", ExecutorKind.PROCESS)
+    monkeypatch.setattr(offload, "_cpu_executor", None)
+    # GIVEN an uploaded file copied to disk
+    contents = b"Linking ID,Individual ID\n" * 1000
+    disk_file = copy_to_disk(io.BytesIO(contents), "CaseData.csv")
+    try:
+        # THEN its contents should not be pickled
+        assert len(pickle.dumps(disk_file)) < 1000
+        # THEN a process should read the file from its path
+        assert asyncio.run(run_cpu_bound(_read_upload, disk_file)) == ("CaseData.csv", contents)
+    finally:
+        shutdown_cpu_executor()
+        disk_file.remove()
+
+    # THEN the file should be removed from disk
+    assert not os.path.exists(disk_file.path)
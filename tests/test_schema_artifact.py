@@ -0,0 +1,110 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from preClinVar.demo import germline_subm_json_path
+from preClinVar.resources import subm_schema_path
+from preClinVar.schema_artifact import (
+    build_schema_artifact,
+    compiled_validator,
+    main,
+    read_schema_artifact,
+)
+from preClinVar.validate import load_schema
+
+
+def test_build_and_read_schema_artifact(tmp_path):
+    """Test that the prebuilt schema contains the checked and resolved submission schema"""
+
+    # GIVEN a schema artifact built from the submission schema
+    artifact_path = str(tmp_path / "schema.pickle")
+    build_schema_artifact(artifact_path=artifact_path)
+
+    # WHEN it is read
+    artifact = read_schema_artifact(artifact_path=artifact_path)
+
+    # THEN it should contain the submission schema, with its references resolved
+    assert artifact["schema"] == load_schema()
+    assert "$ref" not in json.dumps(artifact["resolved_schema"])
+
+
+def test_compiled_validator_from_artifact(tmp_path):
+    """Test the validation function stored in the prebuilt schema"""
+
+    # GIVEN a schema artifact built with fastjsonschema installed
+    artifact_path = str(tmp_path / "schema.pickle")
+    artifact = build_schema_artifact(artifact_path=artifact_path)
+    if artifact["compiled"] is None:
+        return
+
+    # THEN its validation function should accept a valid submission
+    validate = compiled_validator(read_schema_artifact(artifact_path=artifact_path))
+    with open(germline_subm_json_path) as json_file:
+        assert validate(json.load(json_file))
+
+
+def test_require_compiled_schema_artifact(tmp_path, monkeypatch):
+    """Test that building the prebuilt schema fails when a compiled validator is required but can't be created"""
+    artifact_path = str(tmp_path / "schema.pickle")
+
+    # GIVEN fastjsonschema can't be imported
+    monkeypatch.setitem(sys.modules, "fastjsonschema", None)
+
+    # THEN the build should fail when a compiled validator is required
+    with pytest.raises(SystemExit, match="doesn't contain a compiled validator"):
+        main(["--output", artifact_path, "--require-compiled"])
+    # AND succeed otherwise
+    main(["--output", artifact_path])
+
+
+def test_outdated_schema_artifact(tmp_path):
+    """Test that a prebuilt schema is ignored once the schema file was modified"""
+
+    # GIVEN a schema artifact built from a copy of the submission schema
+    schema_path = tmp_path / "schema.json"
+    with open(subm_schema_path) as schema_file:
+        schema = json.load(schema_file)
+    schema_path.write_text(json.dumps(schema))
+    artifact_path = str(tmp_path / "schema.pickle")
+    build_schema_artifact(str(schema_path), artifact_path)
+
+    # WHEN the schema file is modified
+    schema["title"] = "modified schema"
+    schema_path.write_text(json.dumps(schema))
+
+    # THEN the artifact should not be used
+    assert read_schema_artifact(str(schema_path), artifact_path) is None
+
+
+def test_missing_or_corrupted_schema_artifact(tmp_path):
+    """Test that the schema file is used when the prebuilt schema doesn't exist or can't be read"""
+
+    # GIVEN no artifact
+    artifact_path = tmp_path / "schema.pickle"
+    assert read_schema_artifact(artifact_path=str(artifact_path)) is None
+
+    # GIVEN a truncated artifact
+    artifact_path.write_bytes(b"\x80\x05")
+    assert read_schema_artifact(artifact_path=str(artifact_path)) is None
+
+
+def test_app_import_is_lazy():
+    """Test that importing the app doesn't import the libraries only needed when requests are served"""
+
+    # WHEN the app is imported in a new interpreter
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, preClinVar.main; print(' '.join(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    # THEN the validation and archive libraries should not be imported yet
+    for module in ["jsonschema", "tarfile", "fastjsonschema", "uvicorn"]:
+        assert module not in modules
@@ -0,0 +1,239 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+from fastapi.testclient import TestClient
+
+from preClinVar.clinvar_client import create_client
+from preClinVar.constants import SUBMISSION_URL
+from preClinVar.fake_clinvar import DEMO_SUBMISSION_ID, create_fake_clinvar_app
+from preClinVar.main import app
+from preClinVar.metrics import UPSTREAM_REJECTED, UPSTREAM_RETRIES
+from preClinVar.upstream import (
+    CircuitBreaker,
+    CircuitState,
+    RateLimiter,
+    ResilientTransport,
+    parse_retry_after,
+)
+
+DEMO_API_KEY = "test_api_key"
+ACTIONS_URL = f"{SUBMISSION_URL}/{DEMO_SUBMISSION_ID}/actions/"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _send(transport: ResilientTransport, method: str = "GET", api_key: str = DEMO_API_KEY):
+    """Send a request to the fake ClinVar API through a transport"""
+
+    async def send():
+        async with httpx.AsyncClient(transport=transport) as client:
+            url = ACTIONS_URL if method == "GET" else SUBMISSION_URL + "/"
+            return await client.request(method, url, headers={"SP-API-KEY": api_key})
+
+    return asyncio.run(send())
+
+
+def test_rate_limiter_per_api_key():
+    """Test the token bucket of each API key"""
+
+    # GIVEN a limiter of 1 request per second, with bursts of 2 requests and a maximum wait of 1.5 seconds
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=2, max_wait=1.5, clock=clock)
+
+    # THEN the first 2 requests of a key are sent at once, the next one after a second
+    assert limiter.reserve("key1") == 0
+    assert limiter.reserve("key1") == 0
+    assert limiter.reserve("key1") == 1.0
+    # AND a request which should wait longer than 1.5 seconds is rejected
+    assert limiter.reserve("key1") is None
+    # AND the requests of other keys are not delayed
+    assert limiter.reserve("key2") == 0
+
+    # WHEN time passes, tokens are given again
+    clock.now += 3
+    assert limiter.reserve("key1") == 0
+
+    # WHEN the API asks to retry later, the requests of the key wait
+    limiter.pause("key2", 1.2)
+    assert round(limiter.reserve("key2"), 6) == 1.2
+
+
+def test_circuit_breaker_states():
+    """Test that the circuit breaker opens after consecutive failures and lets a probe through after its timeout"""
+
+    # GIVEN a circuit breaker opening after 2 failures, for 10 seconds
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    # WHEN 2 requests fail
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure()
+
+    # THEN requests are rejected
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.allow_request() is False
+    assert breaker.retry_after() == 10
+
+    # WHEN the timeout has passed, a single request probes the API
+    clock.now += 10
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+
+    # WHEN the probe fails, the circuit is open again
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    # WHEN the next probe succeeds, the circuit is closed
+    clock.now += 10
+    assert breaker.allow_request() is True
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_parse_retry_after():
+    """Test the Retry-After header, given in seconds or as an HTTP date"""
+    assert parse_retry_after("2") == 2
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(retry_date) <= 30
+
+
+def test_retry_server_errors():
+    """Test that requests failing with server errors are sent again"""
+
+    # GIVEN a ClinVar API failing twice before responding
+    fake_clinvar = create_fake_clinvar_app(faults=[{"status_code": 503}, {"status_code": 502}])
+    transport = ResilientTransport(httpx.ASGITransport(app=fake_clinvar), backoff_base=0.01)
+    labels = {"method": "GET", "endpoint": "/api/v1/submissions/{submission_id}/actions/"}
+    retries = UPSTREAM_RETRIES.value(status_code="503", **labels)
+
+    # WHEN the status of a submission is requested
+    response = _send(transport)
+
+    # THEN the request should succeed after 2 retries
+    assert response.status_code == 200
+    assert fake_clinvar.state.requests == 3
+    assert UPSTREAM_RETRIES.value(status_code="503", **labels) == retries + 1
+
+
+def test_submissions_not_retried_after_server_error():
+    """Test that submissions are not sent again after a server error, since they might have been processed"""
+
+    # GIVEN a ClinVar API failing once
+    fake_clinvar = create_fake_clinvar_app(faults=[{"status_code": 500}])
+    transport = ResilientTransport(httpx.ASGITransport(app=fake_clinvar), backoff_base=0.01)
+
+    # THEN the error should be returned for a submission
+    assert _send(transport, method="POST").status_code == 500
+    assert fake_clinvar.state.requests == 1
+
+
+def test_retry_after_too_many_requests():
+    """Test that requests rejected with 429 are sent again after the delay of their Retry-After header"""
+
+    # GIVEN a ClinVar API rejecting a submission, asking to retry after 0.2 seconds
+    fake_clinvar = create_fake_clinvar_app(
+        faults=[{"status_code": 429, "headers": {"Retry-After": "0.2"}}]
+    )
+    transport = ResilientTransport(httpx.ASGITransport(app=fake_clinvar), backoff_base=0)
+
+    # WHEN the submission is sent
+    start = time.perf_counter()
+    response = _send(transport, method="POST")
+
+    # THEN it should be sent again after the delay
+    assert response.status_code == 201
+    assert fake_clinvar.state.requests == 2
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_long_retry_after_returned():
+    """Test that responses asking to retry after a long delay are returned without waiting"""
+
+    # GIVEN a ClinVar API asking to retry in an hour
+    fake_clinvar = create_fake_clinvar_app(
+        faults=[{"status_code": 503, "headers": {"Retry-After": "3600"}}]
+    )
+    transport = ResilientTransport(httpx.ASGITransport(app=fake_clinvar), max_retry_after=30)
+
+    # THEN its response should be returned
+    response = _send(transport)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3600"
+    assert fake_clinvar.state.requests == 1
+
+
+def test_rate_limited_requests_rejected():
+    """Test that requests exceeding the rate limit of an API key are rejected without contacting the API"""
+
+    # GIVEN a limit of 1 request per API key, without waiting
+    fake_clinvar = create_fake_clinvar_app()
+    transport = ResilientTransport(
+        httpx.ASGITransport(app=fake_clinvar), RateLimiter(rate=0.01, burst=1, max_wait=0)
+    )
+    rejected = UPSTREAM_REJECTED.value(reason="rate_limited")
+
+    # THEN the second request of a key should be rejected with 429
+    assert _send(transport).status_code == 200
+    response = _send(transport)
+    assert response.status_code == 429
+    assert "API key" in response.json()["message"]
+    assert UPSTREAM_REJECTED.value(reason="rate_limited") == rejected + 1
+    # AND the requests of another key should be sent
+    assert _send(transport, api_key="other_key").status_code == 200
+    assert fake_clinvar.state.requests == 2
+
+
+def test_status_circuit_open(fake_clinvar):
+    """Test that the status endpoint fails fast with a 503 while the ClinVar API is down"""
+
+    # GIVEN a ClinVar API which is down, and a client opening its circuit breaker after 2 failures
+    circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    fake_app = fake_clinvar(
+        lambda transport: httpx.AsyncClient(
+            transport=ResilientTransport(transport, circuit_breaker=circuit_breaker, max_retries=0)
+        )
+    )
+    fake_app.state.outage = True
+    client = TestClient(app)
+    data = {"api_key": DEMO_API_KEY, "submission_id": DEMO_SUBMISSION_ID}
+
+    # WHEN the status of a submission is requested 3 times
+    responses = [client.post("/status", data=data) for _ in range(3)]
+
+    # THEN the errors of the API should be returned for the first 2 requests
+    assert [response.status_code for response in responses] == [503, 503, 503]
+    assert responses[0].json() == {"message": "Service unavailable"}
+    # AND the third one should be rejected without contacting the API
+    assert fake_app.state.requests == 2
+    assert "ClinVar API is unavailable" in responses[2].json()["message"]
+
+
+def test_create_client_resilient():
+    """Test that the clients of the proxy endpoints retry the requests failing with server errors"""
+
+    # GIVEN a client of a ClinVar API failing once
+    fake_clinvar = create_fake_clinvar_app(faults=[{"status_code": 504}])
+
+    async def get_status():
+        async with create_client(
+            transport=httpx.ASGITransport(app=fake_clinvar), backoff_base=0
+        ) as client:
+            return await client.get(ACTIONS_URL, headers={"SP-API-KEY": DEMO_API_KEY})
+
+    # THEN the request should be sent again
+    assert asyncio.run(get_status()).status_code == 200
+    assert fake_clinvar.state.requests == 2
@@ -1,7 +1,16 @@
+import copy
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+from preClinVar import validate
 from preClinVar.demo import germline_subm_json_path, somatic_subm_json_path
-from preClinVar.validate import validate_submission
+from preClinVar.validate import (
+    ValidationMode,
+    get_compiled_validator,
+    get_validator,
+    validate_submission,
+)
 
 
 def test_validate_germline_submission():
@@ -26,3 +35,173 @@ def test_validate_somatic_submission():
     with open(somatic_subm_json_path) as json_file:
         submission_dict = json.load(json_file)
         assert validate_submission(submission_dict=submission_dict) == (True, [])
+
+
+def test_validator_built_once():
+    """Test that the submission schema validator is created only once and reused."""
+
+    # WHEN the validator is requested twice
+    # THEN the same object should be returned
+    assert get_validator() is get_validator()
+
+    # AND its schema should not contain references to resolve at validation time
+    assert '"$ref"' not in json.dumps(get_validator().schema)
+
+
+def test_validate_submission_errors(monkeypatch):
+    """Test the function that validates a json submission when the submission contains errors."""
+
+    # GIVEN a germline submission with a non-valid record status
+    with open(germline_subm_json_path) as json_file:
+        submission_dict = json.load(json_file)
+    submission_dict["germlineSubmission"][0]["recordStatus"] = "unknown"
+
+    # THEN validation should return an error, with or without the compiled validator
+    for compiled in [get_compiled_validator(), None]:
+        monkeypatch.setattr("preClinVar.validate.get_compiled_validator", lambda: compiled)
+        valid, errors = validate_submission(submission_dict=submission_dict)
+        assert valid is False
+        assert errors == ["germlineSubmission[0]: 'unknown' is not one of ['novel', 'update']"]
+
+
+def test_validate_submission_parallel(monkeypatch):
+    """Test the function that validates a json submission when its items are validated by a pool of processes."""
+
+    # GIVEN a germline submission with 20 items, 2 of them not valid
+    with open(germline_subm_json_path) as json_file:
+        submission_dict = json.load(json_file)
+    submission_dict["germlineSubmission"] = [
+        copy.deepcopy(submission_dict["germlineSubmission"][0]) for _ in range(20)
+    ]
+    submission_dict["germlineSubmission"][13]["recordStatus"] = "unknown"
+    submission_dict["germlineSubmission"][4]["recordStatus"] = "unknown"
+    # AND a submission name of the wrong type
+    submission_dict["submissionName"] = 1
+
+    # GIVEN that submissions are validated in parallel, in batches of 3 items
+    monkeypatch.setattr(validate, "PARALLEL_VALIDATION_MIN_ITEMS", 10)
+    monkeypatch.setattr(validate, "VALIDATION_BATCH_SIZE", 3)
+
+    # WHEN the submission is validated using 2 processes
+    try:
+        parallel_results = validate_submission(submission_dict=submission_dict, processes=2)
+    finally:
+        validate.shutdown_validation_pool()
+
+    # THEN the errors should be sorted by position and report the index of the items
+    assert parallel_results == (
+        False,
+        [
+            "1 is not of type 'string'",
+            "germlineSubmission[4]: 'unknown' is not one of ['novel', 'update']",
+            "germlineSubmission[13]: 'unknown' is not one of ['novel', 'update']",
+        ],
+    )
+
+    # AND they should be the same errors returned by the validation in one process
+    assert validate_submission(submission_dict=submission_dict, processes=1) == parallel_results
+
+
+def _submission_with_errors(n_items: int, error_items: list) -> dict:
+    """Return a germline submission with n_items items, where the items at the error_items positions have a non-valid record status and HGVS"""
+    with open(germline_subm_json_path) as json_file:
+        submission_dict = json.load(json_file)
+    submission_dict["germlineSubmission"] = [
+        copy.deepcopy(submission_dict["germlineSubmission"][0]) for _ in range(n_items)
+    ]
+    for index in error_items:
+        submission_dict["germlineSubmission"][index]["recordStatus"] = "unknown"
+        submission_dict["germlineSubmission"][index]["variantSet"]["variant"][0]["hgvs"] = 1
+    return submission_dict
+
+
+def test_validation_pool_created_once(monkeypatch):
+    """Test that the pool of processes is created once when it is requested by several threads at the same time"""
+
+    # GIVEN a pool of processes which is slow to create
+    created = []
+
+    def slow_pool(**kwargs):
+        time.sleep(0.05)
+        created.append(kwargs)
+        return ThreadPoolExecutor(max_workers=1)
+
+    monkeypatch.setattr(validate, "ProcessPoolExecutor", slow_pool)
+
+    # WHEN 8 threads request the pool at the same time
+    try:
+        with ThreadPoolExecutor(max_workers=8) as threads:
+            pools = list(threads.map(lambda _: validate.get_validation_pool(2), range(8)))
+    finally:
+        validate.shutdown_validation_pool()
+
+    # THEN a single pool should be created and shared by all threads
+    assert len(created) == 1
+    assert all(pool is pools[0] for pool in pools)
+
+
+def test_validate_submission_first_and_capped(monkeypatch):
+    """Test the function that validates a json submission when it stops after one or a given number of errors."""
+
+    # GIVEN a germline submission with 3 non-valid items, 2 errors each
+    submission_dict = _submission_with_errors(20, [2, 8, 15])
+
+    # GIVEN that submissions are validated in batches of 3 items
+    monkeypatch.setattr(validate, "PARALLEL_VALIDATION_MIN_ITEMS", 10)
+    monkeypatch.setattr(validate, "VALIDATION_BATCH_SIZE", 3)
+
+    for processes in [1, 2]:
+        try:
+            # WHEN the submission is validated in "first" mode
+            first_results = validate_submission(
+                submission_dict=submission_dict, processes=processes, mode=ValidationMode.FIRST
+            )
+            # AND in "capped" mode, with a maximum of 3 errors
+            capped_results = validate_submission(
+                submission_dict=submission_dict,
+                processes=processes,
+                mode=ValidationMode.CAPPED,
+                max_errors=3,
+            )
+        finally:
+            validate.shutdown_validation_pool()
+
+        # THEN only the first error should be returned in the first case
+        assert first_results == (
+            False,
+            ["germlineSubmission[2]: 'unknown' is not one of ['novel', 'update']"],
+        )
+        # AND the first 3 errors in the second case
+        assert capped_results[0] is False
+        assert capped_results[1] == [
+            "germlineSubmission[2]: 'unknown' is not one of ['novel', 'update']",
+            "germlineSubmission[2]: 1 is not of type 'string'",
+            "germlineSubmission[8]: 'unknown' is not one of ['novel', 'update']",
+        ]
+
+
+def test_validate_submission_aggregate(monkeypatch):
+    """Test the function that validates a json submission when errors are grouped by path and message."""
+
+    # GIVEN a germline submission with 8 non-valid items, 2 errors each
+    submission_dict = _submission_with_errors(20, [1, 2, 3, 5, 8, 13, 17, 19])
+
+    # GIVEN that submissions are validated in batches of 3 items
+    monkeypatch.setattr(validate, "PARALLEL_VALIDATION_MIN_ITEMS", 10)
+    monkeypatch.setattr(validate, "VALIDATION_BATCH_SIZE", 3)
+
+    for processes in [1, 2]:
+        # WHEN the submission is validated in "aggregate" mode
+        try:
+            valid, errors = validate_submission(
+                submission_dict=submission_dict, processes=processes, mode=ValidationMode.AGGREGATE
+            )
+        finally:
+            validate.shutdown_validation_pool()
+
+        # THEN errors should be grouped by path and message, with their count and the first items containing them
+        assert valid is False
+        assert sorted(errors) == [
+            "germlineSubmission[*].recordStatus: 'unknown' is not one of ['novel', 'update'] (errors: 8, first items: [1, 2, 3, 5, 8])",
+            "germlineSubmission[*].variantSet.variant[*].hgvs: 1 is not of type 'string' (errors: 8, first items: [1, 2, 3, 5, 8])",
+        ]
@@ -0,0 +1,102 @@
+import pytest
+
+from preClinVar.vocabulary import (
+    CASEDATA_CONTROLLED_FIELDS,
+    VARIANT_CONTROLLED_FIELDS,
+    accepted_values_summary,
+    get_vocabularies,
+    iter_prechecked,
+    normalize_value,
+    precheck_columns,
+    precheck_lines,
+)
+
+
+def test_get_vocabularies_from_schema():
+    """Test that lookup tables are built from the enums of the submission schema and the constants"""
+    vocabularies = get_vocabularies()
+    assert vocabularies["Collection method"]["clinical testing"] == "clinical testing"
+    assert vocabularies["Variant type"]["copy number loss"] == "copy number loss"
+    assert vocabularies["Condition ID type"]["hpo"] == "HPO"
+    for field in VARIANT_CONTROLLED_FIELDS + CASEDATA_CONTROLLED_FIELDS:
+        assert vocabularies[field]
+
+
+def test_vocabularies_read_only():
+    """Test that the lookup tables, shared by all requests, can't be modified"""
+    vocabularies = get_vocabularies()
+    with pytest.raises(TypeError):
+        vocabularies["Affected status"]["maybe"] = "yes"
+    with pytest.raises(TypeError):
+        vocabularies["Affected status"] = {}
+
+
+def test_normalize_value():
+    """Test that values of controlled fields are replaced by the accepted terms, ignoring case"""
+    assert normalize_value("Affected status", "YES") == "yes"
+    assert normalize_value("Mode of inheritance", "autosomal recessive inheritance") == (
+        "Autosomal recessive inheritance"
+    )
+    # Unknown and empty values are returned unchanged
+    assert normalize_value("Allele origin", "germ-line") == "germ-line"
+    assert normalize_value("Allele origin", "") == ""
+
+
+def test_precheck_lines():
+    """Test that invalid values are reported with their row"""
+    # GIVEN CaseData lines with an invalid value on the second row
+    lines = [
+        {"Affected status": "Yes", "Allele origin": "germline", "Collection method": ""},
+        {"Affected status": "maybe", "Allele origin": "germline"},
+    ]
+    # THEN only the invalid value should be reported
+    errors = precheck_lines(lines, CASEDATA_CONTROLLED_FIELDS, "CaseData")
+    assert len(errors) == 1
+    assert errors[0] == "CaseData file, row 2: 'maybe' is not a valid Affected status"
+
+
+def test_accepted_values_summary():
+    """Test that accepted values are listed once for each field with invalid values"""
+    # GIVEN invalid values of two fields, one of them on several rows
+    lines = [
+        {"Affected status": "maybe", "Allele origin": "germline"},
+        {"Affected status": "perhaps", "Allele origin": "germ-line"},
+    ]
+    errors = precheck_lines(lines, CASEDATA_CONTROLLED_FIELDS, "CaseData")
+    assert len(errors) == 3
+
+    # THEN the accepted values should be listed once per field, in the order of the errors
+    summary = accepted_values_summary(errors)
+    assert [entry.split(":")[0] for entry in summary] == [
+        "Accepted values of Affected status",
+        "Accepted values of Allele origin",
+    ]
+    assert "'yes'" in summary[0]
+
+
+def test_iter_prechecked():
+    """Test that lines are checked while they are consumed"""
+    lines = [{"Clinical significance": "Pathogenic"}, {"Clinical significance": "Bad"}]
+    errors = []
+    assert list(iter_prechecked(lines, VARIANT_CONTROLLED_FIELDS, "Variant", errors)) == lines
+    assert len(errors) == 1 and errors[0].startswith("Variant file, row 2:")
+
+
+def test_precheck_columns():
+    """Test that the pre-check of columns reports the same errors as the pre-check of lines"""
+    # GIVEN the same Variant file as lines and as columns
+    lines = [
+        {"Clinical significance": "Bad", "Variant type": "Deletion"},
+        {"Clinical significance": "benign", "Variant type": "Deletionn"},
+        {"Clinical significance": "Bad", "Variant type": ""},
+    ]
+    columns = {field: [line[field] for line in lines] for field in lines[0]}
+
+    # THEN the errors should be identical and sorted by row
+    errors = precheck_columns(columns, VARIANT_CONTROLLED_FIELDS, "Variant")
+    assert errors == precheck_lines(lines, VARIANT_CONTROLLED_FIELDS, "Variant")
+    assert [error.split(":")[0] for error in errors] == [
+        "Variant file, row 1",
+        "Variant file, row 2",
+        "Variant file, row 3",
+    ]